@@ -1,18 +1,84 @@
 """The CoinMarketCap integration."""
+import math
+import re
+
+import voluptuous as vol
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    PLATFORMS,
+    CONF_API_KEY,
+    CONF_PROVIDER,
+    DATA_ENGINES,
+    DEFAULT_PROVIDER,
+    SIGNAL_ENTRY_UPDATED,
+    STORAGE_VERSION,
+    ATTR_CRYPTOCURRENCY,
+    ATTR_CURRENCY,
+    ATTR_END,
+    ATTR_START,
+    DEFAULT_QUERY_PERIOD,
+    SERVICE_GET_PRICE_HISTORY,
+)
+from .coordinator import CoinMarketCapDataUpdateCoordinator, CoinMarketCapQuoteEngine
+from .timeseries import get_series_store
 
-from .const import DOMAIN, PLATFORMS
+GET_PRICE_HISTORY_SCHEMA = vol.Schema({
+    vol.Required(ATTR_CRYPTOCURRENCY): cv.string,
+    vol.Optional(ATTR_CURRENCY): cv.string,
+    vol.Optional(ATTR_START): cv.datetime,
+    vol.Optional(ATTR_END): cv.datetime,
+})
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the CoinMarketCap component."""
     hass.data.setdefault(DOMAIN, {})
+
+    async def async_get_price_history(call: ServiceCall) -> ServiceResponse:
+        """Return hourly bars from the local OHLCV store."""
+        return await _async_get_price_history(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_PRICE_HISTORY,
+        async_get_price_history,
+        schema=GET_PRICE_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up CoinMarketCap from a config entry."""
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = entry.data
+    engines = hass.data[DOMAIN].setdefault(DATA_ENGINES, {})
+
+    await _async_migrate_unique_ids(hass, entry)
+
+    # Entries share an engine when they use the same key and quote provider
+    key = (entry.data[CONF_API_KEY], entry.data.get(CONF_PROVIDER, DEFAULT_PROVIDER))
+    engine = engines.get(key)
+    if engine is None:
+        engine = engines[key] = CoinMarketCapQuoteEngine(hass, *key)
+
+    coordinator = CoinMarketCapDataUpdateCoordinator(hass, engine, entry)
+    coordinator.async_subscribe()
+    try:
+        if not await coordinator.async_restore_snapshot():
+            await coordinator.async_config_entry_first_refresh()
+    except Exception:
+        _async_release_coordinator(hass, coordinator)
+        raise
+
+    hass.data[DOMAIN][entry.entry_id] = coordinator
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
@@ -24,10 +90,98 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        _async_release_coordinator(hass, coordinator)
 
     return unload_ok
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the persisted data of a deleted entry."""
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}").async_remove()
+
 async def update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Handle options update."""
-    await hass.config_entries.async_reload(entry.entry_id)
\ No newline at end of file
+    """Handle options update.
+
+    Symbol, amount and interval changes are applied to the running entry;
+    only an API key, provider or currency change reloads it.
+    """
+    coordinator = hass.data[DOMAIN].get(entry.entry_id)
+    if coordinator is None or not coordinator.async_update_from_entry(entry):
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+
+    async_dispatcher_send(hass, SIGNAL_ENTRY_UPDATED.format(entry.entry_id))
+
+async def _async_migrate_unique_ids(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Scope the unique IDs of coin and total value sensors to their entry.
+
+    They used to be ``coinmarketcap_{symbol}_value_{currency}`` and
+    ``coinmarketcap_total_portfolio_value_{currency}``, which collided when
+    two entries tracked the same coin.
+    """
+
+    @callback
+    def _migrate(entity_entry: er.RegistryEntry) -> dict | None:
+        unique_id = entity_entry.unique_id
+        match = re.fullmatch(rf"{DOMAIN}_(.+_value_[^_]+)", unique_id)
+        if match is None or entry.entry_id in unique_id:
+            return None
+        return {"new_unique_id": f"{DOMAIN}_{entry.entry_id}_{match.group(1)}"}
+
+    await er.async_migrate_entries(hass, entry.entry_id, _migrate)
+
+def _async_release_coordinator(hass: HomeAssistant, coordinator: CoinMarketCapDataUpdateCoordinator) -> None:
+    """Unsubscribe an entry and drop the engine once nobody uses it."""
+    coordinator.async_unsubscribe()
+    engine = coordinator.engine
+    if not engine.subscriptions:
+        hass.data[DOMAIN][DATA_ENGINES].pop((engine.api_key, engine.provider), None)
+
+async def _async_get_price_history(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Read a range of hourly bars without touching the recorder database.
+
+    Bars are stored in the currency the quotes are fetched in; other
+    currencies are converted with the current FX rate.
+    """
+    symbol = call.data[ATTR_CRYPTOCURRENCY].upper()
+    engine = next(
+        (
+            engine
+            for engine in hass.data[DOMAIN].get(DATA_ENGINES, {}).values()
+            if engine.base_currency is not None
+            and any(symbol in sub.cryptocurrencies for sub in engine.subscriptions.values())
+        ),
+        None,
+    )
+    if engine is None:
+        raise HomeAssistantError(f"{symbol} is not tracked by any CoinMarketCap entry")
+
+    currency = call.data.get(ATTR_CURRENCY, engine.base_currency).upper()
+    rate = engine.rate(currency)
+    if rate is None:
+        raise HomeAssistantError(f"No {engine.base_currency}/{currency} rate is available")
+
+    end = dt_util.as_utc(call.data[ATTR_END]) if ATTR_END in call.data else dt_util.utcnow()
+    start = dt_util.as_utc(call.data[ATTR_START]) if ATTR_START in call.data else end - DEFAULT_QUERY_PERIOD
+    series = await hass.async_add_executor_job(
+        get_series_store(hass).read, [symbol], engine.base_currency, start.timestamp(), end.timestamp()
+    )
+
+    def convert(value):
+        return None if math.isnan(value) else value * rate
+
+    return {
+        "cryptocurrency": symbol,
+        "currency": currency,
+        "bars": [
+            {
+                "time": dt_util.utc_from_timestamp(bar[0]).isoformat(),
+                "open": convert(bar[1]),
+                "high": convert(bar[2]),
+                "low": convert(bar[3]),
+                "close": convert(bar[4]),
+                "volume": convert(bar[5]),
+            }
+            for bar in series[symbol]
+        ],
+    }
@@ -0,0 +1,149 @@
+"""Price alert rules evaluated on each coordinator update."""
+
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+RULE_ABOVE = "above"
+RULE_BELOW = "below"
+RULE_CROSS = "cross"
+RULE_MOVE = "move"
+
+OPERATORS = {
+    ">": RULE_ABOVE,
+    "above": RULE_ABOVE,
+    "<": RULE_BELOW,
+    "below": RULE_BELOW,
+    "x": RULE_CROSS,
+    "crosses": RULE_CROSS,
+    "moves": RULE_MOVE,
+}
+
+Rule = namedtuple("Rule", ["key", "symbol", "kind", "value", "window"])
+
+
+def _parse_window(value):
+    """Return a window like ``1h`` or ``30m`` in seconds."""
+    value = value.strip().lower()
+    if value.endswith("m"):
+        seconds = float(value[:-1]) * 60
+    else:
+        seconds = float(value.rstrip("h")) * 3600
+    if seconds <= 0:
+        raise ValueError(f"Invalid window: {value}")
+    return seconds
+
+
+def parse_rules(value):
+    """Parse alert rules separated by ``;`` or new lines.
+
+    Supported forms are ``BTC > 70000``, ``BTC < 60000``, ``BTC crosses
+    65000`` and ``BTC moves 5% 1h``. Raises ValueError for malformed rules.
+    """
+    rules = {}
+    for line in str(value or "").replace("\n", ";").split(";"):
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) not in (3, 4):
+            raise ValueError(f"Invalid alert rule: {line.strip()}")
+        symbol = parts[0].upper()
+        kind = OPERATORS.get(parts[1].lower())
+        if kind is None:
+            raise ValueError(f"Invalid alert rule: {line.strip()}")
+        threshold = float(parts[2].rstrip("%"))
+        window = None
+        if kind == RULE_MOVE:
+            if len(parts) != 4 or threshold <= 0:
+                raise ValueError(f"Invalid alert rule: {line.strip()}")
+            window = _parse_window(parts[3])
+            key = f"{symbol}_{kind}_{threshold:g}_{window:g}".lower()
+        elif len(parts) == 4:
+            raise ValueError(f"Invalid alert rule: {line.strip()}")
+        else:
+            key = f"{symbol}_{kind}_{threshold:g}".lower()
+        rules[key] = Rule(key, symbol, kind, threshold, window)
+    return list(rules.values())
+
+
+def describe(rule):
+    """Return a short human readable form of a rule."""
+    if rule.kind == RULE_MOVE:
+        return f"{rule.symbol} moves {rule.value:g}% in {rule.window / 3600:g}h"
+    return f"{rule.symbol} {rule.kind} {rule.value:g}"
+
+
+class AlertEngine:
+    """Evaluate alert rules against price ticks.
+
+    Level rules are kept per symbol in a list sorted by level, so a tick only
+    bisects for the levels between the previous and the new price. Move rules
+    are checked per symbol against the price at the start of their window.
+    ``evaluate`` returns the rules whose state changed and whether they fired.
+    """
+
+    def __init__(self, rules):
+        """Initialize."""
+        self.rules = rules
+        self.state = {rule.key: False for rule in rules}
+        self._levels = {}
+        self._moves = {}
+        for rule in sorted(rules, key=lambda rule: rule.value):
+            if rule.kind == RULE_MOVE:
+                self._moves.setdefault(rule.symbol, []).append(rule)
+            else:
+                levels, ordered = self._levels.setdefault(rule.symbol, ([], []))
+                levels.append(rule.value)
+                ordered.append(rule)
+
+    @property
+    def symbols(self):
+        """Return the symbols that have rules."""
+        return self._levels.keys() | self._moves.keys()
+
+    @staticmethod
+    def _holds(rule, price):
+        """Return the state of a level rule at ``price``."""
+        if rule.kind == RULE_BELOW:
+            return price <= rule.value
+        return price >= rule.value
+
+    def initialize(self, symbol, price):
+        """Set the level rule states of a coin from its first price without firing.
+
+        Returns the rules whose state changed.
+        """
+        changed = []
+        _, ordered = self._levels.get(symbol, ((), ()))
+        for rule in ordered:
+            state = self._holds(rule, price)
+            if state != self.state[rule.key]:
+                self.state[rule.key] = state
+                changed.append(rule)
+        return changed
+
+    def evaluate(self, symbol, old, new, change_since=None):
+        """Return ``[(rule, fired)]`` for rules whose state changed with this tick.
+
+        ``change_since(seconds)`` returns the percent change of ``symbol``
+        over the last ``seconds``, or None if the history is too short.
+        """
+        changed = []
+        entry = self._levels.get(symbol)
+        if entry is not None and old is not None and new != old:
+            levels, ordered = entry
+            low, high = min(old, new), max(old, new)
+            crossed = ordered[bisect_left(levels, low):bisect_right(levels, high)]
+            for rule in crossed:
+                state = self._holds(rule, new)
+                if state != self.state[rule.key]:
+                    self.state[rule.key] = state
+                    changed.append((rule, state or rule.kind == RULE_CROSS))
+
+        if change_since is not None:
+            for rule in self._moves.get(symbol, ()):
+                change = change_since(rule.window)
+                state = change is not None and abs(change) >= rule.value
+                if state != self.state[rule.key]:
+                    self.state[rule.key] = state
+                    changed.append((rule, state))
+        return changed
@@ -0,0 +1,425 @@
+"""HTTP client for the CoinMarketCap API."""
+
+from abc import ABC, abstractmethod
+import asyncio
+from functools import partial
+import logging
+import random
+import time
+
+import aiohttp
+from homeassistant.util import dt as dt_util
+from homeassistant.util.json import json_loads
+
+from .const import (
+    API_BASE_URL,
+    BACKOFF_BASE,
+    BACKOFF_MAX,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    LISTINGS_PATH,
+    MAP_PATH,
+    MAX_RETRIES,
+    OHLCV_HISTORICAL_PATH,
+    PARSE_EXECUTOR_THRESHOLD,
+    PRICE_CONVERSION_PATH,
+    QUOTE_CHUNK_SIZE,
+    QUOTES_PATH,
+    REQUEST_TIMEOUT,
+)
+from .market import Listing
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CoinMarketCapError(Exception):
+    """Base error for CoinMarketCap API calls."""
+
+
+class CoinMarketCapConnectionError(CoinMarketCapError):
+    """The API could not be reached or answered with a server error."""
+
+
+class CoinMarketCapAuthError(CoinMarketCapError):
+    """The API key was rejected."""
+
+
+class CoinMarketCapInvalidRequestError(CoinMarketCapError):
+    """The API rejected the request parameters, e.g. an unknown symbol."""
+
+
+class CoinMarketCapRateLimitError(CoinMarketCapError):
+    """The API answered with 429 Too Many Requests."""
+
+    def __init__(self, message, retry_after=None):
+        """Initialize."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CoinMarketCapCircuitOpenError(CoinMarketCapError):
+    """Requests are blocked until the circuit breaker closes again."""
+
+
+def parse_quote_prices(raw, convert):
+    """Decode a quotes payload, keeping only the price of each coin.
+
+    Returns ``{"status": ..., "data": {key: price}}`` where ``key`` is the
+    symbol or ID string the coin was requested by.
+    """
+    payload = json_loads(raw)
+    prices = {}
+    for key, coin in (payload.get("data") or {}).items():
+        if isinstance(coin, list):
+            coin = coin[0] if coin else None
+        if coin:
+            prices[key] = coin["quote"][convert]["price"]
+    return {"status": payload.get("status") or {}, "data": prices}
+
+
+def parse_map(raw):
+    """Decode a map payload into ``(id, symbol, name, slug, rank)`` tuples."""
+    payload = json_loads(raw)
+    return {
+        "status": payload.get("status") or {},
+        "data": [
+            (coin["id"], coin["symbol"], coin["name"], coin["slug"], coin.get("rank"))
+            for coin in payload["data"]
+        ],
+    }
+
+
+def parse_ohlcv(raw, convert):
+    """Decode a historical OHLCV payload into bars.
+
+    Returns ``{"status": ..., "data": {key: [(time, open, high, low, close,
+    volume), ...]}}`` where ``key`` is the symbol or ID string the coin was
+    requested by and ``time`` is the start of the bar as a Unix timestamp.
+    """
+    payload = json_loads(raw)
+    data = payload.get("data") or {}
+    if "quotes" in data:
+        # A single coin may come back unwrapped, so key it by ID and symbol.
+        data = {str(data["id"]): data, data["symbol"]: data}
+    bars = {}
+    for key, coin in data.items():
+        if isinstance(coin, list):
+            coin = coin[0] if coin else None
+        if not coin:
+            continue
+        rows = []
+        for item in coin.get("quotes") or []:
+            quote = item["quote"][convert]
+            rows.append((
+                dt_util.parse_datetime(item["time_open"]).timestamp(),
+                quote["open"],
+                quote["high"],
+                quote["low"],
+                quote["close"],
+                quote["volume"],
+            ))
+        bars[key] = rows
+    return {"status": payload.get("status") or {}, "data": bars}
+
+
+def parse_listings(raw, convert):
+    """Decode a listings payload into ``Listing`` tuples, best rank first."""
+    payload = json_loads(raw)
+    listings = []
+    for coin in payload.get("data") or []:
+        quote = (coin.get("quote") or {}).get(convert)
+        if not quote:
+            continue
+        listings.append(Listing(
+            coin["id"],
+            coin["symbol"],
+            coin["name"],
+            coin.get("cmc_rank"),
+            quote.get("price"),
+            quote.get("market_cap"),
+            quote.get("volume_24h"),
+            quote.get("percent_change_1h"),
+            quote.get("percent_change_24h"),
+            quote.get("percent_change_7d"),
+            quote.get("market_cap_dominance"),
+        ))
+    return {"status": payload.get("status") or {}, "data": listings}
+
+
+class CircuitBreaker:
+    """Stop calling the API after repeated failures.
+
+    The breaker opens after ``failure_threshold`` consecutive failed requests
+    or when the API asks us to back off. Once ``reset_timeout`` has passed it
+    is half open: a single trial request is let through while the others
+    still fail fast, and the trial's outcome closes or reopens it.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT, clock=time.monotonic):
+        """Initialize."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.failures = 0
+        self.opened_until = None
+        self.trial = False
+
+    @property
+    def is_open(self):
+        """Return True while requests are blocked."""
+        if self.opened_until is None:
+            return False
+        return self.trial or self._clock() < self.opened_until
+
+    @property
+    def half_open(self):
+        """Return True once the reset timeout has passed until a trial decides."""
+        return self.opened_until is not None and self._clock() >= self.opened_until
+
+    def allow(self):
+        """Raise if the breaker is open, return True for the trial request."""
+        if self.opened_until is None:
+            return False
+        if self._clock() < self.opened_until:
+            raise CoinMarketCapCircuitOpenError(
+                f"CoinMarketCap requests paused for {self.opened_until - self._clock():.0f}s"
+            )
+        if self.trial:
+            raise CoinMarketCapCircuitOpenError("CoinMarketCap requests paused until the trial request finished")
+        self.trial = True
+        return True
+
+    def release(self):
+        """End a trial that neither succeeded nor failed, like a cancelled request."""
+        self.trial = False
+
+    def record_success(self):
+        """Close the breaker."""
+        self.failures = 0
+        self.opened_until = None
+        self.trial = False
+
+    def record_failure(self, open_for=None):
+        """Count a failure and open the breaker when needed."""
+        self.failures += 1
+        if self.trial or open_for is not None or self.failures >= self.failure_threshold:
+            self.opened_until = self._clock() + max(open_for or 0, self.reset_timeout)
+        self.trial = False
+
+
+class ApiClient(ABC):
+    """Base HTTP client with timeouts, retries and a circuit breaker.
+
+    Subclasses set ``name``, implement ``async_get_quotes`` and may add
+    request headers. Quote providers
+    set ``chunk_size`` to the most coins one quote request may ask for, or
+    leave it None when one request returns every coin. Every error is
+    raised as a ``CoinMarketCapError`` subclass, whatever the backend.
+    """
+
+    name = None
+    chunk_size = None
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        base_url,
+        timeout=REQUEST_TIMEOUT,
+        max_retries=MAX_RETRIES,
+        breaker=None,
+        sleep=asyncio.sleep,
+        executor=None,
+        metrics=None,
+    ):
+        """Initialize."""
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.metrics = metrics
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self._executor = executor
+
+    def _headers(self):
+        """Return the headers sent with every request."""
+        return {"Accept": "application/json"}
+
+    @staticmethod
+    def _backoff(attempt):
+        """Return a jittered exponential backoff delay in seconds."""
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response):
+        """Return the Retry-After header in seconds, if present."""
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return None
+
+    def _record_error(self, err):
+        """Count a failed request attempt."""
+        if self.metrics is not None:
+            self.metrics.record_error(err)
+
+    async def _async_parse(self, raw, parser):
+        """Decode a response body, off the event loop when it is large."""
+        start = time.monotonic()
+        if self._executor is not None and len(raw) >= PARSE_EXECUTOR_THRESHOLD:
+            payload = await self._executor(parser, raw)
+        else:
+            payload = parser(raw)
+        if self.metrics is not None:
+            self.metrics.observe("parse", time.monotonic() - start)
+            self.metrics.bytes_parsed += len(raw)
+        return payload
+
+    async def _async_request(self, path, params, parser):
+        """Perform a single request and return the decoded payload."""
+        if self.metrics is not None:
+            self.metrics.requests += 1
+        start = time.monotonic()
+        async with self.session.get(
+            f"{self.base_url}{path}", params=params, headers=self._headers(), timeout=self.timeout
+        ) as response:
+            if response.status == 200:
+                raw = await response.read()
+            elif response.status == 429:
+                raise CoinMarketCapRateLimitError("Rate limit exceeded", self._retry_after(response))
+            elif response.status in (401, 403):
+                raise CoinMarketCapAuthError(f"API key rejected: {response.status}")
+            elif response.status == 400:
+                raise CoinMarketCapInvalidRequestError(f"Invalid request: {await response.text()}")
+            else:
+                raise CoinMarketCapConnectionError(f"Unexpected status: {response.status}")
+
+        if self.metrics is not None:
+            self.metrics.observe("http", time.monotonic() - start)
+        return await self._async_parse(raw, parser or json_loads)
+
+    async def async_get(self, path, params=None, parser=None):
+        """GET an API path, retrying transient failures.
+
+        ``parser`` turns the raw response body into the returned value and
+        defaults to a full JSON decode.
+        """
+        trial = self.breaker.allow()
+        try:
+            return await self._async_get_retrying(path, params, parser)
+        finally:
+            if trial:
+                # A trial that was cancelled, e.g. by a faster hedged request,
+                # decided nothing; let the next request try instead
+                self.breaker.release()
+
+    async def _async_get_retrying(self, path, params, parser):
+        """GET an API path, retrying transient failures and updating the breaker."""
+        attempt = 0
+        while True:
+            try:
+                payload = await self._async_request(path, params, parser)
+            except (CoinMarketCapAuthError, CoinMarketCapInvalidRequestError) as err:
+                self._record_error(err)
+                self.breaker.record_success()
+                raise
+            except CoinMarketCapRateLimitError as err:
+                self._record_error(err)
+                if attempt >= self.max_retries or (err.retry_after or 0) > BACKOFF_MAX:
+                    self.breaker.record_failure(open_for=err.retry_after)
+                    raise
+                delay = err.retry_after if err.retry_after is not None else self._backoff(attempt)
+            except (aiohttp.ClientError, asyncio.TimeoutError, CoinMarketCapConnectionError) as err:
+                self._record_error(err)
+                if attempt >= self.max_retries:
+                    self.breaker.record_failure()
+                    if isinstance(err, CoinMarketCapConnectionError):
+                        raise
+                    raise CoinMarketCapConnectionError(f"Error communicating with {self.name}: {err!r}") from err
+                delay = self._backoff(attempt)
+            else:
+                self.breaker.record_success()
+                return payload
+
+            attempt += 1
+            if self.metrics is not None:
+                self.metrics.retries += 1
+            _LOGGER.debug("Retrying %s in %.1fs (attempt %s)", path, delay, attempt)
+            await self._sleep(delay)
+
+    @abstractmethod
+    async def async_get_quotes(self, convert, symbols=None, ids=None):
+        """Return ``{"status": ..., "data": {key: price}}`` for the coins in ``convert``.
+
+        This is the quote provider interface. ``key`` is the ID string for
+        coins requested by ID and the symbol otherwise; unknown coins are
+        left out. ``status["credit_count"]`` reports the credits spent.
+        """
+
+
+class CoinMarketCapApiClient(ApiClient):
+    """Client and quote provider for the CoinMarketCap API."""
+
+    name = "coinmarketcap"
+    chunk_size = QUOTE_CHUNK_SIZE
+
+    def __init__(self, session: aiohttp.ClientSession, api_key: str, base_url=API_BASE_URL, **kwargs):
+        """Initialize."""
+        super().__init__(session, base_url, **kwargs)
+        self.api_key = api_key
+
+    def _headers(self):
+        """Return the headers sent with every request."""
+        return {**super()._headers(), "X-CMC_PRO_API_KEY": self.api_key}
+
+    async def async_get_quotes(self, convert, symbols=None, ids=None):
+        """Return the latest prices for symbols or IDs in ``convert``.
+
+        The payload is reduced by ``parse_quote_prices``; prices requested by
+        ID are keyed by the ID string.
+        """
+        params = {"convert": convert, "skip_invalid": "true"}
+        if ids:
+            params["id"] = ",".join(str(coin_id) for coin_id in ids)
+        else:
+            params["symbol"] = ",".join(symbols)
+        return await self.async_get(QUOTES_PATH, params, partial(parse_quote_prices, convert=convert))
+
+    async def async_get_ohlcv_historical(self, convert, time_start, time_end, symbols=None, ids=None, interval="hourly"):
+        """Return OHLCV bars between two Unix timestamps, reduced by ``parse_ohlcv``."""
+        params = {
+            "convert": convert,
+            "time_period": interval,
+            "interval": interval,
+            "time_start": str(int(time_start)),
+            "time_end": str(int(time_end)),
+            "skip_invalid": "true",
+        }
+        if ids:
+            params["id"] = ",".join(str(coin_id) for coin_id in ids)
+        else:
+            params["symbol"] = ",".join(symbols)
+        return await self.async_get(OHLCV_HISTORICAL_PATH, params, partial(parse_ohlcv, convert=convert))
+
+    async def async_get_price_conversion(self, symbol, convert, amount=1):
+        """Return the value of ``amount`` units of ``symbol`` in ``convert``."""
+        return await self.async_get(
+            PRICE_CONVERSION_PATH,
+            {"amount": str(amount), "symbol": symbol, "convert": convert},
+        )
+
+    async def async_get_listings(self, limit=100, convert="USD"):
+        """Return the top ``limit`` coins by market cap, reduced by ``parse_listings``."""
+        return await self.async_get(
+            LISTINGS_PATH,
+            {"start": "1", "limit": str(limit), "convert": convert},
+            partial(parse_listings, convert=convert),
+        )
+
+    async def async_get_map(self, start=1, limit=5000):
+        """Return a page of the active cryptocurrency map, reduced by ``parse_map``."""
+        return await self.async_get(
+            MAP_PATH,
+            {"listing_status": "active", "sort": "cmc_rank", "start": str(start), "limit": str(limit)},
+            parse_map,
+        )
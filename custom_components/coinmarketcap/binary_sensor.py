@@ -0,0 +1,90 @@
+"""Binary sensors for CoinMarketCap price alerts."""
+
+from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .alerts import RULE_MOVE, describe
+from .const import DOMAIN, SIGNAL_ALERT, SIGNAL_ENTRY_UPDATED
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback):
+    """Set up a binary sensor per alert rule."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    alert_sensors = {
+        rule.key: CoinMarketCapAlertBinarySensor(coordinator, rule)
+        for rule in coordinator.alerts.rules
+    }
+    async_add_entities(list(alert_sensors.values()))
+
+    @callback
+    def async_entry_updated():
+        """Add and remove alert sensors after an in-place options change."""
+        rules = {rule.key: rule for rule in coordinator.alerts.rules}
+        registry = er.async_get(hass)
+
+        for key in [key for key in alert_sensors if key not in rules]:
+            sensor = alert_sensors.pop(key)
+            if sensor.entity_id and registry.async_get(sensor.entity_id):
+                registry.async_remove(sensor.entity_id)
+            else:
+                hass.async_create_task(sensor.async_remove())
+
+        new_sensors = []
+        for key, rule in rules.items():
+            sensor = alert_sensors.get(key)
+            if sensor is None:
+                sensor = alert_sensors[key] = CoinMarketCapAlertBinarySensor(coordinator, rule)
+                new_sensors.append(sensor)
+            elif sensor.hass is not None:
+                # The rule states were rebuilt from the current prices
+                sensor.async_write_ha_state()
+
+        if new_sensors:
+            async_add_entities(new_sensors)
+
+    entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_ENTRY_UPDATED.format(entry.entry_id), async_entry_updated)
+    )
+
+class CoinMarketCapAlertBinarySensor(BinarySensorEntity):
+    """On while the condition of an alert rule holds.
+
+    The sensor is not a coordinator entity: it is only written when the rule
+    engine reports a state change, not on every price update.
+    """
+
+    _attr_icon = "mdi:bell-ring"
+    _attr_should_poll = False
+
+    def __init__(self, coordinator, rule):
+        """Initialize the sensor."""
+        self.coordinator = coordinator
+        self.rule = rule
+        self._attr_name = f"Alert {describe(rule)}"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.entry_id}_alert_{rule.key}"
+        self._attr_extra_state_attributes = {
+            "cryptocurrency": rule.symbol,
+            "type": rule.kind,
+            "value": rule.value,
+            "currency": coordinator.currencies[0],
+        }
+        if rule.kind == RULE_MOVE:
+            self._attr_extra_state_attributes["window_hours"] = rule.window / 3600
+
+    @property
+    def is_on(self):
+        """Return True while the rule condition holds."""
+        return self.coordinator.alerts.state.get(self.rule.key, False)
+
+    async def async_added_to_hass(self):
+        """Follow the state changes of the rule."""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_ALERT.format(self.coordinator.entry_id, self.rule.key),
+                self.async_write_ha_state,
+            )
+        )
@@ -0,0 +1,144 @@
+"""Cached catalog of CoinMarketCap symbols for the config and options flows."""
+
+from bisect import bisect_left
+import difflib
+import logging
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .api import CoinMarketCapApiClient, CoinMarketCapError
+from .const import CATALOG_PAGE_SIZE, CATALOG_TTL, DATA_CATALOG, DOMAIN, STORAGE_VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CoinMarketCapCatalog:
+    """Local copy of ``/v1/cryptocurrency/map`` with a search index.
+
+    Coins are kept as ``(id, symbol, name, slug, rank)`` tuples. Symbols are
+    not unique on CoinMarketCap, so lookups prefer the best ranked coin and
+    callers should store the returned ID rather than the symbol.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        """Initialize."""
+        self.hass = hass
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.catalog")
+        self.coins = []
+        self.updated = None
+        self._by_symbol = {}
+        self._by_id = {}
+        self._index = []
+
+    @property
+    def expired(self):
+        """Return True if the catalog should be refreshed."""
+        return self.updated is None or dt_util.utcnow() - self.updated >= CATALOG_TTL
+
+    def _build_index(self):
+        """Rebuild the lookup tables and the sorted prefix index."""
+        ranked = sorted(self.coins, key=lambda coin: (coin[4] is None, coin[4] or 0))
+        self._by_symbol = {}
+        self._by_id = {}
+        index = []
+        for position, coin in enumerate(ranked):
+            coin_id, symbol, name, slug, _ = coin
+            self._by_symbol.setdefault(symbol.upper(), []).append(coin)
+            self._by_id[coin_id] = coin
+            for key in {symbol.lower(), name.lower(), slug.lower()}:
+                index.append((key, position))
+        index.sort()
+        self.coins = ranked
+        self._index = index
+
+    async def async_load(self, client: CoinMarketCapApiClient = None):
+        """Load the catalog from disk and refresh it once it expired."""
+        if not self.coins:
+            stored = await self._store.async_load()
+            if stored:
+                self.coins = [tuple(coin) for coin in stored["coins"]]
+                self.updated = dt_util.parse_datetime(stored["updated"])
+                self._build_index()
+
+        if client is not None and self.expired:
+            try:
+                await self._async_refresh(client)
+            except CoinMarketCapError as err:
+                _LOGGER.warning("Failed to refresh the CoinMarketCap catalog: %s", err)
+
+    async def _async_refresh(self, client):
+        """Download the full symbol map."""
+        coins = []
+        start = 1
+        while True:
+            payload = await client.async_get_map(start=start, limit=CATALOG_PAGE_SIZE)
+            page = payload["data"]
+            coins.extend(page)
+            if len(page) < CATALOG_PAGE_SIZE:
+                break
+            start += CATALOG_PAGE_SIZE
+
+        self.coins = coins
+        self.updated = dt_util.utcnow()
+        self._build_index()
+        await self._store.async_save({
+            "updated": self.updated.isoformat(),
+            "coins": [list(coin) for coin in self.coins],
+        })
+
+    def top(self, limit):
+        """Return the best ranked coins."""
+        return self.coins[:limit]
+
+    def get(self, coin_id):
+        """Return the coin with this CoinMarketCap ID."""
+        return self._by_id.get(coin_id)
+
+    def resolve(self, query):
+        """Return the best ranked coin whose symbol, slug or name equals ``query``."""
+        if not query:
+            return None
+        matches = self._by_symbol.get(query.upper())
+        if matches:
+            return matches[0]
+        key = query.lower()
+        position = bisect_left(self._index, (key, -1))
+        if position < len(self._index) and self._index[position][0] == key:
+            return self.coins[self._index[position][1]]
+        return None
+
+    def search(self, query, limit=10):
+        """Return coins matching ``query`` by prefix, falling back to fuzzy matching."""
+        key = query.lower()
+        positions = set()
+        start = bisect_left(self._index, (key, -1))
+        for candidate, position in self._index[start:]:
+            if not candidate.startswith(key):
+                break
+            positions.add(position)
+
+        if not positions:
+            keys = [candidate for candidate, _ in self._index]
+            for match in difflib.get_close_matches(key, keys, n=limit, cutoff=0.75):
+                positions.add(self._index[bisect_left(self._index, (match, -1))][1])
+
+        return [self.coins[position] for position in sorted(positions)[:limit]]
+
+
+async def async_get_catalog(hass: HomeAssistant, api_key: str) -> CoinMarketCapCatalog:
+    """Return the shared catalog, loading or refreshing it when needed."""
+    hass.data.setdefault(DOMAIN, {})
+    catalog = hass.data[DOMAIN].get(DATA_CATALOG)
+    if catalog is None:
+        catalog = hass.data[DOMAIN][DATA_CATALOG] = CoinMarketCapCatalog(hass)
+
+    client = None
+    if api_key and catalog.expired:
+        client = CoinMarketCapApiClient(
+            async_get_clientsession(hass), api_key, max_retries=1, executor=hass.async_add_executor_job
+        )
+    await catalog.async_load(client)
+    return catalog
@@ -6,39 +6,110 @@ from homeassistant.helpers.aiohttp_client import async_get_clientsession
 import logging
 from decimal import Decimal, InvalidOperation
 
+from .alerts import parse_rules
+from .api import CoinMarketCapApiClient, CoinMarketCapError, CoinMarketCapInvalidRequestError
+from .catalog import async_get_catalog
+from .coordinator import get_currencies, get_history_windows, get_stream_symbols
+from .portfolio import parse_portfolios
 from .const import (
     DOMAIN,
     CONF_API_KEY,
     CONF_CRYPTOCURRENCIES,
+    CONF_CRYPTOCURRENCY_IDS,
     CONF_CURRENCY,
     CONF_SCAN_INTERVAL,
     CONF_COIN_AMOUNT,
+    CONF_DAILY_CREDIT_BUDGET,
+    CONF_MONTHLY_CREDIT_BUDGET,
+    CONF_MIN_CHANGE,
+    CONF_MIN_CHANGE_PERCENT,
+    CONF_MAX_STATE_AGE,
+    CONF_HISTORY_WINDOWS,
+    CONF_COST_BASIS,
+    CONF_PORTFOLIOS,
+    CONF_ALERTS,
+    CONF_PROVIDER,
+    CONF_STREAM,
+    CONF_PROFILE,
+    CONF_MARKET_OVERVIEW,
+    CONF_STATISTICS,
+    CATALOG_SELECT_LIMIT,
+    DEFAULT_HISTORY_WINDOWS,
+    DEFAULT_PROVIDER,
     DEFAULT_SCAN_INTERVAL,
+    MAX_MARKET_OVERVIEW,
+    PROVIDERS,
+    QUOTES_PATH,
     TOP_CRYPTOCURRENCIES,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
-async def fetch_top_cryptocurrencies(hass, api_key):
-    """Fetch the top 100 cryptocurrencies from CoinMarketCap."""
-    url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/listings/latest"
-    headers = {
-        "X-CMC_PRO_API_KEY": api_key
-    }
-    params = {
-        "start": "1",
-        "limit": "100",
-        "convert": "USD"
+def cryptocurrency_options(catalog, selected):
+    """Return the multi-select options, best ranked coins first."""
+    options = {
+        symbol: f"{name} ({symbol})"
+        for _, symbol, name, _, _ in catalog.top(CATALOG_SELECT_LIMIT)
     }
+    if not options:
+        options = dict(TOP_CRYPTOCURRENCIES)
+    options.update({crypto: crypto for crypto in selected if crypto not in options})
+    return options
+
+class UntrackedPortfolioCoin(ValueError):
+    """A named portfolio holds a coin the entry does not track."""
+
+def validate_portfolios(value, cryptocurrencies):
+    """Parse named portfolios and check that they only hold tracked coins."""
+    portfolios = parse_portfolios(value)
+    for name, holdings in portfolios.items():
+        untracked = sorted(set(holdings) - set(cryptocurrencies))
+        if untracked:
+            raise UntrackedPortfolioCoin(f"Portfolio {name} holds untracked coins: {', '.join(untracked)}")
+    return portfolios
+
+def resolve_cryptocurrency_ids(catalog, cryptocurrencies, known_ids):
+    """Map the selected symbols to stable CoinMarketCap IDs where possible."""
+    ids = {}
+    for crypto in cryptocurrencies:
+        if crypto in known_ids:
+            ids[crypto] = known_ids[crypto]
+        elif (coin := catalog.resolve(crypto)) is not None:
+            ids[crypto] = coin[0]
+    return ids
+
+async def validate_cryptocurrency(hass, api_key, symbol):
+    """Return True if CoinMarketCap knows the symbol."""
+    client = CoinMarketCapApiClient(async_get_clientsession(hass), api_key, max_retries=1)
+    try:
+        data = await client.async_get(QUOTES_PATH, {"symbol": symbol})
+    except CoinMarketCapInvalidRequestError:
+        return False
+    return symbol in data["data"]
+
+async def lookup_cryptocurrency(hass, api_key, query):
+    """Resolve a symbol, name or slug entered by the user.
+
+    Returns ``(symbol, coin_id, suggestions)``. The cached catalog answers
+    offline; only when it is unavailable the symbol is checked online.
+    """
+    catalog = await async_get_catalog(hass, api_key)
+    if catalog.coins:
+        coin = catalog.resolve(query)
+        if coin is not None:
+            return coin[1], coin[0], []
+        return None, None, catalog.search(query, limit=5)
 
-    session = async_get_clientsession(hass)
-    
-    async with session.get(url, headers=headers, params=params) as response:
-        if response.status == 200:
-            data = await response.json()
-            return [crypto["symbol"] for crypto in data["data"]]
-        else:
-            raise Exception(f"Error fetching top cryptocurrencies: {response.status}")
+    symbol = query.upper()
+    if await validate_cryptocurrency(hass, api_key, symbol):
+        return symbol, None, []
+    return None, None, []
+
+def format_suggestions(coins):
+    """Return a short hint listing similar coins."""
+    if not coins:
+        return ""
+    return ", ".join(f"{symbol} ({name})" for _, symbol, name, _, _ in coins)
 
 class CoinMarketCapConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
@@ -46,6 +117,7 @@ class CoinMarketCapConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self):
         self.api_key = None
         self.cryptocurrencies = set()
+        self.cryptocurrency_ids = {}
 
     async def async_step_user(self, user_input=None):
         errors = {}
@@ -73,51 +145,39 @@ class CoinMarketCapConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 else:
                     errors["base"] = "no_cryptocurrencies"
 
-        try:
-            top_cryptos = await fetch_top_cryptocurrencies(self.hass, self.api_key)
-            all_cryptocurrencies = {**{crypto: crypto for crypto in top_cryptos}, **TOP_CRYPTOCURRENCIES}
-            all_cryptocurrencies.update({crypto: crypto for crypto in self.cryptocurrencies if crypto not in all_cryptocurrencies})
-
-            return self.async_show_form(
-                step_id="select_cryptocurrencies",
-                data_schema=vol.Schema({
-                    vol.Optional(CONF_CRYPTOCURRENCIES, default=list(self.cryptocurrencies)): cv.multi_select(all_cryptocurrencies),
-                    vol.Optional("add_custom"): bool,
-                }),
-                errors=errors,
-            )
-        except Exception as e:
-            _LOGGER.error(f"Failed to fetch top cryptocurrencies: {e}")
+        catalog = await async_get_catalog(self.hass, self.api_key)
+        if not catalog.coins and not errors:
             errors["base"] = "cannot_connect"
-            return self.async_show_form(
-                step_id="select_cryptocurrencies",
-                data_schema=vol.Schema({
-                    vol.Optional(CONF_CRYPTOCURRENCIES, default=list(self.cryptocurrencies)): cv.multi_select(TOP_CRYPTOCURRENCIES),
-                    vol.Optional("add_custom"): bool,
-                }),
-                errors=errors,
-            )
+
+        return self.async_show_form(
+            step_id="select_cryptocurrencies",
+            data_schema=vol.Schema({
+                vol.Optional(CONF_CRYPTOCURRENCIES, default=list(self.cryptocurrencies)): cv.multi_select(
+                    cryptocurrency_options(catalog, self.cryptocurrencies)
+                ),
+                vol.Optional("add_custom"): bool,
+            }),
+            errors=errors,
+        )
 
     async def async_step_add_cryptocurrency(self, user_input=None):
         errors = {}
+        suggestions = []
+
         if user_input is not None:
-            symbol = user_input["symbol"].upper()
             try:
-                session = async_get_clientsession(self.hass)
-                url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest"
-                params = {"symbol": symbol}
-                headers = {"X-CMC_PRO_API_KEY": self.api_key}
-                
-                async with session.get(url, params=params, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if symbol in data["data"]:
-                            self.cryptocurrencies.add(symbol)
-                            return await self.async_step_select_cryptocurrencies()
-                        else:
-                            errors["base"] = "invalid_cryptocurrency"
-                    else:
-                        errors["base"] = "cannot_connect"
+                symbol, coin_id, suggestions = await lookup_cryptocurrency(
+                    self.hass, self.api_key, user_input["symbol"].strip()
+                )
+                if symbol is not None:
+                    self.cryptocurrencies.add(symbol)
+                    if coin_id is not None:
+                        self.cryptocurrency_ids[symbol] = coin_id
+                    return await self.async_step_select_cryptocurrencies()
+                errors["base"] = "invalid_cryptocurrency"
+            except CoinMarketCapError as e:
+                _LOGGER.error(f"Failed to validate cryptocurrency: {e}")
+                errors["base"] = "cannot_connect"
             except Exception as e:
                 _LOGGER.exception(f"Unexpected error occurred: {str(e)}")
                 errors["base"] = "unknown"
@@ -128,6 +188,7 @@ class CoinMarketCapConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 vol.Required("symbol"): str,
             }),
             errors=errors,
+            description_placeholders={"suggestions": format_suggestions(suggestions)},
         )
 
     async def async_step_coin_amounts(self, user_input=None):
@@ -136,22 +197,53 @@ class CoinMarketCapConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         if user_input is not None:
             try:
                 coin_amounts = {}
+                cost_basis = {}
                 for crypto in self.cryptocurrencies:
                     amount_key = f"amount_{crypto}"
                     if amount_key in user_input:
                         coin_amounts[crypto] = str(Decimal(str(user_input[amount_key])))
+                    cost = user_input.get(f"cost_{crypto}")
+                    if cost:
+                        cost_basis[crypto] = str(Decimal(str(cost)))
 
+                currencies = get_currencies(user_input)
+                if not currencies:
+                    raise InvalidOperation("No currency given")
+                get_history_windows(user_input)
+                validate_portfolios(user_input.get(CONF_PORTFOLIOS, ""), self.cryptocurrencies)
+                parse_rules(user_input.get(CONF_ALERTS, ""))
+
+                catalog = await async_get_catalog(self.hass, self.api_key)
                 return self.async_create_entry(
                     title="CoinMarketCap",
                     data={
                         CONF_API_KEY: self.api_key,
                         CONF_CRYPTOCURRENCIES: list(self.cryptocurrencies),
-                        CONF_CURRENCY: user_input[CONF_CURRENCY],
+                        CONF_CRYPTOCURRENCY_IDS: resolve_cryptocurrency_ids(
+                            catalog, self.cryptocurrencies, self.cryptocurrency_ids
+                        ),
+                        CONF_CURRENCY: currencies,
                         CONF_SCAN_INTERVAL: int(user_input[CONF_SCAN_INTERVAL]),
+                        CONF_PROVIDER: user_input.get(CONF_PROVIDER, DEFAULT_PROVIDER),
+                        CONF_STREAM: ", ".join(get_stream_symbols(user_input)),
+                        CONF_PROFILE: user_input.get(CONF_PROFILE, False),
+                        CONF_MARKET_OVERVIEW: int(user_input.get(CONF_MARKET_OVERVIEW, 0)),
+                        CONF_STATISTICS: user_input.get(CONF_STATISTICS, False),
+                        CONF_DAILY_CREDIT_BUDGET: int(user_input.get(CONF_DAILY_CREDIT_BUDGET, 0)),
+                        CONF_MONTHLY_CREDIT_BUDGET: int(user_input.get(CONF_MONTHLY_CREDIT_BUDGET, 0)),
+                        CONF_MIN_CHANGE: float(user_input.get(CONF_MIN_CHANGE, 0)),
+                        CONF_MIN_CHANGE_PERCENT: float(user_input.get(CONF_MIN_CHANGE_PERCENT, 0)),
+                        CONF_MAX_STATE_AGE: int(user_input.get(CONF_MAX_STATE_AGE, 0)),
+                        CONF_HISTORY_WINDOWS: user_input.get(CONF_HISTORY_WINDOWS, DEFAULT_HISTORY_WINDOWS),
+                        CONF_PORTFOLIOS: user_input.get(CONF_PORTFOLIOS, "").strip(),
+                        CONF_ALERTS: user_input.get(CONF_ALERTS, "").strip(),
                         CONF_COIN_AMOUNT: coin_amounts,
+                        CONF_COST_BASIS: cost_basis,
                     },
                 )
-            except InvalidOperation:
+            except UntrackedPortfolioCoin:
+                errors["base"] = "untracked_portfolio_coin"
+            except (InvalidOperation, ValueError):
                 errors["base"] = "invalid_input"
             except Exception as e:
                 _LOGGER.exception(f"Unexpected error occurred: {str(e)}")
@@ -160,10 +252,24 @@ class CoinMarketCapConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         data_schema = {
             vol.Required(CONF_CURRENCY, default="USD"): str,
             vol.Required(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): int,
+            vol.Optional(CONF_PROVIDER, default=DEFAULT_PROVIDER): vol.In(PROVIDERS),
+            vol.Optional(CONF_STREAM, default=""): str,
+            vol.Optional(CONF_PROFILE, default=False): bool,
+            vol.Optional(CONF_STATISTICS, default=False): bool,
+            vol.Optional(CONF_MARKET_OVERVIEW, default=0): vol.All(vol.Coerce(int), vol.Range(min=0, max=MAX_MARKET_OVERVIEW)),
+            vol.Optional(CONF_DAILY_CREDIT_BUDGET, default=0): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(CONF_MONTHLY_CREDIT_BUDGET, default=0): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(CONF_MIN_CHANGE, default=0.0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_MIN_CHANGE_PERCENT, default=0.0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_MAX_STATE_AGE, default=0): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(CONF_HISTORY_WINDOWS, default=DEFAULT_HISTORY_WINDOWS): str,
+            vol.Optional(CONF_PORTFOLIOS, default=""): str,
+            vol.Optional(CONF_ALERTS, default=""): str,
         }
         
         for crypto in self.cryptocurrencies:
             data_schema[vol.Optional(f"amount_{crypto}", default=0.0)] = vol.Coerce(float)
+            data_schema[vol.Optional(f"cost_{crypto}", default=0.0)] = vol.All(vol.Coerce(float), vol.Range(min=0))
 
         return self.async_show_form(
             step_id="coin_amounts",
@@ -180,7 +286,9 @@ class CoinMarketCapOptionsFlow(config_entries.OptionsFlow):
     def __init__(self, config_entry):
         self.config_entry = config_entry
         self.cryptocurrencies = set(config_entry.data[CONF_CRYPTOCURRENCIES])
+        self.cryptocurrency_ids = dict(config_entry.data.get(CONF_CRYPTOCURRENCY_IDS, {}))
         self.coin_amounts = config_entry.data.get(CONF_COIN_AMOUNT, {})
+        self.cost_basis = config_entry.data.get(CONF_COST_BASIS, {})
         
     async def async_step_init(self, user_input=None):
         errors = {}
@@ -192,54 +300,39 @@ class CoinMarketCapOptionsFlow(config_entries.OptionsFlow):
                 self.cryptocurrencies = set(user_input.get(CONF_CRYPTOCURRENCIES, []))
                 return await self.async_step_coin_amounts()
 
-        try:
-            top_cryptos = await fetch_top_cryptocurrencies(self.hass, self.config_entry.data[CONF_API_KEY])
-            all_cryptocurrencies = {**{crypto: crypto for crypto in top_cryptos}, **TOP_CRYPTOCURRENCIES}
-            all_cryptocurrencies.update({crypto: crypto for crypto in self.cryptocurrencies if crypto not in all_cryptocurrencies})
-            
-            return self.async_show_form(
-                step_id="init",
-                data_schema=vol.Schema({
-                    vol.Optional(CONF_CRYPTOCURRENCIES, default=list(self.cryptocurrencies)): cv.multi_select(all_cryptocurrencies),
-                    vol.Optional("add_custom"): bool,
-                }),
-                errors=errors,
-            )
-        except Exception as e:
-            _LOGGER.error(f"Failed to fetch top cryptocurrencies: {e}")
+        catalog = await async_get_catalog(self.hass, self.config_entry.data[CONF_API_KEY])
+        if not catalog.coins:
             errors["base"] = "cannot_connect"
-            return self.async_show_form(
-                step_id="init",
-                data_schema=vol.Schema({
-                    vol.Optional(CONF_CRYPTOCURRENCIES, default=list(self.cryptocurrencies)): cv.multi_select(TOP_CRYPTOCURRENCIES),
-                    vol.Optional("add_custom"): bool,
-                }),
-                errors=errors,
-            )
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema({
+                vol.Optional(CONF_CRYPTOCURRENCIES, default=list(self.cryptocurrencies)): cv.multi_select(
+                    cryptocurrency_options(catalog, self.cryptocurrencies)
+                ),
+                vol.Optional("add_custom"): bool,
+            }),
+            errors=errors,
+        )
 
     async def async_step_add_cryptocurrency(self, user_input=None):
         errors = {}
-        
+        suggestions = []
+
         if user_input is not None:
-            symbol = user_input["symbol"].upper()
-            
             try:
-                session = async_get_clientsession(self.hass)
-                url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest"
-                params = {"symbol": symbol}
-                headers = {"X-CMC_PRO_API_KEY": self.config_entry.data[CONF_API_KEY]}
-                
-                async with session.get(url, params=params, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if symbol in data["data"]:
-                            self.cryptocurrencies.add(symbol)
-                            return await self.async_step_init()
-                        else:
-                            errors["base"] = "invalid_cryptocurrency"
-                    else:
-                        errors["base"] = "cannot_connect"
-                    
+                symbol, coin_id, suggestions = await lookup_cryptocurrency(
+                    self.hass, self.config_entry.data[CONF_API_KEY], user_input["symbol"].strip()
+                )
+                if symbol is not None:
+                    self.cryptocurrencies.add(symbol)
+                    if coin_id is not None:
+                        self.cryptocurrency_ids[symbol] = coin_id
+                    return await self.async_step_init()
+                errors["base"] = "invalid_cryptocurrency"
+            except CoinMarketCapError as e:
+                _LOGGER.error(f"Failed to validate cryptocurrency: {e}")
+                errors["base"] = "cannot_connect"
             except Exception as e:
                 _LOGGER.exception(f"Unexpected error occurred: {str(e)}")
                 errors["base"] = "unknown"
@@ -250,6 +343,7 @@ class CoinMarketCapOptionsFlow(config_entries.OptionsFlow):
                 vol.Required("symbol"): str,
             }),
             errors=errors,
+            description_placeholders={"suggestions": format_suggestions(suggestions)},
         )
 
     async def async_step_coin_amounts(self, user_input=None):
@@ -258,33 +352,78 @@ class CoinMarketCapOptionsFlow(config_entries.OptionsFlow):
         if user_input is not None:
             try:
                 coin_amounts = {}
+                cost_basis = {}
                 for crypto in self.cryptocurrencies:
                     amount_key = f"amount_{crypto}"
                     if amount_key in user_input:
                         coin_amounts[crypto] = str(Decimal(str(user_input[amount_key])))
+                    cost = user_input.get(f"cost_{crypto}")
+                    if cost:
+                        cost_basis[crypto] = str(Decimal(str(cost)))
+
+                currencies = get_currencies(user_input)
+                if not currencies:
+                    raise InvalidOperation("No currency given")
+                get_history_windows(user_input)
+                validate_portfolios(user_input.get(CONF_PORTFOLIOS, ""), self.cryptocurrencies)
+                parse_rules(user_input.get(CONF_ALERTS, ""))
 
+                catalog = await async_get_catalog(self.hass, self.config_entry.data[CONF_API_KEY])
                 new_data = {
                     **self.config_entry.data,
                     CONF_CRYPTOCURRENCIES: list(self.cryptocurrencies),
+                    CONF_CRYPTOCURRENCY_IDS: resolve_cryptocurrency_ids(
+                        catalog, self.cryptocurrencies, self.cryptocurrency_ids
+                    ),
                     CONF_COIN_AMOUNT: coin_amounts,
-                    CONF_CURRENCY: user_input[CONF_CURRENCY],
+                    CONF_COST_BASIS: cost_basis,
+                    CONF_CURRENCY: currencies,
                     CONF_SCAN_INTERVAL: int(user_input[CONF_SCAN_INTERVAL]),
+                    CONF_PROVIDER: user_input.get(CONF_PROVIDER, DEFAULT_PROVIDER),
+                    CONF_STREAM: ", ".join(get_stream_symbols(user_input)),
+                    CONF_PROFILE: user_input.get(CONF_PROFILE, False),
+                    CONF_MARKET_OVERVIEW: int(user_input.get(CONF_MARKET_OVERVIEW, 0)),
+                    CONF_STATISTICS: user_input.get(CONF_STATISTICS, False),
+                    CONF_DAILY_CREDIT_BUDGET: int(user_input.get(CONF_DAILY_CREDIT_BUDGET, 0)),
+                    CONF_MONTHLY_CREDIT_BUDGET: int(user_input.get(CONF_MONTHLY_CREDIT_BUDGET, 0)),
+                    CONF_MIN_CHANGE: float(user_input.get(CONF_MIN_CHANGE, 0)),
+                    CONF_MIN_CHANGE_PERCENT: float(user_input.get(CONF_MIN_CHANGE_PERCENT, 0)),
+                    CONF_MAX_STATE_AGE: int(user_input.get(CONF_MAX_STATE_AGE, 0)),
+                    CONF_HISTORY_WINDOWS: user_input.get(CONF_HISTORY_WINDOWS, DEFAULT_HISTORY_WINDOWS),
+                    CONF_PORTFOLIOS: user_input.get(CONF_PORTFOLIOS, "").strip(),
+                    CONF_ALERTS: user_input.get(CONF_ALERTS, "").strip(),
                 }
                 self.hass.config_entries.async_update_entry(self.config_entry, data=new_data)
                 return self.async_create_entry(title="", data={})
-            except InvalidOperation:
+            except UntrackedPortfolioCoin:
+                errors["base"] = "untracked_portfolio_coin"
+            except (InvalidOperation, ValueError):
                 errors["base"] = "invalid_input"
             except Exception as e:
                 _LOGGER.exception(f"Error in options async_step_coin_amounts: {str(e)}")
                 errors["base"] = "unknown"
 
         data_schema = {
-            vol.Required(CONF_CURRENCY, default=self.config_entry.data.get(CONF_CURRENCY, "USD")): str,
+            vol.Required(CONF_CURRENCY, default=", ".join(get_currencies(self.config_entry.data))): str,
             vol.Required(CONF_SCAN_INTERVAL, default=self.config_entry.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)): int,
+            vol.Optional(CONF_PROVIDER, default=self.config_entry.data.get(CONF_PROVIDER, DEFAULT_PROVIDER)): vol.In(PROVIDERS),
+            vol.Optional(CONF_STREAM, default=self.config_entry.data.get(CONF_STREAM, "")): str,
+            vol.Optional(CONF_PROFILE, default=self.config_entry.data.get(CONF_PROFILE, False)): bool,
+            vol.Optional(CONF_STATISTICS, default=self.config_entry.data.get(CONF_STATISTICS, False)): bool,
+            vol.Optional(CONF_MARKET_OVERVIEW, default=self.config_entry.data.get(CONF_MARKET_OVERVIEW, 0)): vol.All(vol.Coerce(int), vol.Range(min=0, max=MAX_MARKET_OVERVIEW)),
+            vol.Optional(CONF_DAILY_CREDIT_BUDGET, default=self.config_entry.data.get(CONF_DAILY_CREDIT_BUDGET, 0)): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(CONF_MONTHLY_CREDIT_BUDGET, default=self.config_entry.data.get(CONF_MONTHLY_CREDIT_BUDGET, 0)): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(CONF_MIN_CHANGE, default=self.config_entry.data.get(CONF_MIN_CHANGE, 0.0)): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_MIN_CHANGE_PERCENT, default=self.config_entry.data.get(CONF_MIN_CHANGE_PERCENT, 0.0)): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_MAX_STATE_AGE, default=self.config_entry.data.get(CONF_MAX_STATE_AGE, 0)): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(CONF_HISTORY_WINDOWS, default=self.config_entry.data.get(CONF_HISTORY_WINDOWS, DEFAULT_HISTORY_WINDOWS)): str,
+            vol.Optional(CONF_PORTFOLIOS, default=self.config_entry.data.get(CONF_PORTFOLIOS, "")): str,
+            vol.Optional(CONF_ALERTS, default=self.config_entry.data.get(CONF_ALERTS, "")): str,
         }
         
         for crypto in self.cryptocurrencies:
             data_schema[vol.Optional(f"amount_{crypto}", default=float(self.coin_amounts.get(crypto, 0)))] = vol.Coerce(float)
+            data_schema[vol.Optional(f"cost_{crypto}", default=float(self.cost_basis.get(crypto, 0)))] = vol.All(vol.Coerce(float), vol.Range(min=0))
 
         return self.async_show_form(
             step_id="coin_amounts",
@@ -4,13 +4,136 @@ from datetime import timedelta
 DOMAIN = "coinmarketcap"
 CONF_API_KEY = "api_key"
 CONF_CRYPTOCURRENCIES = "cryptocurrencies"
+CONF_CRYPTOCURRENCY_IDS = "cryptocurrency_ids"
 CONF_CURRENCY = "currency"
 CONF_SCAN_INTERVAL = "scan_interval"
 CONF_COIN_AMOUNT = "coin_amount"
+CONF_DAILY_CREDIT_BUDGET = "daily_credit_budget"
+CONF_MONTHLY_CREDIT_BUDGET = "monthly_credit_budget"
+CONF_MIN_CHANGE = "min_change"
+CONF_MIN_CHANGE_PERCENT = "min_change_percent"
+CONF_MAX_STATE_AGE = "max_state_age"
+CONF_HISTORY_WINDOWS = "history_windows"
+CONF_COST_BASIS = "cost_basis"
+CONF_PORTFOLIOS = "portfolios"
+CONF_ALERTS = "alerts"
+CONF_PROVIDER = "provider"
+CONF_STREAM = "stream"
+CONF_PROFILE = "profile"
+CONF_MARKET_OVERVIEW = "market_overview"
+CONF_STATISTICS = "statistics"
+
+# Quote providers: CoinMarketCap only, the free Coinbase exchange rates,
+# CoinMarketCap with Coinbase as hedge, or whichever answers faster.
+PROVIDER_COINMARKETCAP = "coinmarketcap"
+PROVIDER_COINBASE = "coinbase"
+PROVIDER_FAILOVER = "failover"
+PROVIDER_FASTEST = "fastest"
+PROVIDERS = [PROVIDER_COINMARKETCAP, PROVIDER_COINBASE, PROVIDER_FAILOVER, PROVIDER_FASTEST]
+DEFAULT_PROVIDER = PROVIDER_COINMARKETCAP
 
 DEFAULT_SCAN_INTERVAL = timedelta(minutes=10)
 
-PLATFORMS = ["sensor"]
+# Indicator windows in hours and samples kept per coin for them.
+DEFAULT_HISTORY_WINDOWS = "1, 24"
+HISTORY_CAPACITY = 1440
+
+DATA_ENGINES = "engines"
+DATA_CATALOG = "catalog"
+DATA_SERIES = "series"
+
+# Dispatched with the entry id when options were applied without a reload.
+SIGNAL_ENTRY_UPDATED = f"{DOMAIN}_entry_updated_{{}}"
+# Dispatched with the entry id and rule key when an alert rule changes state.
+SIGNAL_ALERT = f"{DOMAIN}_alert_{{}}_{{}}"
+# Fired on the event bus when an alert rule triggers.
+EVENT_ALERT = f"{DOMAIN}_alert"
+
+STORAGE_VERSION = 1
+# Seconds to batch snapshot writes to disk.
+SNAPSHOT_SAVE_DELAY = 30
+
+# CoinMarketCap refreshes quotes once a minute, polling faster only burns credits.
+MIN_SCAN_INTERVAL = timedelta(seconds=60)
+MAX_SCAN_INTERVAL = timedelta(hours=6)
+# Credits per quote call: one per 100 symbols and one per extra convert option.
+CREDIT_SYMBOLS_PER_CREDIT = 100
+# In a flat market the adaptive scheduler stretches the interval up to this factor.
+MAX_RELAX_FACTOR = 4.0
+# Relative price moves per sqrt(minute) considered flat and volatile.
+LOW_VOLATILITY = 0.0005
+HIGH_VOLATILITY = 0.005
+
+API_BASE_URL = "https://pro-api.coinmarketcap.com"
+QUOTES_PATH = "/v1/cryptocurrency/quotes/latest"
+LISTINGS_PATH = "/v1/cryptocurrency/listings/latest"
+MAP_PATH = "/v1/cryptocurrency/map"
+# Credits per listings call: one per 200 coins returned.
+LISTINGS_COINS_PER_CREDIT = 200
+# Largest market overview CoinMarketCap returns in one listings call.
+MAX_MARKET_OVERVIEW = 5000
+# Rank movers compare against the ranks of at most this long ago.
+MARKET_MOVER_PERIOD = timedelta(hours=24)
+# Ranks are remembered for the movers at most once per this interval.
+MARKET_SNAPSHOT_INTERVAL = timedelta(hours=1)
+# Coins listed in the attributes of the market sensors.
+MARKET_TOP_COUNT = 5
+OHLCV_HISTORICAL_PATH = "/v2/cryptocurrency/ohlcv/historical"
+
+# The symbol map changes rarely, one download per day is plenty.
+CATALOG_TTL = timedelta(days=1)
+CATALOG_PAGE_SIZE = 5000
+# Number of coins offered in the selection forms.
+CATALOG_SELECT_LIMIT = 100
+
+# HTTP client behaviour, times in seconds.
+REQUEST_TIMEOUT = 15
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_RESET_TIMEOUT = 300
+PRICE_CONVERSION_PATH = "/v1/tools/price-conversion"
+
+COINBASE_API_URL = "https://api.coinbase.com"
+EXCHANGE_RATES_PATH = "/v2/exchange-rates"
+COINBASE_WS_URL = "wss://ws-feed.exchange.coinbase.com"
+# Streamed ticks are pushed at most once per this many seconds.
+STREAM_THROTTLE = 1.0
+STREAM_HEARTBEAT = 30
+# Seconds before a slow request is also sent to the next provider.
+HEDGE_DELAY = 2.0
+# Weight of the newest sample in the provider latency average.
+LATENCY_SMOOTHING = 0.3
+
+# Quote requests are split into chunks of the symbols one credit pays for,
+# which also keeps URLs short, and a few chunks are fetched in parallel.
+QUOTE_CHUNK_SIZE = 100
+MAX_CONCURRENT_REQUESTS = 4
+# Response bodies from this size on (bytes) are decoded in the executor.
+PARSE_EXECUTOR_THRESHOLD = 64 * 1024
+
+# Fiat cross rates move slowly compared to crypto prices.
+FX_TTL = timedelta(hours=1)
+
+# The local OHLCV store keeps hourly bars. New coins are backfilled once, a few
+# coins per call, spending at most a share of the credits left in the budget.
+BAR_SECONDS = 3600
+BACKFILL_PERIOD = timedelta(days=7)
+BACKFILL_CHUNK_SIZE = 10
+BACKFILL_BUDGET_SHARE = 0.25
+# Credits per historical OHLCV call: one per 100 data points.
+OHLCV_POINTS_PER_CREDIT = 100
+
+SERVICE_GET_PRICE_HISTORY = "get_price_history"
+ATTR_CRYPTOCURRENCY = "cryptocurrency"
+ATTR_CURRENCY = "currency"
+ATTR_START = "start"
+ATTR_END = "end"
+# Range returned when a query gives no start.
+DEFAULT_QUERY_PERIOD = timedelta(days=1)
+
+PLATFORMS = ["sensor", "binary_sensor"]
 
 TOP_CRYPTOCURRENCIES = {
     "BTC": "Bitcoin", "ETH": "Ethereum", "USDT": "Tether", "BNB": "Binance Coin",
@@ -0,0 +1,1145 @@
+"""Data coordinators for the CoinMarketCap integration."""
+
+import asyncio
+from collections import Counter, deque, namedtuple
+import cProfile
+from datetime import datetime, timedelta, timezone
+import logging
+import math
+import time
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util, slugify
+
+from .alerts import AlertEngine, describe, parse_rules
+from .api import (
+    CoinMarketCapApiClient,
+    CoinMarketCapAuthError,
+    CoinMarketCapError,
+    CoinMarketCapInvalidRequestError,
+)
+from .const import (
+    DOMAIN,
+    CONF_API_KEY,
+    CONF_CRYPTOCURRENCIES,
+    CONF_CRYPTOCURRENCY_IDS,
+    CONF_COIN_AMOUNT,
+    CONF_COST_BASIS,
+    CONF_CURRENCY,
+    CONF_PORTFOLIOS,
+    CONF_ALERTS,
+    CONF_PROVIDER,
+    CONF_SCAN_INTERVAL,
+    CONF_STREAM,
+    CONF_PROFILE,
+    CONF_MARKET_OVERVIEW,
+    CONF_STATISTICS,
+    CONF_DAILY_CREDIT_BUDGET,
+    CONF_MONTHLY_CREDIT_BUDGET,
+    CONF_MIN_CHANGE,
+    CONF_MIN_CHANGE_PERCENT,
+    CONF_MAX_STATE_AGE,
+    CONF_HISTORY_WINDOWS,
+    BACKFILL_BUDGET_SHARE,
+    BACKFILL_CHUNK_SIZE,
+    BACKFILL_PERIOD,
+    BAR_SECONDS,
+    CREDIT_SYMBOLS_PER_CREDIT,
+    DEFAULT_HISTORY_WINDOWS,
+    DEFAULT_PROVIDER,
+    DEFAULT_SCAN_INTERVAL,
+    EVENT_ALERT,
+    HIGH_VOLATILITY,
+    HISTORY_CAPACITY,
+    LISTINGS_COINS_PER_CREDIT,
+    LOW_VOLATILITY,
+    FX_TTL,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_RELAX_FACTOR,
+    MARKET_MOVER_PERIOD,
+    MARKET_SNAPSHOT_INTERVAL,
+    MAX_SCAN_INTERVAL,
+    MIN_SCAN_INTERVAL,
+    OHLCV_POINTS_PER_CREDIT,
+    SIGNAL_ALERT,
+    SNAPSHOT_SAVE_DELAY,
+    STORAGE_VERSION,
+)
+from .history import PriceHistory
+from .market import MarketOverview
+from .metrics import Metrics, summarize_profile
+from .portfolio import PortfolioEngine, build_holdings, parse_portfolios
+from .providers import build_quote_provider, quote_breakers
+from .statistics import StatisticsImporter
+from .streaming import TickerStream
+from .timeseries import BarBuilder, get_series_store
+
+_LOGGER = logging.getLogger(__name__)
+
+def get_currencies(data):
+    """Return the configured currencies as a list.
+
+    Older entries store a single currency string, newer ones a list.
+    """
+    currencies = data[CONF_CURRENCY]
+    if isinstance(currencies, str):
+        currencies = currencies.split(",")
+    return list(dict.fromkeys(currency.strip().upper() for currency in currencies if currency.strip()))
+
+
+def get_stream_symbols(data):
+    """Return the symbols to stream live prices for."""
+    symbols = []
+    for symbol in str(data.get(CONF_STREAM, "")).split(","):
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in symbols:
+            symbols.append(symbol)
+    return symbols
+
+
+def get_history_windows(data):
+    """Return the configured indicator windows as ``{label: seconds}``."""
+    value = data.get(CONF_HISTORY_WINDOWS, DEFAULT_HISTORY_WINDOWS)
+    windows = {}
+    for part in str(value).split(","):
+        part = part.strip()
+        if part:
+            hours = float(part)
+            if hours > 0:
+                windows[f"{hours:g}h"] = hours * 3600
+    return windows
+
+
+Subscription = namedtuple(
+    "Subscription",
+    ["cryptocurrencies", "currencies", "scan_interval", "daily_budget", "monthly_budget", "ids", "windows", "stream", "profile", "market_overview"],
+)
+
+
+def batch_credit_cost(symbol_count, convert_count):
+    """Return the credits a single quotes call costs."""
+    return max(1, math.ceil(symbol_count / CREDIT_SYMBOLS_PER_CREDIT)) + max(0, convert_count - 1)
+
+
+def listings_credit_cost(limit):
+    """Return the credits a listings call for the top ``limit`` coins costs."""
+    return max(1, math.ceil(limit / LISTINGS_COINS_PER_CREDIT))
+
+
+class CreditBudgetScheduler:
+    """Pick the shortest refresh interval that fits a credit budget.
+
+    Spending is tracked per UTC day and month from the ``credit_count`` that
+    CoinMarketCap reports in each response ``status`` block. The interval is
+    derived from the credits left in the current period, then stretched while
+    the market is flat so the saved credits are available when it moves.
+    """
+
+    def __init__(self, daily_budget=0, monthly_budget=0, clock=time.time):
+        """Initialize."""
+        self.daily_budget = daily_budget
+        self.monthly_budget = monthly_budget
+        self._clock = clock
+        self._day = None
+        self._month = None
+        self.used_today = 0
+        self.used_this_month = 0
+        self.volatility = None
+        self._last_prices = {}
+        self._last_observed = None
+
+    @property
+    def enabled(self):
+        """Return True if a budget is configured."""
+        return bool(self.daily_budget or self.monthly_budget)
+
+    def _roll_periods(self, now):
+        """Reset the counters when a new day or month starts."""
+        moment = datetime.fromtimestamp(now, timezone.utc)
+        day = moment.date()
+        month = (moment.year, moment.month)
+        if day != self._day:
+            self._day = day
+            self.used_today = 0
+        if month != self._month:
+            self._month = month
+            self.used_this_month = 0
+        return moment
+
+    def record_usage(self, credits):
+        """Add credits spent by a refresh."""
+        self._roll_periods(self._clock())
+        self.used_today += credits
+        self.used_this_month += credits
+
+    def available(self):
+        """Return the credits left in the tightest budget, or None without a budget."""
+        self._roll_periods(self._clock())
+        left = [
+            budget - used
+            for budget, used in (
+                (self.daily_budget, self.used_today),
+                (self.monthly_budget, self.used_this_month),
+            )
+            if budget
+        ]
+        return max(0, min(left)) if left else None
+
+    def observe(self, prices):
+        """Update the volatility estimate from a ``{key: price}`` snapshot."""
+        now = self._clock()
+        if self._last_observed is not None and now > self._last_observed:
+            moves = [
+                abs(price / self._last_prices[key] - 1)
+                for key, price in prices.items()
+                if self._last_prices.get(key)
+            ]
+            if moves:
+                minutes = (now - self._last_observed) / 60
+                sample = sum(moves) / len(moves) / math.sqrt(minutes)
+                if self.volatility is None:
+                    self.volatility = sample
+                else:
+                    self.volatility = 0.7 * self.volatility + 0.3 * sample
+        self._last_prices = dict(prices)
+        self._last_observed = now
+
+    def _relax_factor(self):
+        """Return how far the interval may be stretched for the current volatility."""
+        if self.volatility is None or self.volatility >= HIGH_VOLATILITY:
+            return 1.0
+        if self.volatility <= LOW_VOLATILITY:
+            return MAX_RELAX_FACTOR
+        position = (HIGH_VOLATILITY - self.volatility) / (HIGH_VOLATILITY - LOW_VOLATILITY)
+        return 1.0 + position * (MAX_RELAX_FACTOR - 1.0)
+
+    def next_interval(self, cost):
+        """Return the refresh interval for cycles costing ``cost`` credits."""
+        now = self._clock()
+        moment = self._roll_periods(now)
+        day_end = datetime(moment.year, moment.month, moment.day, tzinfo=timezone.utc) + timedelta(days=1)
+        if moment.month == 12:
+            month_end = datetime(moment.year + 1, 1, 1, tzinfo=timezone.utc)
+        else:
+            month_end = datetime(moment.year, moment.month + 1, 1, tzinfo=timezone.utc)
+
+        seconds = MIN_SCAN_INTERVAL.total_seconds()
+        for budget, used, period_end in (
+            (self.daily_budget, self.used_today, day_end),
+            (self.monthly_budget, self.used_this_month, month_end),
+        ):
+            if not budget:
+                continue
+            seconds_left = period_end.timestamp() - now
+            cycles_left = (budget - used) / max(cost, 1)
+            if cycles_left < 1:
+                seconds = max(seconds, seconds_left)
+            else:
+                seconds = max(seconds, seconds_left / cycles_left)
+
+        seconds *= self._relax_factor()
+        return timedelta(seconds=min(seconds, MAX_SCAN_INTERVAL.total_seconds()))
+
+
+class CoinMarketCapQuoteEngine(DataUpdateCoordinator):
+    """Shared quote engine for all config entries using the same API key.
+
+    Every entry subscribes with its symbols and currencies. The engine fetches
+    the union of all symbols once in a single base currency and derives the
+    other currencies locally from a cached FX table, so the number of quote
+    calls does not depend on the number of currencies. Results are kept as
+    ``{currency: {symbol: price}}``.
+
+    Quotes come from the provider picked by ``provider``; FX rates, the
+    historical backfill and the market overview always use CoinMarketCap.
+    When an entry enables the market overview, the top coins are fetched with
+    one listings call first and subscribed coins among them are served from
+    it, so only the remaining coins need a quotes call.
+    """
+
+    def __init__(self, hass: HomeAssistant, api_key: str, provider=DEFAULT_PROVIDER):
+        """Initialize."""
+        self.api_key = api_key
+        self.provider = provider
+        self.metrics = Metrics()
+        session = async_get_clientsession(hass)
+        self.client = CoinMarketCapApiClient(
+            session, api_key, executor=hass.async_add_executor_job, metrics=self.metrics
+        )
+        self.quotes = build_quote_provider(
+            session, provider, self.client, executor=hass.async_add_executor_job, metrics=self.metrics
+        )
+        self.stream = TickerStream(hass, session, self._async_handle_stream)
+        self.stale = False
+        self.subscriptions = {}
+        self.base_currency = None
+        self.fx_rates = {}
+        self._fx_updated = {}
+        self._fetched = set()
+        self.failed_symbols = set()
+        self._lock = asyncio.Lock()
+        self.scheduler = CreditBudgetScheduler()
+        self.history = PriceHistory(HISTORY_CAPACITY)
+        self.series = get_series_store(hass)
+        self.backfill_supported = True
+        self._bars = {}
+        self._series_ready = set()
+        self._backfill_pending = set()
+        self._backfill_task = None
+        self.market = None
+        self.market_since = None
+        self._rank_snapshots = deque()
+        self._first_refresh_at = None
+        self._refresh_start = None
+        super().__init__(hass, _LOGGER, name=f"{DOMAIN}_engine", update_interval=DEFAULT_SCAN_INTERVAL)
+
+    @callback
+    def async_subscribe(self, entry_id, subscription):
+        """Register the symbols and currencies an entry needs."""
+        self.subscriptions[entry_id] = subscription._replace(
+            cryptocurrencies=frozenset(subscription.cryptocurrencies),
+            currencies=tuple(subscription.currencies),
+        )
+        self._async_update_windows()
+        self._async_update_interval()
+        self._async_update_stream()
+
+    @callback
+    def async_unsubscribe(self, entry_id):
+        """Remove an entry from the engine."""
+        self.subscriptions.pop(entry_id, None)
+        self._async_update_windows()
+        self._async_update_interval()
+        self._async_update_stream()
+
+    @callback
+    def async_schedule_first_refresh(self, fetched):
+        """Refresh one update interval after restored data was fetched.
+
+        Without it the first refresh waits a full interval from startup. As
+        entries share the engine, a pending first refresh is only moved
+        earlier, and not at all once the engine has fetched data itself.
+        """
+        if self.data is not None:
+            return
+        delay = max(0.0, (fetched + self.update_interval - dt_util.utcnow()).total_seconds())
+        when = self.hass.loop.time() + delay
+        if self._first_refresh_at is not None and self._first_refresh_at <= when:
+            return
+        self._first_refresh_at = when
+        self._async_unsub_refresh()
+        self._unsub_refresh = async_call_later(self.hass, delay, self._handle_refresh_interval)
+
+    async def async_shutdown(self):
+        """Only shut down once the last subscribing entry is gone."""
+        if not self.subscriptions:
+            await self.stream.async_stop()
+            await super().async_shutdown()
+
+    @property
+    def backfill_pending(self):
+        """Return the coins still waiting for their price history backfill."""
+        return sorted(self._backfill_pending)
+
+    @property
+    def market_limit(self):
+        """Return the number of top coins the market overview fetches, 0 when off."""
+        return max((sub.market_overview for sub in self.subscriptions.values()), default=0)
+
+    @callback
+    def _async_update_stream(self):
+        """Stream the coins some entry asked for, once the base currency is known."""
+        symbols = set()
+        for sub in self.subscriptions.values():
+            symbols.update(symbol for symbol in sub.stream if symbol in sub.cryptocurrencies)
+        if self.base_currency is not None:
+            self.stream.async_update(symbols, self.base_currency)
+
+    @callback
+    def _async_handle_stream(self, prices):
+        """Merge streamed prices into the polled data and notify the entries.
+
+        The data is updated in place and the refresh timer is left alone, so
+        REST polling keeps running as a fallback for the stream.
+        """
+        if self.data is None or self.base_currency not in self.data:
+            return
+        for symbol, price in prices.items():
+            self.data[self.base_currency][symbol] = price
+            for currency, rate in self.fx_rates.items():
+                if currency in self.data:
+                    self.data[currency][symbol] = price * rate
+        self.async_update_listeners()
+
+    @callback
+    def _async_update_windows(self):
+        """Keep the union of all requested indicator windows."""
+        windows = {}
+        for sub in self.subscriptions.values():
+            windows.update(sub.windows)
+        self.history.set_windows(windows)
+
+    @callback
+    def _async_update_interval(self):
+        """Poll as often as the subscribers and the credit budget allow."""
+        if not self.subscriptions:
+            return
+
+        subscriptions = self.subscriptions.values()
+        self.scheduler.daily_budget = min(
+            (sub.daily_budget for sub in subscriptions if sub.daily_budget), default=0
+        )
+        self.scheduler.monthly_budget = min(
+            (sub.monthly_budget for sub in subscriptions if sub.monthly_budget), default=0
+        )
+
+        if self.scheduler.enabled:
+            cost = sum(
+                batch_credit_cost(len(symbols), 1)
+                for symbols, _ in self._build_batches(self._listed_prices(self.market))
+            )
+            if self.market_limit:
+                cost += listings_credit_cost(self.market_limit)
+            self.update_interval = self.scheduler.next_interval(cost)
+        else:
+            self.update_interval = min(sub.scan_interval for sub in subscriptions)
+
+    def _currencies(self):
+        """Return all currencies the subscribers asked for."""
+        return {currency for sub in self.subscriptions.values() for currency in sub.currencies}
+
+    def _pick_base_currency(self):
+        """Quote in the most requested currency so most prices need no conversion."""
+        counts = Counter(currency for sub in self.subscriptions.values() for currency in sub.currencies)
+        return max(sorted(counts), key=counts.get)
+
+    def _build_batches(self, skip=()):
+        """Merge all subscriptions into the fewest possible quote requests.
+
+        Returns ``(symbols, ids)`` tuples of at most the ``chunk_size`` of
+        the quote provider, the number of symbols one credit pays for on
+        CoinMarketCap. Symbols with a known CoinMarketCap ID are requested by
+        ID, which avoids ambiguous symbols; ``ids`` is None for batches
+        requested by symbol. Providers without a ``chunk_size`` return every
+        coin with one request and match them by symbol, so they get a single
+        batch. Symbols in ``skip`` are already priced and left out.
+        """
+        symbols = set()
+        ids = {}
+        for sub in self.subscriptions.values():
+            symbols.update(sub.cryptocurrencies)
+            ids.update(sub.ids)
+        symbols.difference_update(skip)
+
+        chunk_size = self.quotes.chunk_size
+        if chunk_size is None:
+            return [(sorted(symbols), None)] if symbols else []
+        batches = []
+        by_id = sorted(symbol for symbol in symbols if symbol in ids)
+        by_symbol = sorted(symbol for symbol in symbols if symbol not in ids)
+        for start in range(0, len(by_id), chunk_size):
+            chunk = by_id[start:start + chunk_size]
+            batches.append((chunk, {symbol: ids[symbol] for symbol in chunk}))
+        for start in range(0, len(by_symbol), chunk_size):
+            batches.append((by_symbol[start:start + chunk_size], None))
+        return batches
+
+    def _listed_prices(self, market):
+        """Return the prices of subscribed coins that ``market`` lists.
+
+        Coins with a known ID are matched by ID, the others by symbol.
+        """
+        if market is None:
+            return {}
+        prices = {}
+        for sub in self.subscriptions.values():
+            for symbol in sub.cryptocurrencies:
+                coin_id = sub.ids.get(symbol)
+                listing = market.by_id.get(coin_id) if coin_id is not None else market.by_symbol.get(symbol)
+                if listing is not None and listing.price is not None:
+                    prices[symbol] = listing.price
+        return prices
+
+    async def _async_update_market(self, base, now):
+        """Fetch the listings of the top coins and return the credits used.
+
+        Rank movers are measured against the oldest ranks kept, which are at
+        most ``MARKET_MOVER_PERIOD`` old. Ranks are kept once per
+        ``MARKET_SNAPSHOT_INTERVAL`` to bound the memory for large overviews. A failed fetch clears the overview
+        so its coins are quoted individually.
+        """
+        limit = self.market_limit
+        if not limit:
+            self.market = self.market_since = None
+            self._rank_snapshots.clear()
+            return 0
+        try:
+            payload = await self.client.async_get_listings(limit, base)
+        except CoinMarketCapError as err:
+            _LOGGER.warning("Failed to fetch the market overview: %s", err)
+            self.market = None
+            return 0
+
+        while len(self._rank_snapshots) > 1 and self._rank_snapshots[1][0] <= now - MARKET_MOVER_PERIOD.total_seconds():
+            self._rank_snapshots.popleft()
+        since, baseline = self._rank_snapshots[0] if self._rank_snapshots else (None, None)
+        self.market = MarketOverview(payload["data"], baseline)
+        self.market_since = since
+        if not self._rank_snapshots or now - self._rank_snapshots[-1][0] >= MARKET_SNAPSHOT_INTERVAL.total_seconds():
+            self._rank_snapshots.append((now, self.market.ranks))
+        return (payload.get("status") or {}).get("credit_count", listings_credit_cost(limit))
+
+    def rate(self, currency):
+        """Return the factor from the base currency to ``currency``, or None if unknown."""
+        if currency == self.base_currency:
+            return 1
+        return self.fx_rates.get(currency)
+
+    def covers(self, cryptocurrencies, currencies):
+        """Return True if the current data has these symbols in these currencies."""
+        return all(symbol in self._fetched for symbol in cryptocurrencies) and all(
+            currency == self.base_currency or currency in self.fx_rates for currency in currencies
+        )
+
+    async def async_ensure_quotes(self, cryptocurrencies, currencies):
+        """Fetch what the current data does not cover yet.
+
+        Only the uncovered coins and FX rates are fetched. They are merged
+        into the data in place like streamed prices, so the refresh timer is
+        left alone. Without data or with a new base currency the engine
+        refreshes instead.
+        """
+        async with self._lock:
+            if self.data is not None and self.covers(cryptocurrencies, currencies):
+                return
+            base = self._pick_base_currency()
+            if self.data is None or base != self.base_currency or base not in self.data:
+                await self.async_refresh()
+                return
+            await self._async_fetch_uncovered(base)
+
+    async def _async_fetch_uncovered(self, base):
+        """Quote the subscribed coins missing from the data and merge them in.
+
+        Coins among the current market overview are priced from it.
+        """
+        quotes = {
+            symbol: price for symbol, price in self._listed_prices(self.market).items()
+            if symbol not in self._fetched
+        }
+        self._fetched.update(quotes)
+        batches = self._build_batches(self._fetched)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        results = await asyncio.gather(
+            *(self._async_fetch_batch(semaphore, base, symbols, ids) for symbols, ids in batches),
+            return_exceptions=True,
+        )
+
+        credits = 0
+        for (symbols, _), result in zip(batches, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, (CoinMarketCapError, KeyError, TypeError, ValueError)):
+                    raise result
+                _LOGGER.warning("Failed to fetch the quotes of %s new coins: %s", len(symbols), result)
+                self.failed_symbols.update(symbols)
+                continue
+            quotes.update(result[0])
+            credits += result[1]
+            self._fetched.update(symbols)
+            self.failed_symbols.difference_update(symbols)
+
+        credits += await self._async_update_fx(base)
+        self.data[base].update(quotes)
+        for currency, rate in self.fx_rates.items():
+            self.data[currency] = {symbol: price * rate for symbol, price in self.data[base].items()}
+
+        self.scheduler.record_usage(credits)
+        self.metrics.credits += credits
+        now = time.time()
+        self.history.add(now, quotes)
+        await self._async_update_series(base, now, quotes)
+        self._async_update_interval()
+        self._async_update_stream()
+        self.async_update_listeners()
+
+    async def _async_update_fx(self, base):
+        """Refresh expired FX rates relative to ``base`` and return the credits used."""
+        if base != self.base_currency:
+            self.base_currency = base
+            self.history.reset()
+            self._bars = {}
+            self._series_ready = set()
+            self._backfill_pending = set()
+            self.fx_rates = {}
+            self._fx_updated = {}
+
+        credits = 0
+        now = time.monotonic()
+        for currency in sorted(self._currencies() - {base}):
+            updated = self._fx_updated.get(currency)
+            if updated is not None and now - updated < FX_TTL.total_seconds():
+                continue
+            try:
+                payload = await self.client.async_get_price_conversion(base, currency)
+                data = payload["data"]
+                if isinstance(data, list):
+                    data = data[0]
+                self.fx_rates[currency] = data["quote"][currency]["price"]
+                self._fx_updated[currency] = now
+                credits += (payload.get("status") or {}).get("credit_count", 1)
+            except (CoinMarketCapError, KeyError, IndexError, TypeError) as err:
+                _LOGGER.warning("Failed to update the %s/%s rate: %s", base, currency, err)
+        return credits
+
+    async def _async_fetch_batch(self, semaphore, base, symbols, ids):
+        """Fetch one batch and return ``(quotes, credits)``.
+
+        A rejected batch is split in halves until the offending symbol is
+        isolated, so one bad symbol does not take the others down with it.
+        """
+        try:
+            async with semaphore:
+                payload = await self.quotes.async_get_quotes(
+                    base, symbols=symbols, ids=ids and [ids[symbol] for symbol in symbols]
+                )
+        except CoinMarketCapInvalidRequestError:
+            if len(symbols) == 1:
+                _LOGGER.warning("CoinMarketCap rejected %s", symbols[0])
+                return {}, 0
+            middle = len(symbols) // 2
+            first, second = await asyncio.gather(
+                self._async_fetch_batch(semaphore, base, symbols[:middle], ids),
+                self._async_fetch_batch(semaphore, base, symbols[middle:], ids),
+            )
+            return {**first[0], **second[0]}, first[1] + second[1]
+
+        status = payload.get("status") or {}
+        credits = status.get("credit_count", batch_credit_cost(len(symbols), 1))
+        quotes = {}
+        for symbol in symbols:
+            price = payload["data"].get(str(ids[symbol]) if ids else symbol)
+            if price is not None:
+                quotes[symbol] = price
+        return quotes, credits
+
+    async def _async_seed_history(self, symbols, base, now):
+        """Load the stored closes of the indicator windows into the price history."""
+        seconds = max(self.history.windows.values(), default=0)
+        if not seconds or not symbols:
+            return
+        series = await self.hass.async_add_executor_job(self.series.read, symbols, base, now - seconds, now)
+        if base != self.base_currency:
+            return
+        for symbol, bars in series.items():
+            self.history.seed(symbol, [(bar[0] + BAR_SECONDS, bar[4]) for bar in bars])
+
+    async def _async_update_series(self, base, now, quotes):
+        """Record a tick in the local OHLCV store and backfill new coins.
+
+        Ticks are aggregated into hourly bars that are appended once the hour
+        is over. Bars of a coin waiting for its backfill are held back, the
+        store only accepts bars newer than the ones it has.
+        """
+        for symbol, price in quotes.items():
+            self._bars.setdefault(symbol, BarBuilder()).add(now, price)
+
+        new = [
+            symbol for symbol in quotes
+            if symbol not in self._series_ready and symbol not in self._backfill_pending
+        ]
+        if new:
+            last_times = await self.hass.async_add_executor_job(self.series.last_times, new, base)
+            stored = [symbol for symbol in new if last_times[symbol] is not None or not self.backfill_supported]
+            self._series_ready.update(stored)
+            self._backfill_pending.update(symbol for symbol in new if symbol not in self._series_ready)
+            await self._async_seed_history(stored, base, now)
+
+        completed = {
+            symbol: bars.pop_completed()
+            for symbol, bars in self._bars.items()
+            if symbol in self._series_ready and bars.completed
+        }
+        if completed:
+            await self.hass.async_add_executor_job(self.series.append, completed, base)
+
+        if self._backfill_pending and (self._backfill_task is None or self._backfill_task.done()):
+            self._backfill_task = self.hass.async_create_background_task(
+                self._async_backfill(base), f"{DOMAIN} price history backfill"
+            )
+
+    def _backfill_chunks(self, symbols):
+        """Split coins into ``(symbols, ids)`` requests like ``_build_batches``."""
+        ids = {}
+        for sub in self.subscriptions.values():
+            ids.update(sub.ids)
+        by_id = [symbol for symbol in symbols if symbol in ids]
+        by_symbol = [symbol for symbol in symbols if symbol not in ids]
+        for start in range(0, len(by_id), BACKFILL_CHUNK_SIZE):
+            chunk = by_id[start:start + BACKFILL_CHUNK_SIZE]
+            yield chunk, {symbol: ids[symbol] for symbol in chunk}
+        for start in range(0, len(by_symbol), BACKFILL_CHUNK_SIZE):
+            yield by_symbol[start:start + BACKFILL_CHUNK_SIZE], None
+
+    async def _async_backfill(self, base):
+        """Download the hourly OHLCV history of coins without a local series.
+
+        Runs in the background. Coins that do not fit into the credit budget
+        stay pending and are picked up by a later refresh.
+        """
+        end = time.time() // BAR_SECONDS * BAR_SECONDS
+        start = end - BACKFILL_PERIOD.total_seconds()
+        points = int(BACKFILL_PERIOD.total_seconds() // BAR_SECONDS)
+        allowance = self.scheduler.available()
+        if allowance is not None:
+            allowance *= BACKFILL_BUDGET_SHARE
+
+        for symbols, ids in self._backfill_chunks(sorted(self._backfill_pending)):
+            cost = math.ceil(len(symbols) * points / OHLCV_POINTS_PER_CREDIT)
+            if allowance is not None and cost > allowance:
+                _LOGGER.debug("Postponing the backfill of %s coins to stay within the credit budget", len(symbols))
+                return
+            try:
+                payload = await self.client.async_get_ohlcv_historical(
+                    base, start, end, symbols=symbols, ids=ids and [ids[symbol] for symbol in symbols]
+                )
+            except CoinMarketCapAuthError as err:
+                _LOGGER.warning("Historical prices are not available with this API key, skipping the backfill: %s", err)
+                self.backfill_supported = False
+                self._series_ready.update(self._backfill_pending)
+                self._backfill_pending = set()
+                return
+            except CoinMarketCapInvalidRequestError as err:
+                _LOGGER.warning("CoinMarketCap has no price history for %s: %s", ", ".join(symbols), err)
+                payload = {"data": {}}
+            except CoinMarketCapError as err:
+                _LOGGER.warning("Failed to backfill the price history: %s", err)
+                return
+
+            if base != self.base_currency:
+                return
+            credits = (payload.get("status") or {}).get("credit_count", cost)
+            self.scheduler.record_usage(credits)
+            self.metrics.credits += credits
+            if allowance is not None:
+                allowance -= credits
+            bars = {
+                symbol: payload["data"].get(str(ids[symbol]) if ids else symbol, [])
+                for symbol in symbols
+            }
+            await self.hass.async_add_executor_job(self.series.append, bars, base)
+            self._backfill_pending.difference_update(symbols)
+            self._series_ready.update(symbols)
+            await self._async_seed_history(symbols, base, time.time())
+
+    async def _async_refresh(self, *args, **kwargs):
+        """Refresh and fan out, timing the cycle and profiling it when enabled.
+
+        The cycle is timed up to the fan-out, so the sensors it updates
+        show the refresh that updated them. The profiler sees everything the
+        event loop runs meanwhile, not only this integration.
+        """
+        profiler = None
+        if any(sub.profile for sub in self.subscriptions.values()):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                _LOGGER.debug("Another profiler is active, skipping the refresh profile")
+                profiler = None
+
+        self._refresh_start = time.monotonic()
+        try:
+            await super()._async_refresh(*args, **kwargs)
+        finally:
+            self._observe_refresh()
+            if profiler is not None:
+                profiler.disable()
+                self.hass.async_create_task(self._async_save_profile(profiler))
+
+    async def _async_save_profile(self, profiler):
+        """Keep a summary of a refresh profile and write the raw stats to disk."""
+        path = self.hass.config.path(f"{DOMAIN}.profile")
+        stats = await self.hass.async_add_executor_job(summarize_profile, profiler, path)
+        self.metrics.profile = {"time": dt_util.utcnow().isoformat(), "path": path, "stats": stats}
+        _LOGGER.info("Saved a CoinMarketCap refresh profile to %s", path)
+
+    @callback
+    def _observe_refresh(self):
+        """Record the duration of the running refresh, once."""
+        if self._refresh_start is not None:
+            self.metrics.observe("refresh", time.monotonic() - self._refresh_start)
+            self._refresh_start = None
+
+    @callback
+    def async_update_listeners(self):
+        """Notify the entries and time the fan-out to their sensors."""
+        self._observe_refresh()
+        start = time.monotonic()
+        super().async_update_listeners()
+        self.metrics.observe("fan_out", time.monotonic() - start)
+
+    async def _async_update_data(self):
+        """Fetch data from CoinMarketCap.
+
+        Batches run concurrently. If some of them fail, only their symbols are
+        missing from the result and the sensors for them become unavailable.
+        """
+        base = self._pick_base_currency()
+        credits = await self._async_update_market(base, time.time())
+        listed = self._listed_prices(self.market)
+        batches = self._build_batches(listed)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        results = await asyncio.gather(
+            *(self._async_fetch_batch(semaphore, base, symbols, ids) for symbols, ids in batches),
+            return_exceptions=True,
+        )
+
+        quotes = dict(listed)
+        fetched = set(listed)
+        failed = set()
+        errors = []
+        for (symbols, _), result in zip(batches, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, (CoinMarketCapError, KeyError, TypeError, ValueError)):
+                    raise result
+                errors.append(result)
+                failed.update(symbols)
+                continue
+            quotes.update(result[0])
+            credits += result[1]
+            fetched.update(symbols)
+
+        if errors and not fetched:
+            err = errors[0]
+            # Stale prices are only served once no quote provider can be asked
+            if self.data is not None and all(breaker.is_open for breaker in quote_breakers(self.quotes).values()):
+                _LOGGER.warning("Serving stale CoinMarketCap data: %s", err)
+                self.stale = True
+                return self.data
+            if isinstance(err, CoinMarketCapError):
+                raise UpdateFailed(f"Error communicating with CoinMarketCap: {err}") from err
+            raise UpdateFailed(f"Unexpected response from CoinMarketCap: {err!r}") from err
+        if errors:
+            _LOGGER.warning("Failed to fetch %s of %s quote batches: %s", len(errors), len(batches), errors[0])
+        self.failed_symbols = failed
+
+        credits += await self._async_update_fx(base)
+
+        data = {base: quotes}
+        for currency, rate in self.fx_rates.items():
+            data[currency] = {symbol: price * rate for symbol, price in quotes.items()}
+
+        self.stale = False
+        self._fetched = fetched
+        self.scheduler.record_usage(credits)
+        self.metrics.credits += credits
+        self.scheduler.observe(quotes)
+        now = time.time()
+        self.history.add(now, quotes)
+        gone = set(self.history.series) - set().union(
+            *(sub.cryptocurrencies for sub in self.subscriptions.values())
+        )
+        self.history.discard(gone)
+        for symbol in gone:
+            self._bars.pop(symbol, None)
+            self._series_ready.discard(symbol)
+            self._backfill_pending.discard(symbol)
+        await self._async_update_series(base, now, quotes)
+        self._async_update_interval()
+        self._async_update_stream()
+        return data
+
+
+class CoinMarketCapDataUpdateCoordinator(DataUpdateCoordinator):
+    """Per-entry view on the shared quote engine."""
+
+    def __init__(self, hass: HomeAssistant, engine: CoinMarketCapQuoteEngine, entry: ConfigEntry):
+        """Initialize."""
+        self.engine = engine
+        self.entry_id = entry.entry_id
+        self.currencies = get_currencies(entry.data)
+        self.statistics = None
+        self._load_options(entry)
+        self.suppressed_writes = 0
+        self.state_writes = 0
+        self.last_fetched = None
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}")
+        self._unsub_engine = None
+        super().__init__(hass, _LOGGER, name=f"{DOMAIN}_{entry.entry_id}")
+
+    async def async_restore_snapshot(self):
+        """Hydrate from the persisted quote snapshot.
+
+        Returns False if there is no usable snapshot. A snapshot older than the
+        update interval is served right away and refreshed in the background;
+        a newer one is refreshed once it is an update interval old.
+        """
+        snapshot = await self._store.async_load()
+        if not snapshot or snapshot.get("currencies") != self.currencies:
+            return False
+
+        fetched = dt_util.parse_datetime(snapshot["timestamp"])
+        if fetched is None:
+            return False
+
+        quotes = snapshot["quotes"]
+        self.last_fetched = fetched
+        self.async_set_updated_data(self._select(quotes))
+
+        complete = all(
+            symbol in quotes.get(currency, {})
+            for currency in self.currencies
+            for symbol in self.cryptocurrencies
+        )
+        if not complete or dt_util.utcnow() - fetched >= self.engine.update_interval:
+            self.hass.async_create_task(
+                self.engine.async_ensure_quotes(self.cryptocurrencies, self.currencies)
+            )
+        else:
+            self.engine.async_schedule_first_refresh(fetched)
+        return True
+
+    def _snapshot(self):
+        """Return the data persisted for the next startup."""
+        return {
+            "timestamp": self.last_fetched.isoformat(),
+            "currencies": self.currencies,
+            "quotes": self.data,
+        }
+
+    def _load_options(self, entry):
+        """Read the settings that can change without a reload."""
+        self.cryptocurrencies = entry.data[CONF_CRYPTOCURRENCIES]
+        self.cryptocurrency_ids = entry.data.get(CONF_CRYPTOCURRENCY_IDS, {})
+        self.scan_interval = timedelta(seconds=entry.data[CONF_SCAN_INTERVAL])
+        self.daily_budget = entry.data.get(CONF_DAILY_CREDIT_BUDGET, 0)
+        self.monthly_budget = entry.data.get(CONF_MONTHLY_CREDIT_BUDGET, 0)
+        self.min_change = entry.data.get(CONF_MIN_CHANGE, 0)
+        self.min_change_percent = entry.data.get(CONF_MIN_CHANGE_PERCENT, 0)
+        self.max_state_age = entry.data.get(CONF_MAX_STATE_AGE, 0)
+        self.history_windows = get_history_windows(entry.data)
+        self.stream = get_stream_symbols(entry.data)
+        self.profile = entry.data.get(CONF_PROFILE, False)
+        self.market_overview = entry.data.get(CONF_MARKET_OVERVIEW, 0)
+        if not entry.data.get(CONF_STATISTICS, False):
+            self.statistics = None
+        elif self.statistics is None:
+            # Kept across option changes so the running hour is not lost
+            self.statistics = StatisticsImporter(self.engine.hass, entry.entry_id)
+
+        coin_amounts = entry.data.get(CONF_COIN_AMOUNT, {})
+        cost_basis = entry.data.get(CONF_COST_BASIS, {})
+        portfolios = {
+            None: build_holdings(
+                coin_amounts, cost_basis, {symbol: (None, None) for symbol in self.cryptocurrencies}
+            ),
+        }
+        for name, definition in parse_portfolios(entry.data.get(CONF_PORTFOLIOS, "")).items():
+            portfolios[name] = build_holdings(coin_amounts, cost_basis, definition)
+        self.portfolio = PortfolioEngine(portfolios, self.currencies[0])
+        self.alerts = AlertEngine(parse_rules(entry.data.get(CONF_ALERTS, "")))
+        self._alert_prices = None
+
+    def _subscription(self):
+        """Return what this entry needs from the engine."""
+        return Subscription(
+            self.cryptocurrencies,
+            self.currencies,
+            self.scan_interval,
+            self.daily_budget,
+            self.monthly_budget,
+            self.cryptocurrency_ids,
+            self.history_windows,
+            self.stream,
+            self.profile,
+            self.market_overview,
+        )
+
+    @callback
+    def async_update_from_entry(self, entry):
+        """Apply changed options in place.
+
+        Returns False if the API key, provider or currency changed, which
+        needs a reload. Only symbols the engine has not fetched yet trigger an
+        API call.
+        """
+        if (
+            entry.data[CONF_API_KEY] != self.engine.api_key
+            or entry.data.get(CONF_PROVIDER, DEFAULT_PROVIDER) != self.engine.provider
+            or get_currencies(entry.data) != self.currencies
+        ):
+            return False
+
+        self._load_options(entry)
+        self.engine.async_subscribe(self.entry_id, self._subscription())
+        if self.engine.data is not None:
+            self.data = self._quotes()
+        self._revalue()
+        self._evaluate_alerts()
+        if not self.engine.covers(self.cryptocurrencies, self.currencies):
+            self.hass.async_create_task(
+                self.engine.async_ensure_quotes(self.cryptocurrencies, self.currencies)
+            )
+        return True
+
+    @callback
+    def async_subscribe(self):
+        """Subscribe to the engine and follow its updates."""
+        self.engine.async_subscribe(self.entry_id, self._subscription())
+        self._unsub_engine = self.engine.async_add_listener(self._handle_engine_update)
+
+    @callback
+    def async_unsubscribe(self):
+        """Stop following the engine."""
+        if self._unsub_engine is not None:
+            self._unsub_engine()
+            self._unsub_engine = None
+        self.engine.async_unsubscribe(self.entry_id)
+
+    @property
+    def stale(self):
+        """Return True while the engine serves the last good data."""
+        return self.engine.stale
+
+    def _select(self, data):
+        """Return the ``{currency: {symbol: price}}`` subset relevant for this entry."""
+        selected = {}
+        for currency in self.currencies:
+            prices = data.get(currency, {})
+            selected[currency] = {symbol: prices[symbol] for symbol in self.cryptocurrencies if symbol in prices}
+        return selected
+
+    def price_stats(self, symbol, currency):
+        """Return the rolling indicators of a coin in ``currency``.
+
+        The history is kept in the engine's base currency; price-like values
+        are converted with the current FX rate, percentages need no conversion.
+        """
+        stats = self.engine.history.stats(symbol)
+        if stats is None:
+            return {}
+        rate = self.engine.rate(currency)
+        if rate is None:
+            return {}
+
+        result = {}
+        for label, window in stats.items():
+            if label not in self.history_windows or window is None:
+                continue
+            for key, value in window.items():
+                if value is not None and key != "change_percent":
+                    value *= rate
+                result[f"{key}_{label}"] = value
+        return result
+
+    def _revalue(self):
+        """Value the portfolios for the current data."""
+        cost_rate = self.engine.rate(self.portfolio.cost_currency)
+        rates = {}
+        for currency in self.currencies:
+            if currency == self.portfolio.cost_currency:
+                rates[currency] = 1
+            elif cost_rate and self.engine.rate(currency) is not None:
+                rates[currency] = self.engine.rate(currency) / cost_rate
+        self.portfolio.update(self.data or {}, rates)
+
+    @callback
+    def _evaluate_alerts(self):
+        """Check the alert rules of the coins with rules against the new prices.
+
+        Rules are evaluated in the first currency. The first price of a coin
+        only sets its rule states, even if it shows up after the first update;
+        afterwards changed rules update their binary sensor and triggered
+        rules fire an event.
+        """
+        currency = self.currencies[0]
+        prices = (self.data or {}).get(currency, {})
+        if self._alert_prices is None:
+            self._alert_prices = {}
+
+        history = self.engine.history
+        for symbol in self.alerts.symbols:
+            price = prices.get(symbol)
+            if price is None:
+                continue
+            old = self._alert_prices.get(symbol)
+            self._alert_prices[symbol] = price
+            if old is None:
+                for rule in self.alerts.initialize(symbol, price):
+                    async_dispatcher_send(self.hass, SIGNAL_ALERT.format(self.entry_id, rule.key))
+                continue
+            changed = self.alerts.evaluate(
+                symbol,
+                old,
+                price,
+                lambda seconds, symbol=symbol: history.change_since(symbol, seconds),
+            )
+            for rule, fired in changed:
+                async_dispatcher_send(self.hass, SIGNAL_ALERT.format(self.entry_id, rule.key))
+                if fired:
+                    self.hass.bus.async_fire(EVENT_ALERT, {
+                        "entry_id": self.entry_id,
+                        "rule": describe(rule),
+                        "type": rule.kind,
+                        "cryptocurrency": symbol,
+                        "currency": currency,
+                        "price": price,
+                        "value": rule.value,
+                    })
+
+    @callback
+    def _record_statistics(self):
+        """Feed the prices and portfolio values into the hourly statistics."""
+        values = {}
+        for currency in self.currencies:
+            slug = slugify(currency)
+            for symbol, price in (self.data or {}).get(currency, {}).items():
+                if price is not None:
+                    values[f"{slugify(symbol)}_price_{slug}"] = (f"{symbol} Price {currency}", currency, price)
+            for name in self.portfolio.portfolios:
+                valuation = self.portfolio.valuation(name, currency)
+                if valuation is None:
+                    continue
+                if name is None:
+                    key, label = f"total_portfolio_value_{slug}", "Total Portfolio Value"
+                else:
+                    key, label = f"portfolio_{slugify(name)}_value_{slug}", f"{name} Portfolio Value"
+                values[key] = (f"{label} {currency}", currency, float(valuation.total))
+        self.statistics.async_add(time.time(), values)
+
+    @callback
+    def async_update_listeners(self):
+        """Revalue the portfolios and check the alerts once before the sensors read them."""
+        self._revalue()
+        self._evaluate_alerts()
+        if self.statistics is not None:
+            self._record_statistics()
+        super().async_update_listeners()
+
+    def _quotes(self):
+        """Return the engine prices relevant for this entry."""
+        return self._select(self.engine.data)
+
+    @callback
+    def _handle_engine_update(self):
+        """Fan the engine result out to this entry's sensors."""
+        if self.engine.last_update_success:
+            self.async_set_updated_data(self._quotes())
+            if not self.engine.stale:
+                self.last_fetched = dt_util.utcnow()
+                self._store.async_delay_save(self._snapshot, SNAPSHOT_SAVE_DELAY)
+        else:
+            self.async_set_update_error(self.engine.last_exception)
+
+    async def _async_update_data(self):
+        """Return the entry's quotes, asking the engine to fetch if needed."""
+        await self.engine.async_ensure_quotes(self.cryptocurrencies, self.currencies)
+        if not self.engine.last_update_success:
+            raise UpdateFailed(f"Error communicating with CoinMarketCap: {self.engine.last_exception}")
+        return self._quotes()
@@ -0,0 +1,67 @@
+"""Diagnostics support for CoinMarketCap."""
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_API_KEY
+from .providers import quote_breakers
+
+TO_REDACT = {CONF_API_KEY}
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return diagnostics for a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    engine = coordinator.engine
+    scheduler = engine.scheduler
+
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "entry_counters": {
+            "state_writes": coordinator.state_writes,
+            "suppressed_writes": coordinator.suppressed_writes,
+            "last_fetched": coordinator.last_fetched and coordinator.last_fetched.isoformat(),
+            "statistics_imported": coordinator.statistics and coordinator.statistics.imported,
+        },
+        "engine": {
+            "provider": engine.provider,
+            "subscriptions": len(engine.subscriptions),
+            "base_currency": engine.base_currency,
+            "fx_rates": engine.fx_rates,
+            "update_interval": engine.update_interval and engine.update_interval.total_seconds(),
+            "last_update_success": engine.last_update_success,
+            "stale": engine.stale,
+            "failed_symbols": sorted(engine.failed_symbols),
+            "credits": {
+                "used_today": scheduler.used_today,
+                "used_this_month": scheduler.used_this_month,
+                "daily_budget": scheduler.daily_budget,
+                "monthly_budget": scheduler.monthly_budget,
+                "volatility": scheduler.volatility,
+            },
+            "circuit_breakers": {
+                name: {
+                    "open": breaker.is_open,
+                    "half_open": breaker.half_open,
+                    "failures": breaker.failures,
+                }
+                for name, breaker in quote_breakers(engine.quotes).items()
+            },
+            "provider_latency": getattr(engine.quotes, "latency", None),
+            "last_provider": getattr(engine.quotes, "last_provider", None) or getattr(engine.quotes, "name", None),
+            "stream": {
+                "products": sorted(engine.stream.products),
+                "connected": engine.stream.connected,
+            },
+            "backfill": {
+                "supported": engine.backfill_supported,
+                "pending": engine.backfill_pending,
+            },
+            "market": {
+                "limit": engine.market_limit,
+                "listed": engine.market and len(engine.market.listings),
+                "movers_since": engine.market_since,
+            },
+            "metrics": engine.metrics.as_dict(),
+        },
+    }
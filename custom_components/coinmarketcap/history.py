@@ -0,0 +1,229 @@
+"""Compact in-memory price history with rolling indicators."""
+
+from array import array
+from collections import deque
+import math
+
+
+class RollingWindow:
+    """Rolling statistics over the samples of the last ``seconds``.
+
+    The window only keeps a running mean and sum of squared deviations
+    (Welford's algorithm, with a matching removal step) and monotonic index
+    queues on top of the shared ring buffer, so each tick costs amortized
+    O(1). Unlike raw sums of squares, the deviations stay small at large
+    prices, so rounding errors do not build up over long uptimes.
+    """
+
+    def __init__(self, seconds):
+        """Initialize."""
+        self.seconds = seconds
+        self.start = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ema = None
+        self._ema_time = None
+        self._min = deque()
+        self._max = deque()
+
+    def evict(self, buffer, index):
+        """Drop the sample at logical ``index`` if it is still in the window."""
+        if index < self.start or self.count == 0:
+            return
+        price = buffer.price(index)
+        self.start = index + 1
+        self.count -= 1
+        if self.count:
+            delta = price - self.mean
+            self.mean -= delta / self.count
+            self.m2 = max(self.m2 - delta * (price - self.mean), 0.0)
+        else:
+            self.mean = 0.0
+            self.m2 = 0.0
+        if self._min and self._min[0] == index:
+            self._min.popleft()
+        if self._max and self._max[0] == index:
+            self._max.popleft()
+
+    def add(self, buffer, index, timestamp, price):
+        """Add the sample at logical ``index`` and expire old samples."""
+        while self.count and buffer.timestamp(self.start) < timestamp - self.seconds:
+            self.evict(buffer, self.start)
+        if not self.count:
+            self.start = index
+            self.mean = 0.0
+            self.m2 = 0.0
+
+        self.count += 1
+        delta = price - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (price - self.mean)
+        while self._min and buffer.price(self._min[-1]) >= price:
+            self._min.pop()
+        self._min.append(index)
+        while self._max and buffer.price(self._max[-1]) <= price:
+            self._max.pop()
+        self._max.append(index)
+
+        if self.ema is None:
+            self.ema = price
+        else:
+            alpha = 1 - math.exp(-(timestamp - self._ema_time) / self.seconds)
+            self.ema += alpha * (price - self.ema)
+        self._ema_time = timestamp
+
+    def stats(self, buffer, latest):
+        """Return the indicators of this window."""
+        if not self.count:
+            return None
+        mean = self.mean
+        variance = self.m2 / self.count
+        first = buffer.price(self.start)
+        return {
+            "sma": mean,
+            "ema": self.ema,
+            "min": buffer.price(self._min[0]),
+            "max": buffer.price(self._max[0]),
+            "stddev": math.sqrt(variance),
+            "change_percent": (latest / first - 1) * 100 if first else None,
+        }
+
+
+class PriceSeries:
+    """Ring buffer of ``(timestamp, price)`` samples for one coin.
+
+    Samples are stored in two ``array("d")`` columns that grow up to
+    ``capacity`` entries and are then overwritten oldest first.
+    """
+
+    def __init__(self, capacity, windows):
+        """Initialize."""
+        self.capacity = capacity
+        self._timestamps = array("d")
+        self._prices = array("d")
+        self.length = 0
+        self.windows = {label: RollingWindow(seconds) for label, seconds in windows.items()}
+
+    @property
+    def oldest(self):
+        """Return the logical index of the oldest retained sample."""
+        return max(0, self.length - self.capacity)
+
+    def timestamp(self, index):
+        """Return the timestamp at a logical index."""
+        return self._timestamps[index % self.capacity]
+
+    def price(self, index):
+        """Return the price at a logical index."""
+        return self._prices[index % self.capacity]
+
+    @property
+    def latest(self):
+        """Return the most recent price."""
+        return self.price(self.length - 1) if self.length else None
+
+    def append(self, timestamp, price):
+        """Add a sample, overwriting the oldest one when full."""
+        if self.length and timestamp <= self.timestamp(self.length - 1):
+            return
+        index = self.length
+        if index >= self.capacity:
+            for window in self.windows.values():
+                window.evict(self, index - self.capacity)
+        if index < self.capacity:
+            self._timestamps.append(timestamp)
+            self._prices.append(price)
+        else:
+            slot = index % self.capacity
+            self._timestamps[slot] = timestamp
+            self._prices[slot] = price
+        self.length += 1
+        for window in self.windows.values():
+            window.add(self, index, timestamp, price)
+
+    def change_since(self, seconds):
+        """Return the percent change since the first sample of the last ``seconds``."""
+        if self.length < 2:
+            return None
+        start = self.timestamp(self.length - 1) - seconds
+        low, high = self.oldest, self.length - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamp(middle) < start:
+                low = middle + 1
+            else:
+                high = middle
+        first = self.price(low)
+        return (self.latest / first - 1) * 100 if first else None
+
+    def samples(self):
+        """Return the retained samples, oldest first."""
+        return [(self.timestamp(index), self.price(index)) for index in range(self.oldest, self.length)]
+
+    def stats(self):
+        """Return ``{label: indicators}`` for all windows."""
+        latest = self.latest
+        return {label: window.stats(self, latest) for label, window in self.windows.items()}
+
+
+class PriceHistory:
+    """Price series of all coins an engine fetches."""
+
+    def __init__(self, capacity, windows=None):
+        """Initialize."""
+        self.capacity = capacity
+        self.windows = dict(windows or {})
+        self.series = {}
+
+    def reset(self):
+        """Forget all samples."""
+        self.series = {}
+
+    def set_windows(self, windows):
+        """Switch to new windows, replaying the retained samples into them."""
+        windows = dict(windows)
+        if windows == self.windows:
+            return
+        self.windows = windows
+        for symbol, old in self.series.items():
+            series = self.series[symbol] = PriceSeries(self.capacity, windows)
+            for timestamp, price in old.samples():
+                series.append(timestamp, price)
+
+    def add(self, timestamp, prices):
+        """Append a ``{symbol: price}`` snapshot."""
+        for symbol, price in prices.items():
+            series = self.series.get(symbol)
+            if series is None:
+                series = self.series[symbol] = PriceSeries(self.capacity, self.windows)
+            series.append(timestamp, price)
+
+    def seed(self, symbol, samples):
+        """Prepend older ``(timestamp, price)`` samples, e.g. from a backfill."""
+        old = self.series.get(symbol)
+        retained = old.samples() if old is not None else []
+        if retained:
+            samples = [sample for sample in samples if sample[0] < retained[0][0]]
+        if not samples:
+            return
+        series = self.series[symbol] = PriceSeries(self.capacity, self.windows)
+        for timestamp, price in sorted(samples) + retained:
+            series.append(timestamp, price)
+
+    def discard(self, symbols):
+        """Drop the series of coins nobody follows anymore."""
+        for symbol in symbols:
+            self.series.pop(symbol, None)
+
+    def change_since(self, symbol, seconds):
+        """Return the percent change of a coin over the last ``seconds``, or None."""
+        series = self.series.get(symbol)
+        return series.change_since(seconds) if series is not None else None
+
+    def stats(self, symbol):
+        """Return the indicators of a coin, or None if it has no samples."""
+        series = self.series.get(symbol)
+        if series is None or not series.length:
+            return None
+        return series.stats()
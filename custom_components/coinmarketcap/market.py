@@ -0,0 +1,98 @@
+"""Market overview built from one listings response."""
+
+from collections import namedtuple
+from itertools import accumulate
+
+Listing = namedtuple(
+    "Listing",
+    [
+        "id", "symbol", "name", "rank", "price", "market_cap", "volume_24h",
+        "change_1h", "change_24h", "change_7d", "dominance",
+    ],
+)
+
+
+class MarketOverview:
+    """Sorted indexes over the top coins of one listings response.
+
+    The indexes are built once per fetch, the sensors only walk them. Every
+    query takes a ``limit`` so entries asking for fewer coins than the engine
+    fetched see their own top N. ``baseline_ranks`` maps coin IDs to their
+    rank at an earlier fetch and drives the rank movers.
+    """
+
+    def __init__(self, listings, baseline_ranks=None):
+        """Initialize."""
+        self.listings = sorted(listings, key=lambda listing: (listing.rank is None, listing.rank))
+        self._position = {listing.id: position for position, listing in enumerate(self.listings)}
+        self.by_id = {listing.id: listing for listing in self.listings}
+        self.by_symbol = {}
+        for listing in self.listings:
+            # Symbols are not unique, the best ranked coin wins like in the quotes.
+            self.by_symbol.setdefault(listing.symbol, listing)
+        self._market_caps = list(accumulate(listing.market_cap or 0 for listing in self.listings))
+        self._by_change = sorted(
+            (listing for listing in self.listings if listing.change_24h is not None),
+            key=lambda listing: listing.change_24h,
+        )
+        self._by_gain = self._by_change[::-1]
+        baseline_ranks = baseline_ranks or {}
+        self.rank_changes = {
+            listing.id: baseline_ranks[listing.id] - listing.rank
+            for listing in self.listings
+            if listing.rank is not None and baseline_ranks.get(listing.id) is not None
+        }
+        self._by_rank_change = sorted(
+            (listing for listing in self.listings if self.rank_changes.get(listing.id, 0) > 0),
+            key=lambda listing: -self.rank_changes[listing.id],
+        )
+
+    @property
+    def ranks(self):
+        """Return ``{id: rank}`` for use as a later baseline."""
+        return {listing.id: listing.rank for listing in self.listings if listing.rank is not None}
+
+    def _top(self, index, count, limit):
+        """Return the first ``count`` coins of an index that are in the top ``limit``."""
+        if limit is None or limit >= len(self.listings):
+            return index[:count]
+        result = []
+        for listing in index:
+            if self._position[listing.id] < limit:
+                result.append(listing)
+                if len(result) == count:
+                    break
+        return result
+
+    def total_market_cap(self, limit=None):
+        """Return the summed market cap of the top ``limit`` coins."""
+        if not self._market_caps:
+            return None
+        if limit is None:
+            limit = len(self._market_caps)
+        return self._market_caps[min(limit, len(self._market_caps)) - 1] if limit else 0
+
+    def gainers(self, count, limit=None):
+        """Return the coins with the largest 24h gain, best first."""
+        return self._top(self._by_gain, count, limit)
+
+    def losers(self, count, limit=None):
+        """Return the coins with the largest 24h loss, worst first."""
+        return self._top(self._by_change, count, limit)
+
+    def movers(self, count, limit=None):
+        """Return the coins that climbed the most ranks since the baseline."""
+        return self._top(self._by_rank_change, count, limit)
+
+    def dominance(self, listing, limit=None):
+        """Return the market cap share of a coin in percent.
+
+        CoinMarketCap reports the share of the whole market; without it the
+        share of the top ``limit`` coins is used.
+        """
+        if listing.dominance is not None:
+            return listing.dominance
+        total = self.total_market_cap(limit)
+        if not total or listing.market_cap is None:
+            return None
+        return listing.market_cap / total * 100
@@ -0,0 +1,112 @@
+"""Lightweight performance counters for diagnostics."""
+
+from bisect import bisect_left
+from collections import Counter
+import cProfile
+import io
+import pstats
+
+# Upper bounds of the histogram buckets in milliseconds.
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Fixed bucket histogram of durations in milliseconds."""
+
+    def __init__(self, bounds=BUCKETS_MS):
+        """Initialize."""
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+        self.last = None
+
+    def observe(self, seconds):
+        """Record a duration given in seconds."""
+        value = seconds * 1000
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.last = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, fraction):
+        """Return the bucket bound below which ``fraction`` of the samples fall."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for position, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return self.bounds[position] if position < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self):
+        """Return a summary for diagnostics."""
+        return {
+            "count": self.count,
+            "last_ms": self.last,
+            "mean_ms": self.total / self.count if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": self.max,
+            "buckets": {
+                f"le_{bound}" if position < len(self.bounds) else "inf": count
+                for position, (bound, count) in enumerate(zip((*self.bounds, None), self.buckets))
+            },
+        }
+
+
+class Metrics:
+    """Timings and counters of one engine and its API clients."""
+
+    def __init__(self):
+        """Initialize."""
+        self.timings = {
+            "http": Histogram(),
+            "parse": Histogram(),
+            "refresh": Histogram(),
+            "fan_out": Histogram(),
+        }
+        self.requests = 0
+        self.retries = 0
+        self.bytes_parsed = 0
+        self.credits = 0
+        self.errors = Counter()
+        self.profile = None
+
+    def observe(self, name, seconds):
+        """Record a duration."""
+        self.timings[name].observe(seconds)
+
+    def record_error(self, err):
+        """Count an error by its type."""
+        self.errors[type(err).__name__] += 1
+
+    def as_dict(self):
+        """Return all metrics for diagnostics."""
+        return {
+            "timings": {name: histogram.as_dict() for name, histogram in self.timings.items()},
+            "requests": self.requests,
+            "retries": self.retries,
+            "bytes_parsed": self.bytes_parsed,
+            "credits": self.credits,
+            "errors": dict(self.errors),
+            "profile": self.profile,
+        }
+
+
+def summarize_profile(profiler: cProfile.Profile, path=None, limit=25):
+    """Return the top functions of a profile by cumulative time.
+
+    The raw stats are written to ``path`` for tools like snakeviz. Blocking,
+    run it in the executor.
+    """
+    if path is not None:
+        profiler.dump_stats(path)
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return output.getvalue()
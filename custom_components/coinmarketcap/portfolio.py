@@ -0,0 +1,139 @@
+"""Portfolio valuation computed once per coordinator update."""
+
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+Holding = namedtuple("Holding", ["symbol", "amount", "cost"])
+
+Valuation = namedtuple(
+    "Valuation",
+    ["prices", "values", "gains", "total", "allocation", "cost", "gain", "gain_percent"],
+)
+
+HUNDRED = Decimal(100)
+
+
+def parse_portfolios(value):
+    """Parse named portfolios from ``Name: BTC=0.5@20000, ETH; Other: ADA``.
+
+    Returns ``{name: {symbol: (amount, cost)}}``. A coin without ``=amount``
+    or ``@cost`` uses the amount or cost basis of the entry, given as None.
+    Raises ValueError for malformed definitions.
+    """
+    portfolios = {}
+    for part in str(value or "").split(";"):
+        if not part.strip():
+            continue
+        name, separator, coins = part.partition(":")
+        name = name.strip()
+        if not separator or not name or name in portfolios:
+            raise ValueError(f"Invalid portfolio: {part.strip()}")
+        holdings = {}
+        for coin in coins.split(","):
+            coin = coin.strip()
+            if not coin:
+                continue
+            coin, _, cost = coin.partition("@")
+            symbol, _, amount = coin.partition("=")
+            symbol = symbol.strip().upper()
+            if not symbol:
+                raise ValueError(f"Invalid holding in portfolio {name}")
+            try:
+                holdings[symbol] = (
+                    Decimal(amount.strip()) if amount.strip() else None,
+                    Decimal(cost.strip()) if cost.strip() else None,
+                )
+            except InvalidOperation as err:
+                raise ValueError(f"Invalid holding {symbol} in portfolio {name}") from err
+        portfolios[name] = holdings
+    return portfolios
+
+
+def build_holdings(coin_amounts, cost_basis, definition=None):
+    """Return the holdings of a portfolio.
+
+    Without ``definition`` the portfolio holds every coin of the entry,
+    otherwise the ``{symbol: (amount, cost)}`` of ``parse_portfolios`` with
+    missing amounts and costs taken from the entry. The entry's cost basis
+    is for its whole amount, so a portfolio holding another amount gets the
+    cost basis scaled to that amount.
+    """
+    if definition is None:
+        definition = {symbol: (None, None) for symbol in coin_amounts}
+    holdings = []
+    for symbol, (amount, cost) in definition.items():
+        entry_amount = Decimal(str(coin_amounts.get(symbol, 0)))
+        if cost is None and symbol in cost_basis:
+            if amount is None:
+                cost = Decimal(str(cost_basis[symbol]))
+            elif entry_amount:
+                cost = Decimal(str(cost_basis[symbol])) * amount / entry_amount
+        if amount is None:
+            amount = entry_amount
+        holdings.append(Holding(symbol, amount, cost or None))
+    return holdings
+
+
+class PortfolioEngine:
+    """Values all portfolios of an entry once per update.
+
+    Each price is converted to ``Decimal`` once per coin and currency and
+    shared by every portfolio holding the coin. The results are cached until
+    the next ``update``, so entities only look them up. Costs are given in
+    ``cost_currency`` and converted with the rates passed to ``update``.
+    """
+
+    def __init__(self, portfolios, cost_currency):
+        """Initialize with ``{name: [Holding]}``, the default portfolio named None."""
+        self.portfolios = portfolios
+        self.cost_currency = cost_currency
+        self.valuations = {}
+
+    def update(self, data, rates):
+        """Value the portfolios for ``{currency: {symbol: price}}``.
+
+        ``rates`` maps currencies to the factor from the cost currency; P&L
+        is left out for currencies without a rate.
+        """
+        valuations = {}
+        for currency, quotes in data.items():
+            prices = {symbol: Decimal(str(price)) for symbol, price in quotes.items()}
+            rate = rates.get(currency)
+            rate = Decimal(str(rate)) if rate is not None else None
+            for name, holdings in self.portfolios.items():
+                valuations[(name, currency)] = self._value(holdings, prices, rate)
+        self.valuations = valuations
+
+    @staticmethod
+    def _value(holdings, prices, rate):
+        """Value one portfolio in one currency."""
+        values = {}
+        gains = {}
+        total = Decimal(0)
+        cost = None
+        priced_cost_value = Decimal(0)
+        for holding in holdings:
+            price = prices.get(holding.symbol)
+            if price is None:
+                continue
+            value = price * holding.amount
+            values[holding.symbol] = value
+            total += value
+            if holding.cost is not None and rate is not None:
+                holding_cost = holding.cost * rate
+                gains[holding.symbol] = value - holding_cost
+                cost = (cost or Decimal(0)) + holding_cost
+                priced_cost_value += value
+
+        allocation = {
+            symbol: value / total * HUNDRED if total else None for symbol, value in values.items()
+        }
+        gain = gain_percent = None
+        if cost is not None:
+            gain = priced_cost_value - cost
+            gain_percent = gain / cost * HUNDRED if cost else None
+        return Valuation(prices, values, gains, total, allocation, cost, gain, gain_percent)
+
+    def valuation(self, name, currency):
+        """Return the cached valuation of a portfolio, or None before the first update."""
+        return self.valuations.get((name, currency))
@@ -0,0 +1,167 @@
+"""Alternative quote providers and provider selection."""
+
+import asyncio
+from functools import partial
+import logging
+import time
+
+import aiohttp
+from homeassistant.util.json import json_loads
+
+from .api import ApiClient, CoinMarketCapError
+from .const import (
+    COINBASE_API_URL,
+    EXCHANGE_RATES_PATH,
+    HEDGE_DELAY,
+    LATENCY_SMOOTHING,
+    PROVIDER_COINBASE,
+    PROVIDER_FAILOVER,
+    PROVIDER_FASTEST,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_exchange_rates(raw, symbols, keys):
+    """Decode a Coinbase exchange rates payload into prices.
+
+    Coinbase returns how many units of each currency one unit of the
+    requested currency buys, so the price of a coin is the inverse rate.
+    Prices are keyed by ``keys``, which runs parallel to ``symbols``.
+    """
+    payload = json_loads(raw)
+    rates = (payload.get("data") or {}).get("rates") or {}
+    prices = {}
+    for symbol, key in zip(symbols, keys):
+        rate = rates.get(symbol)
+        if rate and float(rate):
+            prices[key] = 1 / float(rate)
+    return {"status": {"credit_count": 0}, "data": prices}
+
+
+class CoinbaseApiClient(ApiClient):
+    """Quote provider for the free Coinbase exchange rates API.
+
+    One request returns the rates of all listed coins, so no API key and no
+    credits are needed. Coins are matched by symbol only.
+    """
+
+    name = "coinbase"
+
+    def __init__(self, session: aiohttp.ClientSession, base_url=COINBASE_API_URL, **kwargs):
+        """Initialize."""
+        super().__init__(session, base_url, **kwargs)
+
+    async def async_get_quotes(self, convert, symbols=None, ids=None):
+        """Return the latest prices for symbols in ``convert``."""
+        keys = [str(coin_id) for coin_id in ids] if ids else symbols
+        return await self.async_get(
+            EXCHANGE_RATES_PATH,
+            {"currency": convert},
+            partial(parse_exchange_rates, symbols=symbols, keys=keys),
+        )
+
+
+class ProviderSelector:
+    """Route quote requests over several providers.
+
+    Providers are tried in the given order, or by their average latency when
+    ``adaptive`` is set, skipping those with an open circuit breaker. A
+    request that fails, or is still running after ``hedge_delay`` seconds,
+    is also sent to the next provider and the first answer wins. Requests
+    are chunked for the provider with the smallest ``chunk_size``. The
+    selector is named after the provider mode it implements.
+    """
+
+    def __init__(self, providers, hedge_delay=HEDGE_DELAY, adaptive=False, clock=time.monotonic):
+        """Initialize."""
+        self.name = PROVIDER_FASTEST if adaptive else PROVIDER_FAILOVER
+        self.providers = providers
+        self.chunk_size = min(
+            (provider.chunk_size for provider in providers if provider.chunk_size), default=None
+        )
+        self.hedge_delay = hedge_delay
+        self.adaptive = adaptive
+        self._clock = clock
+        self.latency = {provider.name: None for provider in providers}
+        self.last_provider = None
+
+    def _ordered(self):
+        """Return the providers in the order they should be asked."""
+        providers = list(self.providers)
+        if self.adaptive:
+            # Unmeasured providers go first so every provider gets a latency.
+            providers.sort(key=lambda provider: self.latency[provider.name] or 0)
+        return sorted(providers, key=lambda provider: provider.breaker.is_open)
+
+    async def _async_timed(self, provider, convert, symbols, ids):
+        """Ask one provider and record its latency."""
+        start = self._clock()
+        payload = await provider.async_get_quotes(convert, symbols=symbols, ids=ids)
+        elapsed = self._clock() - start
+        average = self.latency[provider.name]
+        if average is None:
+            self.latency[provider.name] = elapsed
+        else:
+            self.latency[provider.name] = average + LATENCY_SMOOTHING * (elapsed - average)
+        return payload
+
+    async def async_get_quotes(self, convert, symbols=None, ids=None):
+        """Return the first successful answer of the providers."""
+        candidates = self._ordered()
+        tasks = {}
+        errors = []
+
+        def start_next():
+            provider = candidates[len(tasks) + len(errors)]
+            task = asyncio.ensure_future(self._async_timed(provider, convert, symbols, ids))
+            tasks[task] = provider
+
+        start_next()
+        try:
+            while tasks:
+                can_hedge = len(tasks) + len(errors) < len(candidates)
+                done, _ = await asyncio.wait(
+                    tasks,
+                    timeout=self.hedge_delay if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    _LOGGER.debug("Hedging slow quote request with %s", candidates[len(tasks) + len(errors)].name)
+                    start_next()
+                    continue
+                for task in done:
+                    provider = tasks.pop(task)
+                    try:
+                        payload = task.result()
+                    except CoinMarketCapError as err:
+                        _LOGGER.debug("Quote provider %s failed: %s", provider.name, err)
+                        errors.append(err)
+                        continue
+                    self.last_provider = provider.name
+                    return payload
+                if not tasks and len(errors) < len(candidates):
+                    start_next()
+            raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def build_quote_provider(session, mode, client, **kwargs):
+    """Return the quote provider for ``mode`` with ``client`` as CoinMarketCap provider."""
+    if mode == PROVIDER_COINBASE:
+        return CoinbaseApiClient(session, **kwargs)
+    if mode in (PROVIDER_FAILOVER, PROVIDER_FASTEST):
+        return ProviderSelector(
+            [client, CoinbaseApiClient(session, **kwargs)],
+            adaptive=mode == PROVIDER_FASTEST,
+        )
+    return client
+
+
+def quote_breakers(provider):
+    """Return ``{name: breaker}`` of a quote provider, one per provider it selects from."""
+    if isinstance(provider, ProviderSelector):
+        return {selected.name: selected.breaker for selected in provider.providers}
+    return {provider.name: provider.breaker}
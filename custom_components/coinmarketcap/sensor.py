@@ -1,200 +1,499 @@
 """Support for CoinMarketCap sensors."""
 
-from datetime import timedelta
+from abc import abstractmethod
 import logging
+import time
 from decimal import Decimal
 
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util, slugify
 
-from .const import DOMAIN, CONF_API_KEY, CONF_CRYPTOCURRENCIES, CONF_CURRENCY, CONF_SCAN_INTERVAL, CONF_COIN_AMOUNT
+from .const import DOMAIN, CONF_CRYPTOCURRENCIES, CONF_COIN_AMOUNT, MARKET_TOP_COUNT, SIGNAL_ENTRY_UPDATED
 
 _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback):
     """Set up CoinMarketCap sensor from a config entry."""
-    api_key = entry.data[CONF_API_KEY]
+    coordinator = hass.data[DOMAIN][entry.entry_id]
     cryptocurrencies = entry.data[CONF_CRYPTOCURRENCIES]
-    currency = entry.data[CONF_CURRENCY]
-    scan_interval = timedelta(seconds=entry.data[CONF_SCAN_INTERVAL])
     coin_amounts = entry.data.get(CONF_COIN_AMOUNT, {})
 
-    coordinator = CoinMarketCapDataUpdateCoordinator(hass, api_key, cryptocurrencies, currency, scan_interval)
-    await coordinator.async_config_entry_first_refresh()
-
-    sensors = [
-        CoinMarketCapSensor(coordinator, crypto, coin_amounts.get(crypto, 0))
+    coin_sensors = {
+        (crypto, currency): CoinMarketCapSensor(coordinator, crypto, currency, coin_amounts.get(crypto, 0))
+        for currency in coordinator.currencies
         for crypto in cryptocurrencies
-    ]
+    }
+    sensors = list(coin_sensors.values())
     
-    # Add Total Portfolio Value sensor
-    sensors.append(CoinMarketCapTotalValueSensor(coordinator, coin_amounts))
+    # Add a Total Portfolio Value sensor per currency and named portfolio
+    portfolio_sensors = {
+        (name, currency): CoinMarketCapTotalValueSensor(coordinator, currency, name)
+        for name in coordinator.portfolio.portfolios
+        for currency in coordinator.currencies
+    }
+    sensors.extend(portfolio_sensors.values())
+
+    def build_market_sensors():
+        return {
+            key: CoinMarketCapMarketSensor(coordinator, key, name, icon, unit, value_fn)
+            for key, name, icon, unit, value_fn in MARKET_SENSORS
+        }
+
+    market_sensors = build_market_sensors() if coordinator.market_overview else {}
+    sensors.extend(market_sensors.values())
+
+    # Added last so they report the writes of the current update
+    sensors.append(CoinMarketCapSuppressedWritesSensor(coordinator))
+    sensors.extend(
+        CoinMarketCapMetricSensor(coordinator, key, name, icon, unit, value_fn)
+        for key, name, icon, unit, value_fn in METRIC_SENSORS
+    )
 
     async_add_entities(sensors)
 
-class CoinMarketCapDataUpdateCoordinator(DataUpdateCoordinator):
-    """Class to manage fetching CoinMarketCap data."""
+    @callback
+    def async_entry_updated():
+        """Add, remove and update sensors after an in-place options change."""
+        coin_amounts = entry.data.get(CONF_COIN_AMOUNT, {})
+        registry = er.async_get(hass)
+
+        def remove(sensor):
+            if sensor.entity_id and registry.async_get(sensor.entity_id):
+                registry.async_remove(sensor.entity_id)
+            else:
+                hass.async_create_task(sensor.async_remove())
+
+        for key in [key for key in coin_sensors if key[0] not in coordinator.cryptocurrencies]:
+            remove(coin_sensors.pop(key))
+        for key in [key for key in portfolio_sensors if key[0] not in coordinator.portfolio.portfolios]:
+            remove(portfolio_sensors.pop(key))
+        if not coordinator.market_overview:
+            for key in list(market_sensors):
+                remove(market_sensors.pop(key))
+
+        new_sensors = []
+        for currency in coordinator.currencies:
+            for crypto in coordinator.cryptocurrencies:
+                amount = coin_amounts.get(crypto, 0)
+                sensor = coin_sensors.get((crypto, currency))
+                if sensor is not None:
+                    sensor.amount = Decimal(str(amount))
+                    sensor.async_options_updated()
+                else:
+                    sensor = coin_sensors[(crypto, currency)] = CoinMarketCapSensor(coordinator, crypto, currency, amount)
+                    new_sensors.append(sensor)
+
+            for name in coordinator.portfolio.portfolios:
+                sensor = portfolio_sensors.get((name, currency))
+                if sensor is not None:
+                    sensor.async_options_updated()
+                else:
+                    sensor = portfolio_sensors[(name, currency)] = CoinMarketCapTotalValueSensor(coordinator, currency, name)
+                    new_sensors.append(sensor)
+
+        if coordinator.market_overview and not market_sensors:
+            market_sensors.update(build_market_sensors())
+            new_sensors.extend(market_sensors.values())
+        else:
+            for sensor in market_sensors.values():
+                if sensor.hass is not None:
+                    sensor._handle_coordinator_update()
+
+        if new_sensors:
+            async_add_entities(new_sensors)
+
+    entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_ENTRY_UPDATED.format(entry.entry_id), async_entry_updated)
+    )
+
+METRIC_SENSORS = (
+    (
+        "refresh_duration", "Refresh Duration", "mdi:timer-outline", "ms",
+        lambda coordinator: _round(coordinator.engine.metrics.timings["refresh"].last),
+    ),
+    (
+        "credits_used_today", "Credits Used Today", "mdi:counter", None,
+        lambda coordinator: coordinator.engine.scheduler.used_today,
+    ),
+    (
+        "api_errors", "API Errors", "mdi:alert-circle-outline", None,
+        lambda coordinator: sum(coordinator.engine.metrics.errors.values()),
+    ),
+    (
+        "state_writes", "State Writes", "mdi:database-plus", None,
+        lambda coordinator: coordinator.state_writes,
+    ),
+)
+
+def _market_cap(coordinator, market):
+    """Return the market cap of the top coins in the first currency."""
+    rate = coordinator.engine.rate(coordinator.currencies[0])
+    total = market.total_market_cap(coordinator.market_overview)
+    value = _round(total * rate) if total is not None and rate is not None else None
+    return value, {"cryptocurrencies": min(coordinator.market_overview, len(market.listings))}
+
+def _dominance(coordinator, market):
+    """Return the Bitcoin dominance and the shares of the largest coins."""
+    limit = coordinator.market_overview
+    bitcoin = market.by_symbol.get("BTC")
+    value = bitcoin and _round(market.dominance(bitcoin, limit))
+    return value, {
+        "dominance": {
+            listing.symbol: _round(market.dominance(listing, limit))
+            for listing in market.listings[:min(limit, MARKET_TOP_COUNT)]
+        },
+    }
+
+def _ranking(index):
+    """Return a value function for the first coin of a 24h change index."""
+
+    def value_fn(coordinator, market):
+        listings = getattr(market, index)(MARKET_TOP_COUNT, coordinator.market_overview)
+        return (listings[0].symbol if listings else None), {
+            "change_24h_percent": _round(listings[0].change_24h) if listings else None,
+            index: [
+                {
+                    "cryptocurrency": listing.symbol,
+                    "name": listing.name,
+                    "rank": listing.rank,
+                    "change_24h_percent": _round(listing.change_24h),
+                }
+                for listing in listings
+            ],
+        }
 
-    def __init__(self, hass, api_key, cryptocurrencies, currency, scan_interval):
-        """Initialize."""
-        self.api_key = api_key
-        self.cryptocurrencies = cryptocurrencies
-        self.currency = currency
-        self.session = async_get_clientsession(hass)
-        super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=scan_interval)
-
-    async def _async_update_data(self):
-        """Fetch data from CoinMarketCap."""
-        try:
-            url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest"
-            params = {
-                "symbol": ",".join(self.cryptocurrencies),
-                "convert": self.currency,
-            }
-            headers = {
-                "X-CMC_PRO_API_KEY": self.api_key,
+    return value_fn
+
+def _movers(coordinator, market):
+    """Return the coin that climbed the most ranks and the runners-up."""
+    listings = market.movers(MARKET_TOP_COUNT, coordinator.market_overview)
+    since = coordinator.engine.market_since
+    return (listings[0].symbol if listings else None), {
+        "since": since and dt_util.utc_from_timestamp(since).isoformat(),
+        "movers": [
+            {
+                "cryptocurrency": listing.symbol,
+                "name": listing.name,
+                "rank": listing.rank,
+                "rank_change": market.rank_changes[listing.id],
             }
+            for listing in listings
+        ],
+    }
+
+MARKET_SENSORS = (
+    ("market_cap", "Total Market Cap", "mdi:chart-pie", "currency", _market_cap),
+    ("btc_dominance", "Bitcoin Dominance", "mdi:percent", "%", _dominance),
+    ("top_gainer", "Top Gainer 24h", "mdi:trending-up", None, _ranking("gainers")),
+    ("top_loser", "Top Loser 24h", "mdi:trending-down", None, _ranking("losers")),
+    ("top_rank_mover", "Top Rank Mover", "mdi:podium", None, _movers),
+)
+
+def _round(value):
+    """Return a Decimal as a float rounded to cents, keeping None."""
+    return None if value is None else round(float(value), 2)
+
+class ChangeFilter:
+    """Decide whether a new entity state is worth writing.
+
+    Numeric values are compared against an absolute and a relative deadband,
+    any other attribute change is always written, and ``max_age`` forces a
+    heartbeat write even when nothing moved.
+    """
+
+    def __init__(self, min_change=0, min_change_percent=0, max_age=0, clock=time.monotonic):
+        """Initialize the filter."""
+        self.min_change = min_change
+        self.min_change_percent = min_change_percent
+        self.max_age = max_age
+        self._clock = clock
+        self._last_values = None
+        self._last_other = None
+        self._last_written = None
+
+    def _moved(self, old, new):
+        """Return True if a numeric value left the deadband."""
+        if old is None or new is None:
+            return old is not new
+        delta = abs(new - old)
+        if not self.min_change and not self.min_change_percent:
+            return delta > 0
+        if self.min_change and delta >= self.min_change:
+            return True
+        return bool(self.min_change_percent) and delta >= abs(old) * self.min_change_percent / 100
+
+    def should_write(self, values, other):
+        """Return True if ``values`` or ``other`` differ enough from the last write."""
+        now = self._clock()
+        write = (
+            self._last_written is None
+            or other != self._last_other
+            or (self.max_age and now - self._last_written >= self.max_age)
+            or any(self._moved(self._last_values.get(key), value) for key, value in values.items())
+        )
+        if write:
+            self._last_values = dict(values)
+            self._last_other = other
+            self._last_written = now
+        return write
+
+class CoinMarketCapEntity(CoordinatorEntity, SensorEntity):
+    """Base class for CoinMarketCap sensors that skips insignificant writes.
+
+    Attributes listed in ``_passive_attributes`` never trigger a write on their
+    own; they are refreshed whenever the state is written anyway.
+    Subclasses implement ``_update_from_coordinator``.
+    """
+
+    def __init__(self, coordinator):
+        """Initialize the entity."""
+        super().__init__(coordinator)
+        self._passive_attributes = set()
+        self._change_filter = ChangeFilter(
+            coordinator.min_change,
+            coordinator.min_change_percent,
+            coordinator.max_state_age,
+        )
 
-            async with self.session.get(url, params=params, headers=headers) as response:
-                if response.status != 200:
-                    raise UpdateFailed(f"Error communicating with CoinMarketCap: {response.status}")
-
-                data = await response.json()
-                return {
-                    symbol: data["data"][symbol]["quote"][self.currency]["price"]
-                    for symbol in self.cryptocurrencies
-                }
-        except Exception as err:
-            raise UpdateFailed(f"Error communicating with CoinMarketCap: {err}")
+    @abstractmethod
+    @callback
+    def _update_from_coordinator(self):
+        """Compute state and attributes from the latest coordinator data."""
+
+    @callback
+    def async_options_updated(self):
+        """Pick up changed settings and write the new state."""
+        self._change_filter.min_change = self.coordinator.min_change
+        self._change_filter.min_change_percent = self.coordinator.min_change_percent
+        self._change_filter.max_age = self.coordinator.max_state_age
+        if self.hass is not None:
+            self._handle_coordinator_update()
+
+    def _filtered_values(self):
+        """Return the numeric values that are subject to the deadband."""
+        return {"state": self._attr_native_value}
+
+    def _filter_input(self):
+        """Return the deadband values and the other attributes the filter compares."""
+        values = self._filtered_values()
+        other = (
+            self.available,
+            {
+                key: value
+                for key, value in self._attr_extra_state_attributes.items()
+                if key not in values and key not in self._passive_attributes
+            },
+        )
+        return values, other
 
-class CoinMarketCapSensor(SensorEntity):
+    async def async_added_to_hass(self):
+        """Let the change filter know about the state written on add."""
+        await super().async_added_to_hass()
+        self._change_filter.should_write(*self._filter_input())
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Handle updated data from the coordinator."""
+        self._update_from_coordinator()
+        if self._change_filter.should_write(*self._filter_input()):
+            self.coordinator.state_writes += 1
+            self.async_write_ha_state()
+        else:
+            self.coordinator.suppressed_writes += 1
+
+class CoinMarketCapSensor(CoinMarketCapEntity):
     """Representation of a CoinMarketCap sensor."""
 
-    def __init__(self, coordinator, cryptocurrency, amount):
+    _attr_icon = "mdi:currency-usd"
+
+    def __init__(self, coordinator, cryptocurrency, currency, amount):
         """Initialize the sensor."""
-        self.coordinator = coordinator
+        super().__init__(coordinator)
         self.cryptocurrency = cryptocurrency
+        self.currency = currency
         self.amount = Decimal(str(amount))
+        if len(coordinator.currencies) > 1:
+            self._attr_name = f"{cryptocurrency} Value {currency}"
+        else:
+            self._attr_name = f"{cryptocurrency} Value"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.entry_id}_{cryptocurrency}_value_{currency}"
+        self._attr_native_unit_of_measurement = currency
+        self._update_from_coordinator()
+
+    @callback
+    def _update_from_coordinator(self):
+        """Read state and attributes from the coordinator's portfolio valuation."""
+        price = (self.coordinator.data or {}).get(self.currency, {}).get(self.cryptocurrency)
+        valuation = self.coordinator.portfolio.valuation(None, self.currency)
+        if valuation is not None and price is not None:
+            self._attr_native_value = _round(valuation.values.get(self.cryptocurrency))
+            allocation = valuation.allocation.get(self.cryptocurrency)
+            gain = valuation.gains.get(self.cryptocurrency)
+        else:
+            self._attr_native_value = None
+            allocation = gain = None
+
+        stats = self.coordinator.price_stats(self.cryptocurrency, self.currency)
+        self._passive_attributes = {"allocation", "unrealized_gain", *stats}
+        self._attr_extra_state_attributes = {
+            "cryptocurrency": self.cryptocurrency,
+            "amount": str(self.amount),
+            "price": price,
+            "allocation": _round(allocation),
+            "unrealized_gain": _round(gain),
+            "stale": self.coordinator.stale,
+            **stats,
+        }
 
     @property
-    def name(self):
-        """Return the name of the sensor."""
-        return f"{self.cryptocurrency} Value"
+    def available(self):
+        """Return True if the coordinator has a price for this coin."""
+        return super().available and self._attr_extra_state_attributes["price"] is not None
 
-    @property
-    def unique_id(self):
-        """Return a unique ID to use for this sensor."""
-        return f"{DOMAIN}_{self.cryptocurrency}_value_{self.coordinator.currency}"
+    def _filtered_values(self):
+        """Return the numeric values that are subject to the deadband."""
+        return {"state": self._attr_native_value, "price": self._attr_extra_state_attributes["price"]}
 
-    @property
-    def state(self):
-        """Return the state of the sensor."""
-        price = self.coordinator.data.get(self.cryptocurrency)
-        
-        if price is not None:
-            total_value = Decimal(str(price)) * self.amount
-            return round(float(total_value), 2)
-        
-        return None
+class CoinMarketCapTotalValueSensor(CoinMarketCapEntity):
+    """Representation of a CoinMarketCap Total Portfolio Value sensor.
 
-    @property
-    def unit_of_measurement(self):
-        """Return the unit of measurement this sensor expresses itself in."""
-        return self.coordinator.currency
+    ``portfolio`` is None for the portfolio of all coins of the entry.
+    """
 
-    @property
-    def icon(self):
-        """Return the icon to use in the frontend."""
-        return "mdi:currency-usd"
+    _attr_icon = "mdi:currency-usd"
 
-    @property
-    def extra_state_attributes(self):
-        """Return the state attributes of the sensor."""
-        return {
-            "cryptocurrency": self.cryptocurrency,
-            "amount": str(self.amount),
-            "price": self.coordinator.data.get(self.cryptocurrency),
+    def __init__(self, coordinator, currency, portfolio=None):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self.currency = currency
+        self.portfolio = portfolio
+        name = "Total Portfolio Value" if portfolio is None else f"{portfolio} Portfolio Value"
+        if len(coordinator.currencies) > 1:
+            self._attr_name = f"{name} {currency}"
+        else:
+            self._attr_name = name
+        if portfolio is None:
+            self._attr_unique_id = f"{DOMAIN}_{coordinator.entry_id}_total_portfolio_value_{currency}"
+        else:
+            self._attr_unique_id = f"{DOMAIN}_{coordinator.entry_id}_portfolio_{slugify(portfolio)}_value_{currency}"
+        self._attr_native_unit_of_measurement = currency
+        self._passive_attributes = {"cost_basis", "unrealized_gain", "unrealized_gain_percent"}
+        self._update_from_coordinator()
+
+    @callback
+    def _update_from_coordinator(self):
+        """Read the portfolio total from the coordinator's valuation."""
+        holdings = self.coordinator.portfolio.portfolios.get(self.portfolio, [])
+        valuation = self.coordinator.portfolio.valuation(self.portfolio, self.currency)
+        self._attr_native_value = _round(valuation.total) if valuation is not None else 0.0
+        self._attr_extra_state_attributes = {
+            "cryptocurrencies": [holding.symbol for holding in holdings],
+            "cost_basis": _round(valuation and valuation.cost),
+            "unrealized_gain": _round(valuation and valuation.gain),
+            "unrealized_gain_percent": _round(valuation and valuation.gain_percent),
+            "stale": self.coordinator.stale,
         }
 
-    @property
-    def available(self):
-        """Return True if entity is available."""
-        return self.coordinator.last_update_success
+class CoinMarketCapSuppressedWritesSensor(CoordinatorEntity, SensorEntity):
+    """Number of state writes skipped by the change filters of an entry."""
 
-    async def async_added_to_hass(self):
-        """When entity is added to hass."""
-        self.async_on_remove(
-            self.coordinator.async_add_listener(
-                self.async_write_ha_state
-            )
-        )
-
-    async def async_update(self):
-        """Update the entity."""
-        await self.coordinator.async_request_refresh()
+    _attr_icon = "mdi:database-minus"
+    _attr_name = "Suppressed State Writes"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
 
-class CoinMarketCapTotalValueSensor(SensorEntity):
-    """Representation of a CoinMarketCap Total Portfolio Value sensor."""
-
-    def __init__(self, coordinator, coin_amounts):
+    def __init__(self, coordinator):
         """Initialize the sensor."""
-        self.coordinator = coordinator
-        self.coin_amounts = {crypto: Decimal(str(amount)) for crypto, amount in coin_amounts.items()}
+        super().__init__(coordinator)
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.entry_id}_suppressed_writes"
+        self._attr_native_value = coordinator.suppressed_writes
 
     @property
-    def name(self):
-        """Return the name of the sensor."""
-        return "Total Portfolio Value"
+    def available(self):
+        """Return True, the counter is meaningful even while the API is down."""
+        return True
 
-    @property
-    def unique_id(self):
-        """Return a unique ID to use for this sensor."""
-        return f"{DOMAIN}_total_portfolio_value_{self.coordinator.currency}"
+    @callback
+    def _handle_coordinator_update(self):
+        """Write the counter only when it changed."""
+        if self._attr_native_value != self.coordinator.suppressed_writes:
+            self._attr_native_value = self.coordinator.suppressed_writes
+            self.async_write_ha_state()
 
-    @property
-    def state(self):
-        """Return the state of the sensor."""
-        total_value = Decimal('0')
-        for crypto, amount in self.coin_amounts.items():
-            price = self.coordinator.data.get(crypto)
-            if price is not None:
-                total_value += Decimal(str(price)) * amount
-        return round(float(total_value), 2)
+class CoinMarketCapMarketSensor(CoordinatorEntity, SensorEntity):
+    """Market wide figure of the engine's listings of the top coins.
 
-    @property
-    def unit_of_measurement(self):
-        """Return the unit of measurement this sensor expresses itself in."""
-        return self.coordinator.currency
+    The listings only change once per refresh, so the state is only written
+    when the value or the attributes changed, not on streamed price pushes.
+    """
 
-    @property
-    def icon(self):
-        """Return the icon to use in the frontend."""
-        return "mdi:currency-usd"
+    def __init__(self, coordinator, key, name, icon, unit, value_fn):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._value_fn = value_fn
+        self._attr_name = name
+        self._attr_icon = icon
+        self._attr_native_unit_of_measurement = coordinator.currencies[0] if unit == "currency" else unit
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.entry_id}_market_{key}"
+        self._attr_native_value = None
+        self._attr_extra_state_attributes = {}
+        self._last_available = None
+        self._update_from_engine()
 
     @property
-    def extra_state_attributes(self):
-        """Return the state attributes of the sensor."""
-        return {
-            "cryptocurrencies": list(self.coin_amounts.keys()),
-        }
+    def available(self):
+        """Return True while the engine has a market overview."""
+        return super().available and self.coordinator.engine.market is not None
+
+    def _update_from_engine(self):
+        """Read the value from the market overview and return True if it changed."""
+        market = self.coordinator.engine.market
+        value, attributes = (None, {}) if market is None else self._value_fn(self.coordinator, market)
+        changed = (value, attributes) != (self._attr_native_value, self._attr_extra_state_attributes)
+        self._attr_native_value = value
+        self._attr_extra_state_attributes = attributes
+        return changed
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Write the state only when the market figures changed."""
+        available = self.available
+        if self._update_from_engine() or available != self._last_available:
+            self._last_available = available
+            self.coordinator.state_writes += 1
+            self.async_write_ha_state()
+
+class CoinMarketCapMetricSensor(CoordinatorEntity, SensorEntity):
+    """Performance counter of the engine or the entry, disabled by default."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, coordinator, key, name, icon, unit, value_fn):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._value_fn = value_fn
+        self._attr_name = name
+        self._attr_icon = icon
+        self._attr_native_unit_of_measurement = unit
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.entry_id}_{key}"
+        self._attr_native_value = value_fn(coordinator)
 
     @property
     def available(self):
-        """Return True if entity is available."""
-        return self.coordinator.last_update_success
-
-    async def async_added_to_hass(self):
-        """When entity is added to hass."""
-        self.async_on_remove(
-            self.coordinator.async_add_listener(
-                self.async_write_ha_state
-            )
-        )
-
-    async def async_update(self):
-        """Update the entity."""
-        await self.coordinator.async_request_refresh()
\ No newline at end of file
+        """Return True, the counters are meaningful even while the API is down."""
+        return True
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Write the value only when it changed."""
+        value = self._value_fn(self.coordinator)
+        if self._attr_native_value != value:
+            self._attr_native_value = value
+            self.async_write_ha_state()
@@ -0,0 +1,124 @@
+"""Hourly long-term statistics aggregated from price ticks."""
+
+import logging
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import BAR_SECONDS, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class HourlyAggregator:
+    """Time weighted hourly mean, min and max of several series.
+
+    A value holds until the next tick of its series, also across the start of
+    the next hour, so the mean weights every value by how long it was current
+    no matter whether it was polled or streamed. Hours without any tick are
+    left out.
+    """
+
+    def __init__(self, period=BAR_SECONDS):
+        """Initialize."""
+        self.period = period
+        self.hour = None
+        # key: [weighted sum, seconds, min, max, last time, last value]
+        self._series = {}
+
+    def add(self, timestamp, values):
+        """Add a ``{key: value}`` tick.
+
+        Returns ``(hour, {key: (mean, min, max)})`` when the tick closed the
+        previous hour, otherwise None. Ticks older than the current hour are
+        ignored.
+        """
+        hour = timestamp - timestamp % self.period
+        if self.hour is not None and hour < self.hour:
+            return None
+
+        closed = None
+        if self.hour is not None and hour > self.hour:
+            end = self.hour + self.period
+            stats = {}
+            for key, (weighted, seconds, low, high, last_time, last_value) in self._series.items():
+                weighted += last_value * (end - last_time)
+                seconds += end - last_time
+                stats[key] = (weighted / seconds if seconds else last_value, low, high)
+            closed = (self.hour, stats)
+            if hour == end:
+                self._series = {
+                    key: [0.0, 0.0, series[5], series[5], hour, series[5]]
+                    for key, series in self._series.items()
+                    if key in values
+                }
+            else:
+                self._series = {}
+        self.hour = hour
+
+        for key, value in values.items():
+            series = self._series.get(key)
+            if series is None:
+                self._series[key] = [0.0, 0.0, value, value, timestamp, value]
+                continue
+            elapsed = timestamp - series[4]
+            series[0] += series[5] * elapsed
+            series[1] += elapsed
+            series[2] = min(series[2], value)
+            series[3] = max(series[3], value)
+            series[4] = timestamp
+            series[5] = value
+        return closed
+
+
+class StatisticsImporter:
+    """Write hourly statistics of entry values into the recorder.
+
+    Values are aggregated in memory and imported as external statistics once
+    their hour is over, one row per statistic and hour instead of a state row
+    per tick. Statistic IDs start with the entry ID, so entries with the same
+    coins or portfolio names do not write into each other's statistics. The
+    hour running during a restart is lost.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id):
+        """Initialize."""
+        self.hass = hass
+        self.prefix = f"{DOMAIN}:{slugify(entry_id)}"
+        self.aggregator = HourlyAggregator()
+        self.metadata = {}
+        self.imported = 0
+
+    @callback
+    def async_add(self, timestamp, values):
+        """Add a tick of ``{key: (name, unit, value)}`` and import closed hours."""
+        for key, (name, unit, _) in values.items():
+            if key not in self.metadata:
+                self.metadata[key] = StatisticMetaData(
+                    has_mean=True,
+                    has_sum=False,
+                    name=name,
+                    source=DOMAIN,
+                    statistic_id=f"{self.prefix}_{key}",
+                    unit_of_measurement=unit,
+                )
+        closed = self.aggregator.add(timestamp, {key: value for key, (_, _, value) in values.items()})
+        if closed is not None:
+            self._async_import(*closed)
+
+    @callback
+    def _async_import(self, hour, stats):
+        """Hand the statistics of a closed hour to the recorder."""
+        if "recorder" not in self.hass.config.components:
+            _LOGGER.debug("The recorder is not loaded, dropping the statistics of %s values", len(stats))
+            return
+        start = dt_util.utc_from_timestamp(hour)
+        for key, (mean, low, high) in stats.items():
+            async_add_external_statistics(
+                self.hass,
+                self.metadata[key],
+                [StatisticData(start=start, mean=mean, min=low, max=high)],
+            )
+        self.imported += len(stats)
@@ -0,0 +1,140 @@
+"""Live prices from the Coinbase ticker websocket."""
+
+import asyncio
+import logging
+import random
+import time
+
+import aiohttp
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util.json import json_loads
+
+from .const import BACKOFF_BASE, BACKOFF_MAX, COINBASE_WS_URL, DOMAIN, STREAM_HEARTBEAT, STREAM_THROTTLE
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TickerStream:
+    """Persistent ticker subscription that pushes coalesced prices.
+
+    Ticks are collected per symbol and handed to ``on_prices`` as one
+    ``{symbol: price}`` batch at most every ``throttle`` seconds, so the
+    number of state writes does not depend on the tick rate. Dropped
+    connections are retried with jittered backoff; REST polling keeps
+    running meanwhile and covers the gap.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        session: aiohttp.ClientSession,
+        on_prices,
+        url=COINBASE_WS_URL,
+        throttle=STREAM_THROTTLE,
+        clock=time.monotonic,
+    ):
+        """Initialize."""
+        self.hass = hass
+        self.session = session
+        self.url = url
+        self.throttle = throttle
+        self._on_prices = on_prices
+        self._clock = clock
+        self.products = {}
+        self.connected = False
+        self._task = None
+        self._pending = {}
+        self._flush_handle = None
+        self._last_flush = None
+        self._last_error = None
+
+    @callback
+    def async_update(self, symbols, currency):
+        """Stream ``symbols`` in ``currency``, reconnecting if the set changed."""
+        products = {f"{symbol}-{currency}": symbol for symbol in symbols}
+        if products == self.products:
+            return
+        self.products = products
+        self._async_cancel()
+        if products:
+            self._task = self.hass.async_create_background_task(self._async_run(), f"{DOMAIN} ticker stream")
+
+    @callback
+    def _async_cancel(self):
+        """Stop the connection task and drop pending ticks."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending = {}
+        self.connected = False
+
+    async def async_stop(self):
+        """Close the stream."""
+        task = self._task
+        self.products = {}
+        self._async_cancel()
+        if task is not None:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _async_run(self):
+        """Keep a subscribed connection open until cancelled."""
+        attempt = 0
+        while True:
+            try:
+                async with self.session.ws_connect(self.url, heartbeat=STREAM_HEARTBEAT) as websocket:
+                    await websocket.send_json({
+                        "type": "subscribe",
+                        "product_ids": sorted(self.products),
+                        "channels": ["ticker"],
+                    })
+                    async for message in websocket:
+                        if message.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        if not self.connected:
+                            _LOGGER.debug("Ticker stream connected for %s", ", ".join(sorted(self.products)))
+                            self.connected = True
+                            attempt = 0
+                        self._handle_message(json_loads(message.data))
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
+                _LOGGER.debug("Ticker stream failed: %r", err)
+            self.connected = False
+
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            attempt += 1
+            _LOGGER.debug("Reconnecting the ticker stream in %.1fs", delay)
+            await asyncio.sleep(delay)
+
+    @callback
+    def _handle_message(self, message):
+        """Collect a ticker price or report a subscription error."""
+        kind = message.get("type")
+        if kind == "ticker":
+            symbol = self.products.get(message.get("product_id"))
+            if symbol is None or message.get("price") is None:
+                return
+            self._pending[symbol] = float(message["price"])
+            if self._flush_handle is None:
+                delay = 0
+                if self._last_flush is not None:
+                    delay = max(0, self._last_flush + self.throttle - self._clock())
+                self._flush_handle = self.hass.loop.call_later(delay, self._flush)
+        elif kind == "error":
+            error = f"{message.get('message')}: {message.get('reason')}"
+            if error != self._last_error:
+                _LOGGER.warning("Ticker stream error: %s", error)
+                self._last_error = error
+
+    @callback
+    def _flush(self):
+        """Hand the collected prices to the callback."""
+        self._flush_handle = None
+        self._last_flush = self._clock()
+        prices, self._pending = self._pending, {}
+        if prices:
+            self._on_prices(prices)
@@ -0,0 +1,151 @@
+"""Append-only local store for hourly OHLCV bars."""
+
+import math
+import mmap
+import os
+import struct
+import threading
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import slugify
+
+from .const import BAR_SECONDS, DATA_SERIES, DOMAIN
+
+# time, open, high, low, close, volume
+BAR = struct.Struct("<6d")
+
+
+class SeriesFile:
+    """Hourly bars of one coin in one currency.
+
+    Bars are fixed size little endian records sorted by time, so a file can be
+    memory mapped and searched by bisection without parsing it. All methods
+    block and must run in the executor.
+    """
+
+    def __init__(self, path):
+        """Initialize."""
+        self.path = path
+
+    def last_time(self):
+        """Return the time of the newest bar, or None if there is none."""
+        try:
+            count = os.path.getsize(self.path) // BAR.size
+        except FileNotFoundError:
+            return None
+        if not count:
+            return None
+        with open(self.path, "rb") as file:
+            file.seek((count - 1) * BAR.size)
+            return BAR.unpack(file.read(BAR.size))[0]
+
+    def append(self, bars):
+        """Append the bars newer than the stored ones and return how many were written."""
+        last = self.last_time()
+        rows = []
+        for bar in sorted(bars):
+            if last is None or bar[0] > last:
+                rows.append(BAR.pack(*bar))
+                last = bar[0]
+        if not rows:
+            return 0
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "ab") as file:
+            # Drop a record torn by an interrupted write.
+            size = file.tell()
+            if size % BAR.size:
+                file.truncate(size - size % BAR.size)
+            file.write(b"".join(rows))
+        return len(rows)
+
+    @staticmethod
+    def _search(view, count, timestamp):
+        """Return the position of the first bar at or after ``timestamp``."""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if BAR.unpack_from(view, middle * BAR.size)[0] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def read(self, start, end):
+        """Return the bars with ``start <= time < end``."""
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return []
+        with file:
+            count = os.fstat(file.fileno()).st_size // BAR.size
+            if not count:
+                return []
+            with mmap.mmap(file.fileno(), count * BAR.size, access=mmap.ACCESS_READ) as view:
+                first = self._search(view, count, start)
+                last = self._search(view, count, end)
+                return [BAR.unpack_from(view, position * BAR.size) for position in range(first, last)]
+
+
+class PriceSeriesStore:
+    """Directory of ``SeriesFile`` objects, one per coin and currency."""
+
+    def __init__(self, directory):
+        """Initialize."""
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def file(self, symbol, currency):
+        """Return the series of ``symbol`` in ``currency``."""
+        return SeriesFile(os.path.join(self.directory, f"{slugify(currency)}_{slugify(symbol)}.bin"))
+
+    def last_times(self, symbols, currency):
+        """Return ``{symbol: time of the newest bar or None}``."""
+        return {symbol: self.file(symbol, currency).last_time() for symbol in symbols}
+
+    def append(self, bars, currency):
+        """Append ``{symbol: bars}`` and return the number of bars written."""
+        with self._lock:
+            return sum(self.file(symbol, currency).append(rows) for symbol, rows in bars.items())
+
+    def read(self, symbols, currency, start, end):
+        """Return ``{symbol: bars}`` with ``start <= time < end``."""
+        return {symbol: self.file(symbol, currency).read(start, end) for symbol in symbols}
+
+
+class BarBuilder:
+    """Aggregate price ticks of one coin into hourly bars.
+
+    Ticks carry no volume, so bars built from them have a NaN volume.
+    """
+
+    def __init__(self):
+        """Initialize."""
+        self.current = None
+        self.completed = []
+
+    def add(self, timestamp, price):
+        """Add a tick, closing the current bar when a new hour started."""
+        hour = timestamp - timestamp % BAR_SECONDS
+        if self.current is not None and hour == self.current[0]:
+            self.current[2] = max(self.current[2], price)
+            self.current[3] = min(self.current[3], price)
+            self.current[4] = price
+        elif self.current is None or hour > self.current[0]:
+            if self.current is not None:
+                self.completed.append(tuple(self.current))
+            self.current = [hour, price, price, price, price, math.nan]
+
+    def pop_completed(self):
+        """Return and forget the closed bars."""
+        completed, self.completed = self.completed, []
+        return completed
+
+
+def get_series_store(hass: HomeAssistant) -> PriceSeriesStore:
+    """Return the shared OHLCV store."""
+    hass.data.setdefault(DOMAIN, {})
+    store = hass.data[DOMAIN].get(DATA_SERIES)
+    if store is None:
+        store = hass.data[DOMAIN][DATA_SERIES] = PriceSeriesStore(hass.config.path(".storage", f"{DOMAIN}.ohlcv"))
+    return store
@@ -0,0 +1 @@
+"""Benchmarks for the CoinMarketCap integration."""
@@ -0,0 +1,265 @@
+"""Setup, refresh, memory, state write, parse and valuation benchmarks from 10 to 5,000 coins.
+
+Every measurement is compared against ``baselines.json`` and fails the run
+when it regressed beyond the tolerance of its kind. Timings are stored as
+ratios to a reference measured alongside, so the baselines hold on slower
+and faster machines. Counts must not grow at all. Run with
+``--update-baselines`` to store the current measurements.
+
+The stub rejects historical OHLCV calls like on the basic plan, so the
+numbers show the steady state without the one-off backfill.
+"""
+
+import gc
+import json
+from pathlib import Path
+import statistics
+import time
+import tracemalloc
+
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.util.json import json_loads
+import pytest
+
+from custom_components.coinmarketcap.api import parse_quote_prices
+from custom_components.coinmarketcap.const import QUOTES_PATH
+from custom_components.coinmarketcap.portfolio import PortfolioEngine, build_holdings
+
+from ..common import async_setup_entry, async_wait_backfill, entry_data, get_engine, load_fixture
+
+BASELINES = Path(__file__).with_name("baselines.json")
+SIZES = [10, 100, 1000, 5000]
+REFERENCE_SIZE = 100
+# Timing ratios are the median of this many rounds, which keeps single lucky rounds out of the baselines.
+ROUNDS = 5
+
+# metric: (relative tolerance, absolute slack); None means no increase allowed.
+TOLERANCES = {
+    "setup_cost_ratio": (0.5, 0.1),
+    "refresh_cost_ratio": (0.5, 0.1),
+    "memory_per_sensor_kib": (0.25, 0.5),
+    "parse_time_ratio": (0.25, 0.05),
+    "parse_peak_kib": (0.25, 16),
+    "valuation_cost_ratio": (0.5, 0.1),
+    "quote_requests_per_refresh": None,
+    "state_writes_per_refresh": None,
+}
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture(scope="module")
+def baselines(request):
+    """Return the stored baselines and store the measured ones when asked."""
+    stored = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    measured = {}
+    yield stored, measured
+    if request.config.getoption("--update-baselines"):
+        for size, metrics in measured.items():
+            stored.setdefault(size, {}).update(metrics)
+        BASELINES.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+
+
+def check(baselines, size, results):
+    """Record measurements and fail if any regressed against its baseline."""
+    stored, measured = baselines
+    measured.setdefault(str(size), {}).update(results)
+    missing = []
+    for metric, value in results.items():
+        baseline = stored.get(str(size), {}).get(metric)
+        if baseline is None:
+            missing.append(metric)
+            continue
+        tolerance = TOLERANCES[metric]
+        limit = baseline if tolerance is None else baseline * (1 + tolerance[0]) + tolerance[1]
+        assert value <= limit, (
+            f"{metric} with {size} coins regressed: {value:.4g} > {limit:.4g} (baseline {baseline:.4g})"
+        )
+    if missing:
+        pytest.skip(f"No baseline for {', '.join(missing)} with {size} coins, run with --update-baselines")
+
+
+def best_time(function, repeat=9):
+    """Return the best time of ``repeat`` calls, without garbage collections."""
+    seconds = []
+    gc.collect()
+    # Like timeit, keep collections triggered by the rest of the suite out of the timing
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            seconds.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return min(seconds)
+
+
+def measure_memory(parser, raw):
+    """Return the peak memory of a parse and the memory kept by its result."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = parser(raw)
+        kept, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / 1024, kept / 1024
+
+
+def recorded_quotes(size):
+    """Return a quotes response of ``size`` coins built from the recorded one."""
+    payload = json.loads(load_fixture("quotes_latest.json"))
+    coins = list(payload["data"].values())
+    payload["data"] = {}
+    for position in range(size):
+        coin = dict(coins[position % len(coins)], id=position + 1, symbol=f"C{position}")
+        payload["data"][coin["symbol"]] = coin
+    return json.dumps(payload)
+
+
+def coin_symbols(stub, size):
+    """Return the symbols of the ``size`` top coins of the stub."""
+    return [symbol for _, symbol, _, _ in stub.coins[:size]]
+
+
+async def async_timed(awaitable):
+    """Return the result of ``awaitable`` and the time to await it, without garbage collections."""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = await awaitable
+        return result, time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+async def async_setup_and_refresh(hass, stub, size, refreshes=3):
+    """Return the setup and best refresh times of an entry of ``size`` coins.
+
+    The quote calls and state writes are those of its first refresh.
+    """
+    entry, setup_seconds = await async_timed(async_setup_entry(hass, entry_data(coin_symbols(stub, size))))
+    engine = get_engine(hass, entry)
+    await async_wait_backfill(engine)
+
+    async def async_refresh():
+        stub.move(1.01)
+        await engine.async_refresh()
+        await hass.async_block_till_done()
+
+    writes = []
+    unsub = hass.bus.async_listen(EVENT_STATE_CHANGED, writes.append)
+    requests = stub.requests[QUOTES_PATH]
+    refresh_seconds = [(await async_timed(async_refresh()))[1]]
+    unsub()
+    requests = stub.requests[QUOTES_PATH] - requests
+    for _ in range(refreshes - 1):
+        refresh_seconds.append((await async_timed(async_refresh()))[1])
+    await async_wait_backfill(engine)
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+    return setup_seconds, min(refresh_seconds), requests, len(writes)
+
+
+@pytest.mark.parametrize("size", SIZES)
+async def test_setup_and_refresh(hass, make_stub, baselines, size):
+    """Measure setup time, refresh latency, quote calls and state writes.
+
+    The setup and refresh times per coin are compared with the best of two
+    entries of 100 coins set up first, which keeps the machine's speed out
+    of the comparison.
+    """
+    stub = await make_stub(coins=max(size, REFERENCE_SIZE), historical=False)
+    references = [await async_setup_and_refresh(hass, stub, REFERENCE_SIZE) for _ in range(2)]
+    reference_setup = min(reference[0] for reference in references)
+    reference_refresh = min(reference[1] for reference in references)
+    setup_seconds, refresh_seconds, requests, writes = await async_setup_and_refresh(hass, stub, size)
+
+    check(
+        baselines,
+        size,
+        {
+            "setup_cost_ratio": (setup_seconds / size) / (reference_setup / REFERENCE_SIZE),
+            "refresh_cost_ratio": (refresh_seconds / size) / (reference_refresh / REFERENCE_SIZE),
+            "quote_requests_per_refresh": requests,
+            "state_writes_per_refresh": writes,
+        },
+    )
+
+
+@pytest.mark.parametrize("size", SIZES)
+async def test_memory_per_sensor(hass, make_stub, baselines, size):
+    """Measure the memory an entry holds per sensor after its first refresh."""
+    stub = await make_stub(coins=size, historical=False)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        entry = await async_setup_entry(hass, entry_data(coin_symbols(stub, size)))
+        await async_wait_backfill(get_engine(hass, entry))
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    sensors = len(hass.states.async_entity_ids("sensor"))
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+    check(baselines, size, {"memory_per_sensor_kib": allocated / sensors / 1024})
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_parse_quotes(baselines, size):
+    """Compare the reduced quote parser with a full decode of recorded payloads.
+
+    The peak is that of the full decode, because orjson has no streaming
+    mode. The gain is in the memory kept alive and the time off the event
+    loop. The parse time is stored relative to the full decode, as the median
+    of several rounds.
+    """
+    raw = recorded_quotes(size)
+    reduced_peak, reduced_kept = measure_memory(lambda raw: parse_quote_prices(raw, "USD"), raw)
+    full_peak, full_kept = measure_memory(json_loads, raw)
+    ratio = statistics.median(
+        best_time(lambda: parse_quote_prices(raw, "USD"), 5) / best_time(lambda: json_loads(raw), 5)
+        for _ in range(ROUNDS)
+    )
+
+    # The full decode keeps every field of every coin alive until the refresh ends
+    assert reduced_kept < full_kept / 5
+    # Picking the prices adds little to the decode itself
+    assert reduced_peak < full_peak * 1.25
+    assert ratio < 2
+    check(baselines, size, {"parse_time_ratio": ratio, "parse_peak_kib": reduced_peak})
+
+
+def valuation_seconds(size):
+    """Return the time to value a portfolio of ``size`` holdings in two currencies."""
+    symbols = [f"C{position}" for position in range(size)]
+    holdings = build_holdings({symbol: "1.5" for symbol in symbols}, {symbol: "100" for symbol in symbols})
+    portfolio = PortfolioEngine({None: holdings}, "USD")
+    data = {
+        currency: {symbol: 10.0 / (position + 1) * rate for position, symbol in enumerate(symbols)}
+        for currency, rate in (("USD", 1.0), ("EUR", 0.9))
+    }
+    return best_time(lambda: portfolio.update(data, {"USD": 1, "EUR": 0.9}))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_portfolio_valuation(baselines, size):
+    """The valuation costs the same per holding however many there are.
+
+    The cost per holding is compared with that of 100 holdings measured
+    alongside, which keeps the machine's speed out of the comparison.
+    """
+    ratio = statistics.median(
+        (valuation_seconds(size) / size) / (valuation_seconds(100) / 100)
+        for _ in range(ROUNDS)
+    )
+    assert ratio < 2
+    check(baselines, size, {"valuation_cost_ratio": ratio})
@@ -0,0 +1,53 @@
+"""Helpers shared by the tests."""
+
+from pathlib import Path
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.coinmarketcap.const import (
+    CONF_API_KEY,
+    CONF_COIN_AMOUNT,
+    CONF_CRYPTOCURRENCIES,
+    CONF_CURRENCY,
+    CONF_SCAN_INTERVAL,
+    DOMAIN,
+)
+
+FIXTURES = Path(__file__).with_name("fixtures")
+
+
+def entry_data(cryptocurrencies, **options):
+    """Return config entry data for ``cryptocurrencies``, one coin of each."""
+    return {
+        CONF_API_KEY: "test-key",
+        CONF_CRYPTOCURRENCIES: list(cryptocurrencies),
+        CONF_CURRENCY: ["USD"],
+        CONF_SCAN_INTERVAL: 600,
+        CONF_COIN_AMOUNT: {symbol: "1" for symbol in cryptocurrencies},
+        **options,
+    }
+
+
+async def async_setup_entry(hass, data):
+    """Add and set up a config entry, returning it."""
+    entry = MockConfigEntry(domain=DOMAIN, title="CoinMarketCap", data=data)
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    return entry
+
+
+def get_engine(hass, entry):
+    """Return the quote engine serving an entry."""
+    return hass.data[DOMAIN][entry.entry_id].engine
+
+
+async def async_wait_backfill(engine):
+    """Wait until the background price history backfill is done."""
+    if engine._backfill_task is not None:
+        await engine._backfill_task
+
+
+def load_fixture(name):
+    """Return the content of a recorded API response in ``fixtures``."""
+    return (FIXTURES / name).read_text()
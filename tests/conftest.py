@@ -0,0 +1,79 @@
+"""Fixtures for the CoinMarketCap tests."""
+
+from functools import partial
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.coinmarketcap import catalog, config_flow, coordinator, providers
+from custom_components.coinmarketcap.api import CoinMarketCapApiClient
+from custom_components.coinmarketcap.providers import CoinbaseApiClient
+from custom_components.coinmarketcap.streaming import TickerStream
+
+from .stub import CoinMarketCapStub
+
+
+def pytest_addoption(parser):
+    """Add the option to rewrite the benchmark baselines."""
+    parser.addoption(
+        "--update-baselines",
+        action="store_true",
+        help="store the measured benchmarks as the new baselines",
+    )
+
+
+@pytest.fixture
+def recorder_before_hass(request):
+    """Create the recorder database before Home Assistant in tests using the recorder."""
+    if "recorder_mock" in request.fixturenames:
+        request.getfixturevalue("recorder_db_url")
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(recorder_before_hass, enable_custom_integrations):
+    """Load the integration from custom_components."""
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_config_dir(hass, tmp_path):
+    """Keep the files the integration writes, like the OHLCV store, per test."""
+    hass.config.config_dir = str(tmp_path)
+
+
+@pytest.fixture
+async def make_stub(socket_enabled):
+    """Return a factory for started stub servers the integration talks to.
+
+    The clients of the integration are pointed at the last stub started.
+    """
+    stubs = []
+
+    async def factory(**kwargs):
+        stub = CoinMarketCapStub(**kwargs)
+        await stub.start()
+        stubs.append(stub)
+        for module in (catalog, config_flow, coordinator):
+            patcher = patch.object(module, "CoinMarketCapApiClient", partial(CoinMarketCapApiClient, base_url=stub.url))
+            patcher.start()
+            patchers.append(patcher)
+        for patcher in (
+            patch.object(providers, "CoinbaseApiClient", partial(CoinbaseApiClient, base_url=stub.url)),
+            patch.object(coordinator, "TickerStream", partial(TickerStream, url=stub.ws_url)),
+        ):
+            patcher.start()
+            patchers.append(patcher)
+        return stub
+
+    patchers = []
+    yield factory
+    for patcher in reversed(patchers):
+        patcher.stop()
+    for stub in stubs:
+        await stub.stop()
+
+
+@pytest.fixture
+async def cmc_stub(make_stub):
+    """Return a stub server listing 100 coins."""
+    return await make_stub()
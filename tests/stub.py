@@ -0,0 +1,292 @@
+"""Local aiohttp server emulating the CoinMarketCap and Coinbase APIs."""
+
+import asyncio
+import json
+import math
+import random
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from aiohttp import WSMsgType, web
+
+# Cross rates relative to USD served by the price conversion endpoint.
+FX_RATES = {"USD": 1.0, "EUR": 0.9, "GBP": 0.8, "CHF": 0.88, "JPY": 150.0}
+
+KNOWN_COINS = [
+    ("BTC", "Bitcoin", 60000.0),
+    ("ETH", "Ethereum", 3000.0),
+    ("USDT", "Tether", 1.0),
+    ("BNB", "Binance Coin", 500.0),
+    ("SOL", "Solana", 150.0),
+    ("XRP", "XRP", 0.5),
+    ("ADA", "Cardano", 0.45),
+    ("DOGE", "Dogecoin", 0.15),
+]
+
+
+def make_coins(count):
+    """Return ``count`` coins as ``(id, symbol, name, price)``, real ones first."""
+    coins = []
+    for position in range(count):
+        if position < len(KNOWN_COINS):
+            symbol, name, price = KNOWN_COINS[position]
+        else:
+            symbol, name, price = f"C{position}", f"Coin {position}", 10.0 / (position + 1)
+        coins.append((position + 1, symbol, name, price))
+    return coins
+
+
+class CoinMarketCapStub:
+    """Stub server with configurable latency, payload size and error rates.
+
+    ``latency`` delays every response and ``delay`` the responses of one
+    path. ``error_rate`` answers that share of requests with
+    ``error_status`` and ``padding`` adds that many bytes of filler per coin,
+    like the unused fields of the real payloads. Without ``historical`` the
+    OHLCV endpoint rejects the key like on the basic plan. Single failures
+    can be queued per path with ``fail``, and quote requests for a symbol
+    passed to ``reject`` are answered with 400 like malformed symbols until
+    it is passed to ``accept``. ``requests`` counts the requests per path.
+    """
+
+    def __init__(
+        self, coins=100, latency=0.0, error_rate=0.0, error_status=500, padding=0, historical=True, seed=0
+    ):
+        """Initialize."""
+        self.coins = make_coins(coins)
+        self.prices = {symbol: price for _, symbol, _, price in self.coins}
+        self._by_symbol = {coin[1]: (rank, coin) for rank, coin in enumerate(self.coins, 1)}
+        self._by_id = {str(coin[0]): (rank, coin) for rank, coin in enumerate(self.coins, 1)}
+        self.changes = {symbol: 0.0 for _, symbol, _, _ in self.coins}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.padding = padding
+        self.historical = historical
+        self.requests = Counter()
+        self._random = random.Random(seed)
+        self._failures = defaultdict(list)
+        self._rejected = set()
+        self._delays = {}
+        self._sockets = []
+        self._runner = None
+        self.url = None
+
+    @property
+    def ws_url(self):
+        """Return the URL of the ticker websocket."""
+        return self.url.replace("http://", "ws://") + "/ws"
+
+    def fail(self, path, status, count=1, headers=None):
+        """Answer the next ``count`` requests to ``path`` with ``status``."""
+        self._failures[path].extend([(status, headers or {})] * count)
+
+    def delay(self, path, seconds):
+        """Delay the responses to ``path`` by ``seconds`` on top of ``latency``."""
+        self._delays[path] = seconds
+
+    def reject(self, symbol):
+        """Answer every quote request containing ``symbol`` with 400."""
+        self._rejected.add(symbol)
+
+    def accept(self, symbol):
+        """Answer quote requests containing ``symbol`` again."""
+        self._rejected.discard(symbol)
+
+    def move(self, factor):
+        """Multiply every price by ``factor``."""
+        for symbol in self.prices:
+            self.prices[symbol] *= factor
+            self.changes[symbol] = (factor - 1) * 100
+
+    async def start(self):
+        """Start serving on a free local port."""
+        app = web.Application()
+        app.router.add_get("/v1/cryptocurrency/quotes/latest", self._quotes)
+        app.router.add_get("/v1/cryptocurrency/listings/latest", self._listings)
+        app.router.add_get("/v1/cryptocurrency/map", self._map)
+        app.router.add_get("/v1/tools/price-conversion", self._price_conversion)
+        app.router.add_get("/v2/cryptocurrency/ohlcv/historical", self._ohlcv)
+        app.router.add_get("/v2/exchange-rates", self._exchange_rates)
+        app.router.add_get("/ws", self._websocket)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        """Stop the server."""
+        for websocket in list(self._sockets):
+            await websocket.close()
+        await self._runner.cleanup()
+
+    async def push_ticks(self, ticks):
+        """Send ``[(symbol, currency, price), ...]`` to every subscribed websocket."""
+        for websocket in list(self._sockets):
+            for symbol, currency, price in ticks:
+                await websocket.send_json({
+                    "type": "ticker",
+                    "product_id": f"{symbol}-{currency}",
+                    "price": str(price),
+                })
+
+    async def _prologue(self, request):
+        """Count the request, wait and return a failure response if one is due."""
+        self.requests[request.path] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._delays.get(request.path):
+            await asyncio.sleep(self._delays[request.path])
+        if self._failures[request.path]:
+            status, headers = self._failures[request.path].pop(0)
+            return web.json_response({"status": {"error_code": status}}, status=status, headers=headers)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return web.json_response({"status": {"error_code": self.error_status}}, status=self.error_status)
+        return None
+
+    @staticmethod
+    def _status(credits):
+        """Return a response status block."""
+        return {"error_code": 0, "error_message": None, "credit_count": credits}
+
+    def _quote(self, symbol, convert):
+        """Return the quote block of a coin."""
+        rate = FX_RATES.get(convert, 1.0)
+        return {
+            convert: {
+                "price": self.prices[symbol] * rate,
+                "volume_24h": 1e6 * rate,
+                "percent_change_1h": 0.0,
+                "percent_change_24h": self.changes[symbol],
+                "percent_change_7d": 0.0,
+                "market_cap": self.prices[symbol] * 1e7 * rate,
+                "market_cap_dominance": None,
+                "last_updated": "2024-01-01T00:00:00.000Z",
+            }
+        }
+
+    def _coin(self, coin, convert, rank):
+        """Return a full coin record like the quotes and listings endpoints."""
+        coin_id, symbol, name, _ = coin
+        record = {
+            "id": coin_id,
+            "name": name,
+            "symbol": symbol,
+            "slug": name.lower().replace(" ", "-"),
+            "cmc_rank": rank,
+            "quote": self._quote(symbol, convert),
+        }
+        if self.padding:
+            record["tags"] = ["x" * self.padding]
+        return record
+
+    async def _quotes(self, request):
+        if (failure := await self._prologue(request)) is not None:
+            return failure
+        convert = request.query.get("convert", "USD")
+        if "id" in request.query:
+            keys, index = request.query["id"].split(","), self._by_id
+        else:
+            keys, index = request.query.get("symbol", "").split(","), self._by_symbol
+        invalid = [key for key in keys if key in self._rejected]
+        if not invalid and request.query.get("skip_invalid") != "true":
+            invalid = [key for key in keys if key not in index]
+        if invalid:
+            return web.json_response(
+                {"status": {"error_code": 400, "error_message": f"Invalid value: {invalid[0]}"}}, status=400
+            )
+        data = {key: self._coin(index[key][1], convert, index[key][0]) for key in keys if key in index}
+        return web.json_response({"status": self._status(max(1, math.ceil(len(keys) / 100))), "data": data})
+
+    async def _listings(self, request):
+        if (failure := await self._prologue(request)) is not None:
+            return failure
+        convert = request.query.get("convert", "USD")
+        start = int(request.query.get("start", 1))
+        limit = int(request.query.get("limit", 100))
+        coins = self.coins[start - 1:start - 1 + limit]
+        data = [self._coin(coin, convert, start + offset) for offset, coin in enumerate(coins)]
+        return web.json_response({"status": self._status(max(1, math.ceil(len(data) / 200))), "data": data})
+
+    async def _map(self, request):
+        if (failure := await self._prologue(request)) is not None:
+            return failure
+        start = int(request.query.get("start", 1))
+        limit = int(request.query.get("limit", 5000))
+        data = [
+            {"id": coin_id, "symbol": symbol, "name": name, "slug": name.lower().replace(" ", "-"), "rank": rank}
+            for rank, (coin_id, symbol, name, _) in enumerate(self.coins[start - 1:start - 1 + limit], start)
+        ]
+        return web.json_response({"status": self._status(1), "data": data})
+
+    async def _price_conversion(self, request):
+        if (failure := await self._prologue(request)) is not None:
+            return failure
+        symbol = request.query["symbol"]
+        convert = request.query["convert"]
+        amount = float(request.query.get("amount", 1))
+        price = amount * FX_RATES[convert] / FX_RATES[symbol]
+        return web.json_response({
+            "status": self._status(1),
+            "data": {"symbol": symbol, "amount": amount, "quote": {convert: {"price": price}}},
+        })
+
+    async def _ohlcv(self, request):
+        if (failure := await self._prologue(request)) is not None:
+            return failure
+        if not self.historical:
+            return web.json_response({"status": {"error_code": 1006, "error_message": "Plan not authorized"}}, status=403)
+        convert = request.query.get("convert", "USD")
+        rate = FX_RATES.get(convert, 1.0)
+        start = int(request.query["time_start"])
+        end = int(request.query["time_end"])
+        if "id" in request.query:
+            keys, index = request.query["id"].split(","), self._by_id
+        else:
+            keys, index = request.query["symbol"].split(","), self._by_symbol
+        data = {}
+        for key in keys:
+            if key not in index:
+                continue
+            coin_id, symbol, name, _ = index[key][1]
+            price = self.prices[symbol] * rate
+            data[key] = {
+                "id": coin_id,
+                "name": name,
+                "symbol": symbol,
+                "quotes": [
+                    {
+                        "time_open": datetime.fromtimestamp(moment, timezone.utc).isoformat(),
+                        "quote": {convert: {
+                            "open": price, "high": price, "low": price, "close": price, "volume": 1.0,
+                        }},
+                    }
+                    for moment in range(start, end, 3600)
+                ],
+            }
+        return web.json_response({"status": self._status(1), "data": data})
+
+    async def _exchange_rates(self, request):
+        if (failure := await self._prologue(request)) is not None:
+            return failure
+        currency = request.query.get("currency", "USD")
+        rate = FX_RATES.get(currency, 1.0)
+        rates = {symbol: str(1 / (price * rate)) for symbol, price in self.prices.items() if price}
+        return web.json_response({"data": {"currency": currency, "rates": rates}})
+
+    async def _websocket(self, request):
+        self.requests[request.path] += 1
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        async for message in websocket:
+            if message.type != WSMsgType.TEXT:
+                break
+            payload = json.loads(message.data)
+            if payload.get("type") == "subscribe":
+                self._sockets.append(websocket)
+                await websocket.send_json({"type": "subscriptions", "channels": payload["channels"]})
+        if websocket in self._sockets:
+            self._sockets.remove(websocket)
+        return websocket
@@ -0,0 +1,111 @@
+"""Tests for the price alert rules."""
+
+from homeassistant.const import STATE_OFF, STATE_ON
+import pytest
+from pytest_homeassistant_custom_component.common import async_capture_events
+
+from custom_components.coinmarketcap.alerts import (
+    RULE_ABOVE,
+    RULE_CROSS,
+    RULE_MOVE,
+    AlertEngine,
+    Rule,
+    describe,
+    parse_rules,
+)
+from custom_components.coinmarketcap.const import CONF_ALERTS, EVENT_ALERT
+
+from .common import async_setup_entry, entry_data, get_engine
+
+
+def test_parse_rules():
+    """Rules are parsed from every supported form and deduplicated."""
+    rules = parse_rules("btc > 70000; BTC above 70000\nETH crosses 3000;SOL moves 5% 30m;")
+    assert rules == [
+        Rule("btc_above_70000", "BTC", RULE_ABOVE, 70000.0, None),
+        Rule("eth_cross_3000", "ETH", RULE_CROSS, 3000.0, None),
+        Rule("sol_move_5_1800", "SOL", RULE_MOVE, 5.0, 1800.0),
+    ]
+    assert [describe(rule) for rule in rules] == ["BTC above 70000", "ETH cross 3000", "SOL moves 5% in 0.5h"]
+    assert parse_rules("") == []
+    for value in ("BTC", "BTC = 1", "BTC > x", "BTC > 1 1h", "BTC moves 5%", "BTC moves 0% 1h", "BTC moves 5% 0h"):
+        with pytest.raises(ValueError):
+            parse_rules(value)
+
+
+def test_level_rules():
+    """Level rules change state when a tick crosses their level."""
+    engine = AlertEngine(parse_rules("BTC > 70000; BTC < 60000; BTC crosses 65000"))
+    above, below, cross = engine.rules
+    assert engine.initialize("BTC", 62000) == []
+    assert engine.state == {above.key: False, below.key: False, cross.key: False}
+
+    assert engine.evaluate("BTC", 62000, 66000) == [(cross, True)]
+    assert engine.evaluate("BTC", 66000, 69000) == []
+    assert engine.evaluate("BTC", 69000, 71000) == [(above, True)]
+    # Leaving a level changes the state without firing, except for crossings
+    assert engine.evaluate("BTC", 71000, 59000) == [(below, True), (cross, True), (above, False)]
+    assert engine.evaluate("ETH", 1, 2) == []
+    assert engine.initialize("BTC", 80000) == [below, cross, above]
+
+
+def test_move_rules():
+    """Move rules hold while the change over their window is large enough."""
+    engine = AlertEngine(parse_rules("BTC moves 5% 1h"))
+    (move,) = engine.rules
+    changes = {3600: None}
+    assert engine.evaluate("BTC", 1, 2, changes.get) == []
+    changes[3600] = -6.0
+    assert engine.evaluate("BTC", 2, 3, changes.get) == [(move, True)]
+    assert engine.evaluate("BTC", 3, 4, changes.get) == []
+    changes[3600] = 1.0
+    assert engine.evaluate("BTC", 4, 5, changes.get) == [(move, False)]
+
+
+async def test_alert_sensors_and_events(hass, cmc_stub):
+    """Binary sensors follow the rules and triggered rules fire an event."""
+    events = async_capture_events(hass, EVENT_ALERT)
+    entry = await async_setup_entry(hass, entry_data(["BTC"], **{CONF_ALERTS: "BTC > 65000; BTC < 50000"}))
+    engine = get_engine(hass, entry)
+    assert hass.states.get("binary_sensor.alert_btc_above_65000").state == STATE_OFF
+    assert hass.states.get("binary_sensor.alert_btc_below_50000").state == STATE_OFF
+
+    cmc_stub.move(1.1)
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    assert hass.states.get("binary_sensor.alert_btc_above_65000").state == STATE_ON
+    assert [event.data["rule"] for event in events] == ["BTC above 65000"]
+    assert events[0].data["price"] == pytest.approx(66000)
+    assert events[0].data["entry_id"] == entry.entry_id
+
+    cmc_stub.move(0.7)
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    assert hass.states.get("binary_sensor.alert_btc_above_65000").state == STATE_OFF
+    assert hass.states.get("binary_sensor.alert_btc_below_50000").state == STATE_ON
+    assert [event.data["rule"] for event in events] == ["BTC above 65000", "BTC below 50000"]
+
+
+async def test_late_price_sets_rule_states(hass, cmc_stub):
+    """A coin without a price at setup gets its rule states from its first price."""
+    events = async_capture_events(hass, EVENT_ALERT)
+    cmc_stub.reject("SOL")
+    entry = await async_setup_entry(hass, entry_data(["BTC", "SOL"], **{CONF_ALERTS: "SOL > 100"}))
+    engine = get_engine(hass, entry)
+    assert hass.states.get("binary_sensor.alert_sol_above_100").state == STATE_OFF
+
+    cmc_stub.accept("SOL")
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    # The first price is no crossing, so nothing fires
+    assert hass.states.get("binary_sensor.alert_sol_above_100").state == STATE_ON
+    assert events == []
+
+    cmc_stub.move(0.5)
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    cmc_stub.move(2)
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    assert hass.states.get("binary_sensor.alert_sol_above_100").state == STATE_ON
+    assert [event.data["rule"] for event in events] == ["SOL above 100"]
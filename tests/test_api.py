@@ -0,0 +1,243 @@
+"""Tests for the API client against the stub server."""
+
+import asyncio
+
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+import pytest
+
+from custom_components.coinmarketcap.api import (
+    CircuitBreaker,
+    CoinMarketCapApiClient,
+    CoinMarketCapAuthError,
+    CoinMarketCapCircuitOpenError,
+    CoinMarketCapConnectionError,
+    CoinMarketCapRateLimitError,
+    parse_quote_prices,
+)
+from custom_components.coinmarketcap.const import QUOTES_PATH
+
+from .common import async_setup_entry, entry_data, get_engine, load_fixture
+
+
+@pytest.fixture
+def sleeps():
+    """Return the delays slept by clients using ``fake_sleep``."""
+    return []
+
+
+@pytest.fixture
+def make_client(hass, sleeps):
+    """Return a factory for clients of a stub that record instead of sleeping."""
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    def factory(stub, **kwargs):
+        kwargs.setdefault("sleep", fake_sleep)
+        return CoinMarketCapApiClient(async_get_clientsession(hass), "test-key", base_url=stub.url, **kwargs)
+
+    return factory
+
+
+async def test_quotes_response_is_parsed(cmc_stub, make_client):
+    """A 200 response is reduced to the prices of the known coins."""
+    client = make_client(cmc_stub)
+
+    payload = await client.async_get_quotes("EUR", ["BTC", "ETH", "UNKNOWN"])
+    assert payload == {"status": cmc_stub._status(1), "data": {"BTC": 54000.0, "ETH": 2700.0}}
+
+    payload = await client.async_get_quotes("USD", ids=[1, 5])
+    assert payload["data"] == {"1": 60000.0, "5": 150.0}
+
+
+async def test_flaky_api_is_retried(make_stub, make_client, sleeps):
+    """Requests against an API failing at random succeed after retries."""
+    stub = await make_stub(error_rate=0.3)
+    client = make_client(stub, max_retries=10)
+
+    for _ in range(20):
+        payload = await client.async_get_quotes("USD", ["BTC"])
+        assert payload["data"] == {"BTC": 60000.0}
+    assert len(sleeps) == stub.requests[QUOTES_PATH] - 20 > 0
+    assert not client.breaker.is_open
+
+
+def test_parse_recorded_quotes():
+    """Only the prices of a recorded quotes response are kept."""
+    payload = parse_quote_prices(load_fixture("quotes_latest.json"), "USD")
+    assert payload["status"]["credit_count"] == 1
+    assert payload["data"] == {"BTC": 67689.69108413183, "ETH": 3590.4472468958866}
+
+
+async def test_large_responses_are_parsed_in_the_executor(hass, make_stub, make_client):
+    """Bodies above the threshold are decoded off the event loop."""
+    stub = await make_stub(coins=200, padding=1000)
+    jobs = []
+
+    async def executor(target, *args):
+        jobs.append(target)
+        return await hass.async_add_executor_job(target, *args)
+
+    client = make_client(stub, executor=executor)
+    payload = await client.async_get_quotes("USD", ["BTC"])
+    assert payload["data"] == {"BTC": 60000.0}
+    assert jobs == []
+
+    payload = await client.async_get_quotes("USD", [symbol for _, symbol, _, _ in stub.coins])
+    assert len(payload["data"]) == 200
+    assert len(jobs) == 1
+
+
+async def test_retry_after_is_honoured(cmc_stub, make_client, sleeps):
+    """A 429 is retried after the delay the API asks for."""
+    cmc_stub.fail(QUOTES_PATH, 429, headers={"Retry-After": "7"})
+    client = make_client(cmc_stub)
+
+    payload = await client.async_get_quotes("USD", ["BTC"])
+    assert payload["data"] == {"BTC": 60000.0}
+    assert sleeps == [7.0]
+    assert cmc_stub.requests[QUOTES_PATH] == 2
+    assert not client.breaker.is_open
+
+
+async def test_long_retry_after_opens_the_breaker(cmc_stub, make_client, sleeps):
+    """A Retry-After beyond the backoff limit pauses all requests instead."""
+    now = [0.0]
+    cmc_stub.fail(QUOTES_PATH, 429, headers={"Retry-After": "600"})
+    client = make_client(cmc_stub, breaker=CircuitBreaker(clock=lambda: now[0]))
+
+    with pytest.raises(CoinMarketCapRateLimitError):
+        await client.async_get_quotes("USD", ["BTC"])
+    assert sleeps == []
+    with pytest.raises(CoinMarketCapCircuitOpenError):
+        await client.async_get_quotes("USD", ["BTC"])
+    assert cmc_stub.requests[QUOTES_PATH] == 1
+
+    now[0] = 600
+    assert (await client.async_get_quotes("USD", ["BTC"]))["data"] == {"BTC": 60000.0}
+
+
+async def test_server_errors_are_retried(cmc_stub, make_client, sleeps):
+    """5xx responses are retried with a growing, jittered backoff."""
+    cmc_stub.fail(QUOTES_PATH, 503, count=3)
+    client = make_client(cmc_stub)
+
+    payload = await client.async_get_quotes("USD", ["ETH"])
+    assert payload["data"] == {"ETH": 3000.0}
+    assert cmc_stub.requests[QUOTES_PATH] == 4
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= 2 ** attempt for attempt, delay in enumerate(sleeps))
+
+
+async def test_breaker_opens_after_repeated_failures(cmc_stub, make_client):
+    """Requests stop once enough calls failed in a row."""
+    cmc_stub.fail(QUOTES_PATH, 500, count=6)
+    client = make_client(cmc_stub, max_retries=1, breaker=CircuitBreaker(failure_threshold=3))
+
+    for _ in range(3):
+        with pytest.raises(CoinMarketCapConnectionError):
+            await client.async_get_quotes("USD", ["BTC"])
+    assert client.breaker.is_open
+    with pytest.raises(CoinMarketCapCircuitOpenError):
+        await client.async_get_quotes("USD", ["BTC"])
+    assert cmc_stub.requests[QUOTES_PATH] == 6
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    """After the reset timeout one request decides whether the breaker closes."""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60, clock=lambda: now[0])
+    breaker.record_failure()
+    with pytest.raises(CoinMarketCapCircuitOpenError):
+        breaker.allow()
+
+    now[0] = 60
+    assert breaker.half_open and not breaker.is_open
+    assert breaker.allow() is True
+    assert breaker.is_open
+    with pytest.raises(CoinMarketCapCircuitOpenError):
+        breaker.allow()
+
+    # A failed trial reopens the breaker for another reset timeout
+    breaker.record_failure()
+    assert not breaker.half_open
+    now[0] = 120
+    assert breaker.allow() is True
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow() is False
+    assert breaker.allow() is False
+
+
+async def test_half_open_breaker_fails_fast_during_the_trial(cmc_stub, make_client):
+    """Requests made while the trial runs fail without reaching the API."""
+    now = [0.0]
+    client = make_client(cmc_stub, breaker=CircuitBreaker(reset_timeout=60, clock=lambda: now[0]))
+    client.breaker.record_failure(open_for=60)
+    now[0] = 60
+    cmc_stub.delay(QUOTES_PATH, 0.1)
+
+    trial, other = await asyncio.gather(
+        client.async_get_quotes("USD", ["BTC"]),
+        client.async_get_quotes("USD", ["ETH"]),
+        return_exceptions=True,
+    )
+    assert trial["data"] == {"BTC": 60000.0}
+    assert isinstance(other, CoinMarketCapCircuitOpenError)
+    assert cmc_stub.requests[QUOTES_PATH] == 1
+    assert not client.breaker.is_open
+
+
+async def test_cancelled_trial_frees_the_breaker(cmc_stub, make_client):
+    """A cancelled trial lets the next request try instead."""
+    now = [0.0]
+    client = make_client(cmc_stub, breaker=CircuitBreaker(reset_timeout=60, clock=lambda: now[0]))
+    client.breaker.record_failure(open_for=60)
+    now[0] = 60
+    cmc_stub.delay(QUOTES_PATH, 0.2)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(client.async_get_quotes("USD", ["BTC"]), 0.05)
+    assert client.breaker.half_open and not client.breaker.is_open
+
+    assert (await client.async_get_quotes("USD", ["BTC"]))["data"] == {"BTC": 60000.0}
+    assert not client.breaker.half_open
+
+
+async def test_slow_responses_time_out(make_stub, make_client, sleeps):
+    """A response slower than the timeout counts as a failed attempt."""
+    stub = await make_stub(latency=0.2)
+    client = make_client(stub, timeout=0.05, max_retries=1)
+
+    with pytest.raises(CoinMarketCapConnectionError):
+        await client.async_get_quotes("USD", ["BTC"])
+    assert stub.requests[QUOTES_PATH] == 2
+    assert len(sleeps) == 1
+
+
+async def test_auth_errors_are_not_retried(cmc_stub, make_client, sleeps):
+    """A rejected key fails at once and leaves the breaker closed."""
+    cmc_stub.fail(QUOTES_PATH, 401)
+    client = make_client(cmc_stub)
+
+    with pytest.raises(CoinMarketCapAuthError):
+        await client.async_get_quotes("USD", ["BTC"])
+    assert cmc_stub.requests[QUOTES_PATH] == 1
+    assert sleeps == []
+    assert not client.breaker.is_open
+
+
+async def test_stale_data_served_while_the_breaker_is_open(hass, cmc_stub):
+    """Sensors keep the last good prices, flagged stale, while requests are paused."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"]))
+    engine = get_engine(hass, entry)
+    cmc_stub.fail(QUOTES_PATH, 429, headers={"Retry-After": "600"})
+
+    for _ in range(2):
+        await engine.async_refresh()
+        await hass.async_block_till_done()
+        state = hass.states.get("sensor.btc_value")
+        assert float(state.state) == 60000.0
+        assert state.attributes["stale"] is True
+    # The second refresh was blocked by the breaker
+    assert cmc_stub.requests[QUOTES_PATH] == 2
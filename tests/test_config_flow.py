@@ -0,0 +1,113 @@
+"""Tests for the config flow and the symbol catalog."""
+
+from homeassistant import config_entries
+from homeassistant.data_entry_flow import FlowResultType
+
+from custom_components.coinmarketcap.catalog import CoinMarketCapCatalog, async_get_catalog
+from custom_components.coinmarketcap.const import (
+    CONF_API_KEY,
+    CONF_CRYPTOCURRENCIES,
+    CONF_CRYPTOCURRENCY_IDS,
+    CONF_CURRENCY,
+    CONF_PORTFOLIOS,
+    CONF_SCAN_INTERVAL,
+    DATA_CATALOG,
+    DOMAIN,
+    MAP_PATH,
+    QUOTES_PATH,
+)
+
+
+def _default(result, field):
+    """Return the default of a form field."""
+    return next(key for key in result["data_schema"].schema if key == field).default()
+
+
+def test_catalog_lookups(hass):
+    """Symbols resolve to the best ranked coin; names and slugs are searchable."""
+    catalog = CoinMarketCapCatalog(hass)
+    catalog.coins = [
+        (2, "UNI", "Universe", "universe", 900),
+        (1, "UNI", "Uniswap", "uniswap", 20),
+        (3, "BTC", "Bitcoin", "bitcoin", 1),
+    ]
+    catalog._build_index()
+
+    assert catalog.resolve("uni")[0] == 1
+    assert catalog.resolve("Universe")[0] == 2
+    assert catalog.resolve("bitcoin")[1] == "BTC"
+    assert catalog.resolve("nothing") is None
+    assert [coin[0] for coin in catalog.search("uni")] == [1, 2]
+    assert [coin[1] for coin in catalog.search("bitcon")] == ["BTC"]
+    assert catalog.get(2)[2] == "Universe"
+
+
+async def test_flow_renders_from_the_cached_catalog(hass, cmc_stub):
+    """The map is downloaded once; custom coins are resolved offline."""
+    result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": config_entries.SOURCE_USER})
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], {CONF_API_KEY: "test-key"})
+    assert result["step_id"] == "select_cryptocurrencies"
+    assert not result["errors"]
+
+    for query, expected in (("solana", "SOL"), ("dogecoin", "DOGE")):
+        result = await hass.config_entries.flow.async_configure(
+            result["flow_id"], {CONF_CRYPTOCURRENCIES: ["BTC"], "add_custom": True}
+        )
+        assert result["step_id"] == "add_cryptocurrency"
+        result = await hass.config_entries.flow.async_configure(result["flow_id"], {"symbol": query})
+        assert result["type"] == FlowResultType.FORM
+        assert result["step_id"] == "select_cryptocurrencies"
+        assert expected in _default(result, CONF_CRYPTOCURRENCIES)
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {CONF_CRYPTOCURRENCIES: ["BTC"], "add_custom": True}
+    )
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], {"symbol": "bitcon"})
+    assert result["errors"] == {"base": "invalid_cryptocurrency"}
+    assert "BTC (Bitcoin)" in result["description_placeholders"]["suggestions"]
+
+    assert cmc_stub.requests[MAP_PATH] == 1
+    assert cmc_stub.requests[QUOTES_PATH] == 0
+
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], {"symbol": "SOL"})
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {CONF_CRYPTOCURRENCIES: ["BTC", "SOL"]}
+    )
+    assert result["step_id"] == "coin_amounts"
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {CONF_CURRENCY: "USD", CONF_SCAN_INTERVAL: 600, "amount_BTC": 1, "amount_SOL": 2}
+    )
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"][CONF_CRYPTOCURRENCY_IDS] == {"BTC": 1, "SOL": 5}
+    await hass.async_block_till_done()
+
+
+async def test_catalog_is_persisted(hass, cmc_stub):
+    """A restarted instance loads the catalog from disk without a request."""
+    catalog = await async_get_catalog(hass, "test-key")
+    assert catalog.resolve("ETH")[0] == 2
+    await hass.async_block_till_done()
+
+    hass.data[DOMAIN].pop(DATA_CATALOG)
+    catalog = await async_get_catalog(hass, "test-key")
+    assert catalog.resolve("ETH")[0] == 2
+    assert cmc_stub.requests[MAP_PATH] == 1
+
+
+async def test_portfolios_only_hold_selected_coins(hass, cmc_stub):
+    """A named portfolio with a coin the entry does not track is rejected."""
+    result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": config_entries.SOURCE_USER})
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], {CONF_API_KEY: "test-key"})
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], {CONF_CRYPTOCURRENCIES: ["BTC"]})
+    assert result["step_id"] == "coin_amounts"
+
+    user_input = {CONF_CURRENCY: "USD", CONF_SCAN_INTERVAL: 600, "amount_BTC": 1, CONF_PORTFOLIOS: "Long: BTC, DOGE"}
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], user_input)
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"] == {"base": "untracked_portfolio_coin"}
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {**user_input, CONF_PORTFOLIOS: "Long: BTC=0.5"}
+    )
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    await hass.async_block_till_done()
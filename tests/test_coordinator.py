@@ -0,0 +1,191 @@
+"""Tests for the quote engine and its scheduler."""
+
+from datetime import datetime, timedelta, timezone
+import math
+import time
+
+from homeassistant.const import STATE_UNAVAILABLE
+import pytest
+
+from custom_components.coinmarketcap.const import (
+    CONF_CURRENCY,
+    CONF_DAILY_CREDIT_BUDGET,
+    MAX_RELAX_FACTOR,
+    MAX_SCAN_INTERVAL,
+    MIN_SCAN_INTERVAL,
+    PRICE_CONVERSION_PATH,
+    QUOTES_PATH,
+)
+from custom_components.coinmarketcap.coordinator import CreditBudgetScheduler, batch_credit_cost
+
+from .common import async_setup_entry, async_wait_backfill, entry_data, get_engine
+
+
+class FakeClock:
+    """Clock returning a settable UTC timestamp."""
+
+    def __init__(self, moment):
+        """Initialize."""
+        self.now = moment.timestamp()
+
+    def __call__(self):
+        """Return the current timestamp."""
+        return self.now
+
+    def advance(self, seconds):
+        """Move the clock forward."""
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    """Return a clock starting at midnight on the first of a month."""
+    return FakeClock(datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+
+def test_batch_credit_cost():
+    """Credits scale with every 100 symbols and every extra convert."""
+    assert batch_credit_cost(1, 1) == 1
+    assert batch_credit_cost(100, 1) == 1
+    assert batch_credit_cost(101, 1) == 2
+    assert batch_credit_cost(250, 3) == 5
+
+
+def test_interval_spreads_the_daily_budget(clock):
+    """The credits left are spread evenly over the rest of the day."""
+    scheduler = CreditBudgetScheduler(daily_budget=144, clock=clock)
+    assert scheduler.next_interval(1) == timedelta(minutes=10)
+    assert scheduler.next_interval(2) == timedelta(minutes=20)
+
+    clock.advance(12 * 3600)
+    scheduler.record_usage(72)
+    assert scheduler.available() == 72
+    assert scheduler.next_interval(1) == timedelta(minutes=10)
+
+    # Overspending in the morning stretches the afternoon
+    scheduler.record_usage(36)
+    assert scheduler.next_interval(1) == timedelta(minutes=20)
+
+
+def test_interval_limits(clock):
+    """Intervals stay between the minimum and maximum scan interval."""
+    scheduler = CreditBudgetScheduler(daily_budget=100000, clock=clock)
+    assert scheduler.next_interval(1) == MIN_SCAN_INTERVAL
+
+    scheduler = CreditBudgetScheduler(daily_budget=1, clock=clock)
+    assert scheduler.next_interval(1) == MAX_SCAN_INTERVAL
+
+
+def test_exhausted_budget_waits_for_the_next_day(clock):
+    """Without credits left the next refresh is when the day rolls over."""
+    scheduler = CreditBudgetScheduler(daily_budget=100, monthly_budget=3000, clock=clock)
+    clock.advance(23 * 3600)
+    scheduler.record_usage(100)
+    assert scheduler.available() == 0
+    assert scheduler.next_interval(1) == timedelta(hours=1)
+
+    clock.advance(3600)
+    assert scheduler.available() == 100
+    assert scheduler.used_this_month == 100
+
+
+def test_tightest_budget_wins(clock):
+    """The monthly budget applies when it leaves fewer credits per cycle."""
+    scheduler = CreditBudgetScheduler(daily_budget=1440, monthly_budget=31 * 144, clock=clock)
+    assert scheduler.next_interval(1) == timedelta(minutes=10)
+
+    # February is shorter, the same budget allows shorter intervals
+    scheduler.record_usage(100)
+    clock.advance(31 * 86400)
+    assert scheduler.next_interval(1) == timedelta(days=29) / (31 * 144)
+    assert scheduler.used_this_month == 0
+
+
+def test_volatility_adjusts_the_interval(clock):
+    """Flat markets stretch the interval, volatile markets use the budget."""
+    scheduler = CreditBudgetScheduler(daily_budget=1440, clock=clock)
+    scheduler.observe({"BTC": 60000.0})
+    clock.advance(60)
+    scheduler.observe({"BTC": 60000.0})
+    assert scheduler.volatility == 0
+    assert scheduler.next_interval(1) == timedelta(seconds=60) * MAX_RELAX_FACTOR
+
+    for _ in range(10):
+        clock.advance(60)
+        scheduler.observe({"BTC": scheduler._last_prices["BTC"] * 1.01})
+    assert scheduler.next_interval(1) == timedelta(seconds=60)
+
+
+def test_scheduler_without_budget(clock):
+    """Without a budget the scheduler is disabled."""
+    scheduler = CreditBudgetScheduler(clock=clock)
+    assert not scheduler.enabled
+    assert scheduler.available() is None
+
+
+async def test_engine_counts_reported_credits(hass, make_stub):
+    """The engine records the credit count of each response status block."""
+    stub = await make_stub(coins=250, historical=False)
+    entry = await async_setup_entry(
+        hass,
+        entry_data([symbol for _, symbol, _, _ in stub.coins], **{CONF_DAILY_CREDIT_BUDGET: 1000}),
+    )
+    engine = get_engine(hass, entry)
+    await async_wait_backfill(engine)
+    used = engine.scheduler.used_today
+
+    await engine.async_refresh()
+    # 250 symbols are fetched in three batches of one credit each
+    assert engine.scheduler.used_today - used == 3
+    assert engine.update_interval.total_seconds() == pytest.approx(
+        engine.scheduler.next_interval(3).total_seconds(), abs=1
+    )
+
+
+async def test_currencies_share_one_quote_call(hass, cmc_stub):
+    """Extra currencies are derived from cached FX rates, not extra quote calls."""
+    entry = await async_setup_entry(hass, entry_data(["BTC", "ETH"], **{CONF_CURRENCY: ["USD", "EUR", "GBP"]}))
+    engine = get_engine(hass, entry)
+    await async_wait_backfill(engine)
+    assert cmc_stub.requests[QUOTES_PATH] == 1
+    assert cmc_stub.requests[PRICE_CONVERSION_PATH] == 2
+
+    for currency, price in (("usd", 60000.0), ("eur", 54000.0), ("gbp", 48000.0)):
+        assert float(hass.states.get(f"sensor.btc_value_{currency}").state) == pytest.approx(price)
+    assert float(hass.states.get("sensor.total_portfolio_value_eur").state) == pytest.approx(56700.0)
+
+    await engine.async_refresh()
+    assert cmc_stub.requests[QUOTES_PATH] == 2
+    assert cmc_stub.requests[PRICE_CONVERSION_PATH] == 2
+
+
+async def test_large_portfolio_is_chunked(hass, make_stub):
+    """1,000 coins are fetched in batches of 100, several at a time."""
+    stub = await make_stub(coins=1000, latency=0.1, historical=False)
+    entry = await async_setup_entry(hass, entry_data([symbol for _, symbol, _, _ in stub.coins]))
+    engine = get_engine(hass, entry)
+    await async_wait_backfill(engine)
+    assert [len(symbols) for symbols, _ in engine._build_batches()] == [100] * 10
+
+    requests = stub.requests[QUOTES_PATH]
+    start = time.perf_counter()
+    data = await engine._async_update_data()
+    elapsed = time.perf_counter() - start
+    assert len(data["USD"]) == 1000
+    assert stub.requests[QUOTES_PATH] - requests == 10
+    # One batch after the other would take a second
+    assert elapsed < 0.6
+
+
+async def test_rejected_symbol_is_isolated(hass, make_stub):
+    """A symbol the API rejects only takes its own sensor down."""
+    stub = await make_stub(coins=1000, historical=False)
+    stub.reject("C500")
+    entry = await async_setup_entry(hass, entry_data([symbol for _, symbol, _, _ in stub.coins]))
+    engine = get_engine(hass, entry)
+
+    assert hass.states.get("sensor.c500_value").state == STATE_UNAVAILABLE
+    assert hass.states.get("sensor.c501_value").attributes["price"] == pytest.approx(stub.prices["C501"])
+    assert len(engine.data["USD"]) == 999
+    # Ten batches plus two halves per bisection step of the rejected batch
+    assert stub.requests[QUOTES_PATH] <= 10 + 2 * math.ceil(math.log2(100))
@@ -0,0 +1,93 @@
+"""Tests for the config entry diagnostics."""
+
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.coinmarketcap.const import CONF_API_KEY, CONF_PROVIDER, DOMAIN, PROVIDER_FAILOVER, QUOTES_PATH
+from custom_components.coinmarketcap.diagnostics import async_get_config_entry_diagnostics
+
+from .common import async_setup_entry, entry_data, get_engine
+
+
+async def test_diagnostics(hass, cmc_stub):
+    """The API key is redacted and the provider of the last quotes is reported."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"]))
+    diagnostics = await async_get_config_entry_diagnostics(hass, entry)
+
+    assert diagnostics["entry"][CONF_API_KEY] == "**REDACTED**"
+    assert diagnostics["engine"]["provider"] == "coinmarketcap"
+    assert diagnostics["engine"]["last_provider"] == "coinmarketcap"
+    assert diagnostics["engine"]["provider_latency"] is None
+    assert diagnostics["engine"]["circuit_breakers"] == {
+        "coinmarketcap": {"open": False, "half_open": False, "failures": 0}
+    }
+
+
+async def test_diagnostics_with_failover(hass, cmc_stub):
+    """A selector reports the provider that answered last, or its own name before."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"], **{CONF_PROVIDER: PROVIDER_FAILOVER}))
+    engine = get_engine(hass, entry)
+    diagnostics = await async_get_config_entry_diagnostics(hass, entry)
+    assert diagnostics["engine"]["last_provider"] == "coinmarketcap"
+
+    engine.quotes.last_provider = None
+    diagnostics = await async_get_config_entry_diagnostics(hass, entry)
+    assert diagnostics["engine"]["last_provider"] == "failover"
+
+    engine.quotes.providers[0].breaker.record_failure(600)
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    diagnostics = await async_get_config_entry_diagnostics(hass, entry)
+    assert diagnostics["engine"]["provider"] == "failover"
+    assert diagnostics["engine"]["last_provider"] == "coinbase"
+    assert set(diagnostics["engine"]["provider_latency"]) == {"coinmarketcap", "coinbase"}
+    assert diagnostics["engine"]["provider_latency"]["coinbase"] is not None
+    breakers = diagnostics["engine"]["circuit_breakers"]
+    assert breakers["coinmarketcap"] == {"open": True, "half_open": False, "failures": 1}
+    assert breakers["coinbase"] == {"open": False, "half_open": False, "failures": 0}
+
+
+async def test_metrics(hass, cmc_stub):
+    """Requests, errors and refresh timings are counted per engine."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"]))
+    engine = get_engine(hass, entry)
+    cmc_stub.fail(QUOTES_PATH, 500)
+
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    metrics = (await async_get_config_entry_diagnostics(hass, entry))["engine"]["metrics"]
+    assert metrics["requests"] == sum(cmc_stub.requests.values())
+    assert metrics["retries"] == 1
+    assert metrics["errors"] == {"CoinMarketCapConnectionError": 1}
+    # Two quotes requests and the backfill, the failed request is free
+    assert metrics["credits"] == 3
+    assert metrics["timings"]["refresh"]["count"] == 2
+    assert metrics["timings"]["http"]["count"] == metrics["requests"] - 1
+
+
+async def test_metric_sensors_are_disabled(hass, cmc_stub):
+    """The metric sensors are registered per entry but disabled by default."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"]))
+    registry = er.async_get(hass)
+
+    entity_id = registry.async_get_entity_id("sensor", DOMAIN, f"{DOMAIN}_{entry.entry_id}_refresh_duration")
+    assert registry.async_get(entity_id).disabled_by is er.RegistryEntryDisabler.INTEGRATION
+    assert hass.states.get(entity_id) is None
+
+
+async def test_refresh_duration_sensor_shows_the_latest_refresh(hass, cmc_stub):
+    """The refresh is timed before the fan-out, so the sensor is not one refresh behind."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"]))
+    registry = er.async_get(hass)
+    entity_id = registry.async_get_entity_id("sensor", DOMAIN, f"{DOMAIN}_{entry.entry_id}_refresh_duration")
+    registry.async_update_entity(entity_id, disabled_by=None)
+    await hass.config_entries.async_reload(entry.entry_id)
+    await hass.async_block_till_done()
+    engine = get_engine(hass, entry)
+
+    for delay in (0.05, 0.15):
+        cmc_stub.delay(QUOTES_PATH, delay)
+        await engine.async_refresh()
+        await hass.async_block_till_done()
+        timing = engine.metrics.timings["refresh"]
+        assert timing.last >= delay * 1000
+        assert float(hass.states.get(entity_id).state) == round(timing.last, 2)
@@ -0,0 +1,94 @@
+"""Tests for the in-memory price history."""
+
+import random
+import statistics
+
+import pytest
+
+from custom_components.coinmarketcap.history import PriceHistory, PriceSeries
+
+
+def window_prices(samples, now, seconds):
+    """Return the prices of the samples inside a window ending at ``now``."""
+    return [price for timestamp, price in samples if timestamp >= now - seconds]
+
+
+def test_window_stats():
+    """The indicators match a direct computation over the window samples."""
+    series = PriceSeries(1000, {"1h": 3600})
+    generator = random.Random(1)
+    samples = []
+    for tick in range(200):
+        sample = (tick * 60.0, 100 + generator.uniform(-5, 5))
+        samples.append(sample)
+        series.append(*sample)
+
+    now = samples[-1][0]
+    prices = window_prices(samples, now, 3600)
+    stats = series.stats()["1h"]
+    assert len(prices) == 61
+    assert stats["sma"] == pytest.approx(statistics.fmean(prices))
+    assert stats["stddev"] == pytest.approx(statistics.pstdev(prices))
+    assert stats["min"] == min(prices)
+    assert stats["max"] == max(prices)
+    assert stats["change_percent"] == pytest.approx((prices[-1] / prices[0] - 1) * 100)
+    assert min(prices) <= stats["ema"] <= max(prices)
+
+
+def test_stddev_stays_accurate_at_large_prices():
+    """Long uptimes at BTC scale prices do not degrade the standard deviation."""
+    series = PriceSeries(2000, {"1h": 3600})
+    generator = random.Random(2)
+    samples = []
+    for tick in range(200_000):
+        sample = (tick * 10.0, 60000 + generator.uniform(-5, 5))
+        samples.append(sample)
+        series.append(*sample)
+
+    prices = window_prices(samples[-400:], samples[-1][0], 3600)
+    stats = series.stats()["1h"]
+    assert stats["sma"] == pytest.approx(statistics.fmean(prices), rel=1e-12)
+    assert stats["stddev"] == pytest.approx(statistics.pstdev(prices), rel=1e-6)
+
+
+def test_ring_buffer_keeps_the_latest_samples():
+    """A full buffer overwrites the oldest samples and evicts them from windows."""
+    series = PriceSeries(10, {"all": 10**9})
+    for tick in range(25):
+        series.append(float(tick), float(tick))
+
+    assert series.samples() == [(float(tick), float(tick)) for tick in range(15, 25)]
+    stats = series.stats()["all"]
+    assert stats["min"] == 15.0
+    assert stats["sma"] == pytest.approx(19.5)
+
+    # Out of order samples are ignored
+    series.append(3.0, 1000.0)
+    assert series.latest == 24.0
+
+
+def test_change_since():
+    """The change is measured from the first sample inside the period."""
+    series = PriceSeries(100, {})
+    for tick, price in enumerate([100.0, 110.0, 120.0, 150.0]):
+        series.append(tick * 600.0, price)
+
+    assert series.change_since(600) == pytest.approx(25.0)
+    assert series.change_since(3600) == pytest.approx(50.0)
+
+
+def test_history_windows_and_seed():
+    """New windows replay the retained samples; older samples can be seeded."""
+    history = PriceHistory(100, {"1h": 3600})
+    for tick in range(10):
+        history.add(3600.0 + tick * 600, {"BTC": 100.0 + tick})
+
+    history.set_windows({"30m": 1800})
+    assert history.stats("BTC")["30m"]["min"] == 106.0
+
+    history.seed("BTC", [(0.0, 50.0), (1800.0, 75.0), (7200.0, 1.0)])
+    assert history.series["BTC"].samples()[:3] == [(0.0, 50.0), (1800.0, 75.0), (3600.0, 100.0)]
+    assert history.stats("ETH") is None
+
+    history.discard({"BTC"})
+    assert history.stats("BTC") is None
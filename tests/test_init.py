@@ -0,0 +1,217 @@
+"""Tests for setting up and unloading entries."""
+
+from datetime import timedelta
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.helpers import entity_registry as er
+from homeassistant.util import dt as dt_util
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry, async_fire_time_changed
+
+from custom_components.coinmarketcap.const import (
+    CONF_COIN_AMOUNT,
+    CONF_CRYPTOCURRENCIES,
+    CONF_CURRENCY,
+    DOMAIN,
+    QUOTES_PATH,
+    STORAGE_VERSION,
+)
+
+from .common import async_setup_entry, entry_data, get_engine
+
+
+async def test_setup_and_unload(hass, cmc_stub):
+    """An entry creates a value sensor per coin and unloads cleanly."""
+    entry = await async_setup_entry(hass, entry_data(["BTC", "ETH"]))
+
+    assert entry.state is ConfigEntryState.LOADED
+    assert float(hass.states.get("sensor.btc_value").state) == 60000.0
+    assert float(hass.states.get("sensor.eth_value").state) == 3000.0
+    assert float(hass.states.get("sensor.total_portfolio_value").state) == 63000.0
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+    assert entry.state is ConfigEntryState.NOT_LOADED
+    assert DOMAIN not in hass.data or not hass.data[DOMAIN].get("engines")
+
+
+async def test_entries_share_one_request(hass, cmc_stub):
+    """Entries tracking the same coins get their own sensors from one quote call."""
+    first = await async_setup_entry(hass, entry_data(["BTC", "ETH"]))
+    second = await async_setup_entry(hass, entry_data(["BTC", "SOL"]))
+    engine = get_engine(hass, first)
+    assert get_engine(hass, second) is engine
+
+    registry = er.async_get(hass)
+    unique_ids = {
+        entry.entry_id: {
+            entity.unique_id for entity in er.async_entries_for_config_entry(registry, entry.entry_id)
+        }
+        for entry in (first, second)
+    }
+    assert f"{DOMAIN}_{first.entry_id}_BTC_value_USD" in unique_ids[first.entry_id]
+    assert f"{DOMAIN}_{second.entry_id}_BTC_value_USD" in unique_ids[second.entry_id]
+    assert f"{DOMAIN}_{second.entry_id}_total_portfolio_value_USD" in unique_ids[second.entry_id]
+    assert f"{DOMAIN}_{second.entry_id}_suppressed_writes" in unique_ids[second.entry_id]
+    assert float(hass.states.get("sensor.btc_value_2").state) == 60000.0
+
+    requests = cmc_stub.requests[QUOTES_PATH]
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    assert cmc_stub.requests[QUOTES_PATH] - requests == 1
+
+
+async def test_unique_id_migration(hass, cmc_stub):
+    """Sensors registered with the old unique IDs keep their entity IDs."""
+    entry = MockConfigEntry(domain=DOMAIN, title="CoinMarketCap", data=entry_data(["BTC"]))
+    entry.add_to_hass(hass)
+    registry = er.async_get(hass)
+    for unique_id, object_id in (
+        (f"{DOMAIN}_BTC_value_USD", "btc_value"),
+        (f"{DOMAIN}_total_portfolio_value_USD", "total_portfolio_value"),
+    ):
+        registry.async_get_or_create(
+            "sensor", DOMAIN, unique_id, config_entry=entry, suggested_object_id=object_id
+        )
+
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert registry.async_get("sensor.btc_value").unique_id == f"{DOMAIN}_{entry.entry_id}_BTC_value_USD"
+    assert (
+        registry.async_get("sensor.total_portfolio_value").unique_id
+        == f"{DOMAIN}_{entry.entry_id}_total_portfolio_value_USD"
+    )
+    assert hass.states.get("sensor.btc_value_2") is None
+    assert float(hass.states.get("sensor.btc_value").state) == 60000.0
+
+
+def _snapshot_storage(entry_id, age, price):
+    """Return stored snapshot data for an entry holding BTC at ``price``."""
+    return {
+        "version": STORAGE_VERSION,
+        "minor_version": 1,
+        "key": f"{DOMAIN}.{entry_id}",
+        "data": {
+            "timestamp": (dt_util.utcnow() - age).isoformat(),
+            "currencies": ["USD"],
+            "quotes": {"USD": {"BTC": price}},
+        },
+    }
+
+
+async def test_startup_from_fresh_snapshot(hass, hass_storage, cmc_stub):
+    """A recent snapshot sets the entry up without calling the API."""
+    entry = MockConfigEntry(domain=DOMAIN, title="CoinMarketCap", data=entry_data(["BTC"]))
+    hass_storage[f"{DOMAIN}.{entry.entry_id}"] = _snapshot_storage(entry.entry_id, timedelta(minutes=1), 55000.0)
+    entry.add_to_hass(hass)
+
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    assert float(hass.states.get("sensor.btc_value").state) == 55000.0
+    assert cmc_stub.requests[QUOTES_PATH] == 0
+
+
+async def test_fresh_snapshot_times_the_first_refresh(hass, hass_storage, cmc_stub, freezer):
+    """The first refresh follows the snapshot's age, not the startup time."""
+    entry = MockConfigEntry(domain=DOMAIN, title="CoinMarketCap", data=entry_data(["BTC"]))
+    hass_storage[f"{DOMAIN}.{entry.entry_id}"] = _snapshot_storage(entry.entry_id, timedelta(minutes=9), 55000.0)
+    entry.add_to_hass(hass)
+
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    freezer.tick(timedelta(seconds=50))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert cmc_stub.requests[QUOTES_PATH] == 0
+
+    # The snapshot is one update interval old 60 seconds after startup
+    freezer.tick(timedelta(seconds=15))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert cmc_stub.requests[QUOTES_PATH] == 1
+    assert float(hass.states.get("sensor.btc_value").state) == 60000.0
+
+
+async def test_startup_from_old_snapshot(hass, hass_storage, cmc_stub):
+    """An old snapshot is served at once and refreshed in the background."""
+    entry = MockConfigEntry(domain=DOMAIN, title="CoinMarketCap", data=entry_data(["BTC"]))
+    hass_storage[f"{DOMAIN}.{entry.entry_id}"] = _snapshot_storage(entry.entry_id, timedelta(hours=1), 55000.0)
+    entry.add_to_hass(hass)
+    cmc_stub.latency = 0.1
+
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    assert float(hass.states.get("sensor.btc_value").state) == 55000.0
+
+    await hass.async_block_till_done()
+    assert float(hass.states.get("sensor.btc_value").state) == 60000.0
+    assert cmc_stub.requests[QUOTES_PATH] == 1
+
+
+async def test_options_update_in_place(hass, cmc_stub):
+    """Amount changes need no API call, added coins only one, neither a reload."""
+    entry = await async_setup_entry(hass, entry_data(["BTC", "ETH"]))
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    requests = cmc_stub.requests[QUOTES_PATH]
+
+    hass.config_entries.async_update_entry(
+        entry, data={**entry.data, CONF_COIN_AMOUNT: {"BTC": "2", "ETH": "1"}}
+    )
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN][entry.entry_id] is coordinator
+    assert float(hass.states.get("sensor.btc_value").state) == 120000.0
+    assert float(hass.states.get("sensor.total_portfolio_value").state) == 123000.0
+    assert cmc_stub.requests[QUOTES_PATH] == requests
+
+    hass.config_entries.async_update_entry(
+        entry,
+        data={
+            **entry.data,
+            CONF_CRYPTOCURRENCIES: ["BTC", "SOL"],
+            CONF_COIN_AMOUNT: {"BTC": "2", "SOL": "10"},
+        },
+    )
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN][entry.entry_id] is coordinator
+    assert float(hass.states.get("sensor.sol_value").state) == 1500.0
+    assert hass.states.get("sensor.eth_value") is None
+    assert float(hass.states.get("sensor.total_portfolio_value").state) == 121500.0
+    assert cmc_stub.requests[QUOTES_PATH] == requests + 1
+
+
+async def test_added_coin_is_quoted_alone(hass, make_stub, freezer):
+    """Adding a coin quotes only that coin and keeps the refresh timer."""
+    stub = await make_stub(coins=300, historical=False)
+    symbols = [symbol for _, symbol, _, _ in stub.coins[:250]]
+    entry = await async_setup_entry(hass, entry_data(symbols))
+    engine = get_engine(hass, entry)
+    assert stub.requests[QUOTES_PATH] == 3
+
+    freezer.tick(timedelta(minutes=5))
+    async_fire_time_changed(hass)
+    hass.config_entries.async_update_entry(entry, data={**entry.data, **entry_data([*symbols, "C260"])})
+    await hass.async_block_till_done()
+    assert stub.requests[QUOTES_PATH] == 4
+    assert engine.covers([*symbols, "C260"], ["USD"])
+    assert hass.states.get("sensor.c260_value").attributes["price"] == pytest.approx(stub.prices["C260"])
+
+    # The next refresh still comes one update interval after the last one
+    freezer.tick(timedelta(minutes=5, seconds=1))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert stub.requests[QUOTES_PATH] == 7
+
+
+async def test_currency_change_reloads(hass, cmc_stub):
+    """A currency change replaces the coordinator."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"]))
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+
+    hass.config_entries.async_update_entry(entry, data={**entry.data, CONF_CURRENCY: ["EUR"]})
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN][entry.entry_id] is not coordinator
+    entity_id = er.async_get(hass).async_get_entity_id(
+        "sensor", DOMAIN, f"{DOMAIN}_{entry.entry_id}_BTC_value_EUR"
+    )
+    assert float(hass.states.get(entity_id).state) == 54000.0
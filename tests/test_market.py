@@ -0,0 +1,106 @@
+"""Tests for the market overview."""
+
+import pytest
+
+from custom_components.coinmarketcap.const import CONF_MARKET_OVERVIEW, LISTINGS_PATH, QUOTES_PATH
+from custom_components.coinmarketcap.market import Listing, MarketOverview
+
+from .common import async_setup_entry, entry_data, get_engine
+
+
+def listing(coin_id, rank, market_cap, change_24h, dominance=None):
+    """Return a listing with the fields the overview indexes."""
+    return Listing(coin_id, f"C{coin_id}", f"Coin {coin_id}", rank, 1.0, market_cap, 0, 0, change_24h, 0, dominance)
+
+
+def test_overview_indexes():
+    """The overview answers for all coins and for the top ``limit`` of them."""
+    market = MarketOverview(
+        [listing(3, 3, 100, 10), listing(1, 1, 600, -5), listing(2, 2, 300, None), listing(4, 4, 0, -20)],
+        baseline_ranks={1: 1, 2: 4, 3: 2, 4: 4},
+    )
+    assert [coin.id for coin in market.listings] == [1, 2, 3, 4]
+    assert market.by_symbol["C2"].rank == 2
+    assert market.total_market_cap() == 1000
+    assert market.total_market_cap(2) == 900
+    assert market.total_market_cap(0) == 0
+
+    assert [coin.id for coin in market.gainers(2)] == [3, 1]
+    assert [coin.id for coin in market.losers(2)] == [4, 1]
+    assert [coin.id for coin in market.losers(5, limit=3)] == [1, 3]
+
+    assert market.rank_changes == {1: 0, 2: 2, 3: -1, 4: 0}
+    assert [coin.id for coin in market.movers(5)] == [2]
+    assert market.movers(5, limit=1) == []
+    assert market.ranks == {1: 1, 2: 2, 3: 3, 4: 4}
+
+    assert market.dominance(market.by_id[1]) == 60
+    assert market.dominance(market.by_id[1], limit=2) == pytest.approx(600 / 9)
+    assert market.dominance(listing(5, 5, 1, 0, dominance=42.0)) == 42.0
+
+
+def test_empty_overview():
+    """An empty listings response has no market cap and no rankings."""
+    market = MarketOverview([])
+    assert market.total_market_cap() is None
+    assert market.gainers(5) == []
+
+
+async def test_market_sensors(hass, cmc_stub):
+    """The overview sensors describe the top coins in the first currency."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"], **{CONF_MARKET_OVERVIEW: 100}))
+    engine = get_engine(hass, entry)
+    total = sum(cmc_stub.prices.values())
+
+    market_cap = hass.states.get("sensor.total_market_cap")
+    assert float(market_cap.state) == pytest.approx(total * 1e7)
+    assert market_cap.attributes["cryptocurrencies"] == 100
+    dominance = hass.states.get("sensor.bitcoin_dominance")
+    assert float(dominance.state) == pytest.approx(60000 / total * 100, abs=0.01)
+    assert list(dominance.attributes["dominance"]) == ["BTC", "ETH", "USDT", "BNB", "SOL"]
+    assert hass.states.get("sensor.top_rank_mover").state == "unknown"
+
+    # Coin 9 climbs to the top of the listings
+    cmc_stub.coins.insert(0, cmc_stub.coins.pop(8))
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    mover = hass.states.get("sensor.top_rank_mover")
+    assert mover.state == "C8"
+    assert mover.attributes["movers"][0]["rank_change"] == 8
+
+
+async def test_listed_coins_skip_the_quotes_call(hass, make_stub):
+    """Coins among the listed top coins are priced from the listings."""
+    stub = await make_stub(coins=200)
+    entry = await async_setup_entry(hass, entry_data(["BTC", "ETH"], **{CONF_MARKET_OVERVIEW: 100}))
+    engine = get_engine(hass, entry)
+    assert stub.requests[LISTINGS_PATH] == 1
+    assert stub.requests[QUOTES_PATH] == 0
+    assert hass.states.get("sensor.eth_value").attributes["price"] == pytest.approx(3000)
+
+    # An added coin among the top 100 is priced from the listings already fetched
+    hass.config_entries.async_update_entry(
+        entry, data={**entry.data, **entry_data(["BTC", "ETH", "SOL"], **{CONF_MARKET_OVERVIEW: 100})}
+    )
+    await hass.async_block_till_done()
+    assert stub.requests[LISTINGS_PATH] == 1
+    assert stub.requests[QUOTES_PATH] == 0
+    assert hass.states.get("sensor.sol_value").attributes["price"] == pytest.approx(150)
+
+    # Only the coin outside the top 100 needs a quotes call
+    hass.config_entries.async_update_entry(
+        entry, data={**entry.data, **entry_data(["BTC", "ETH", "C150"], **{CONF_MARKET_OVERVIEW: 100})}
+    )
+    await hass.async_block_till_done()
+    assert stub.requests[LISTINGS_PATH] == 1
+    assert stub.requests[QUOTES_PATH] == 1
+    assert engine.covers(["BTC", "ETH", "C150"], ["USD"])
+    assert hass.states.get("sensor.c150_value").attributes["price"] == pytest.approx(stub.prices["C150"])
+
+
+async def test_failed_listings_fall_back_to_quotes(hass, cmc_stub):
+    """Without the listings the coins are quoted individually."""
+    cmc_stub.fail(LISTINGS_PATH, 400)
+    await async_setup_entry(hass, entry_data(["BTC", "ETH"], **{CONF_MARKET_OVERVIEW: 100}))
+    assert cmc_stub.requests[QUOTES_PATH] == 1
+    assert hass.states.get("sensor.btc_value").attributes["price"] == pytest.approx(60000)
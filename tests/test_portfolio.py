@@ -0,0 +1,103 @@
+"""Tests for the portfolio valuation."""
+
+from decimal import Decimal
+
+import pytest
+
+from custom_components.coinmarketcap.const import CONF_COST_BASIS, CONF_PORTFOLIOS
+from custom_components.coinmarketcap.portfolio import (
+    Holding,
+    PortfolioEngine,
+    build_holdings,
+    parse_portfolios,
+)
+
+from .common import async_setup_entry, entry_data
+
+
+def test_parse_portfolios():
+    """Named portfolios list coins with optional amounts and costs."""
+    assert parse_portfolios("Long: BTC=0.5@20000, eth; Short: ADA") == {
+        "Long": {"BTC": (Decimal("0.5"), Decimal("20000")), "ETH": (None, None)},
+        "Short": {"ADA": (None, None)},
+    }
+    assert parse_portfolios("") == {}
+    for value in ("BTC", "A: BTC; A: ETH", "A: BTC=x", "A: =1"):
+        with pytest.raises(ValueError):
+            parse_portfolios(value)
+
+
+def test_build_holdings():
+    """Missing amounts and costs are taken from the entry."""
+    holdings = build_holdings(
+        {"BTC": "1", "ETH": "2"},
+        {"BTC": "30000"},
+        {"BTC": (None, None), "ETH": (Decimal("5"), Decimal("1000"))},
+    )
+    assert holdings == [
+        Holding("BTC", Decimal("1"), Decimal("30000")),
+        Holding("ETH", Decimal("5"), Decimal("1000")),
+    ]
+    assert [holding.symbol for holding in build_holdings({"BTC": "1", "ETH": "2"}, {})] == ["BTC", "ETH"]
+
+    # The entry's cost basis covers its whole amount and is scaled to an overridden one.
+    holdings = build_holdings(
+        {"ETH": "10", "SOL": "0"},
+        {"ETH": "30000", "SOL": "500"},
+        {"ETH": (Decimal("2"), None), "SOL": (Decimal("1"), None)},
+    )
+    assert holdings == [Holding("ETH", Decimal("2"), Decimal("6000")), Holding("SOL", Decimal("1"), None)]
+
+
+def test_valuation():
+    """Values, allocation and P&L are exact and converted from the cost currency."""
+    engine = PortfolioEngine(
+        {
+            None: [Holding("A", Decimal("0.1"), Decimal("0.1")), Holding("B", Decimal("0.2"), None)],
+            "Missing": [Holding("C", Decimal("1"), None)],
+        },
+        "USD",
+    )
+    assert engine.valuation(None, "USD") is None
+
+    engine.update({"USD": {"A": 1.0, "B": 1.0}, "EUR": {"A": 0.9, "B": 0.9}, "JPY": {"A": 150.0}}, {"USD": 1, "EUR": 0.9})
+    usd = engine.valuation(None, "USD")
+    assert usd.total == Decimal("0.3")
+    assert usd.allocation["A"] + usd.allocation["B"] == Decimal(100)
+    assert usd.cost == Decimal("0.1")
+    assert usd.gain == Decimal("0.0")
+    assert usd.gains == {"A": Decimal("0.0")}
+
+    eur = engine.valuation(None, "EUR")
+    assert eur.cost == Decimal("0.09")
+    assert eur.gain == Decimal("0.00")
+
+    # No rate, no P&L; missing prices leave the coin out
+    jpy = engine.valuation(None, "JPY")
+    assert jpy.total == Decimal("15.0")
+    assert jpy.gain is None
+    assert engine.valuation("Missing", "USD").total == 0
+
+
+async def test_portfolio_sensors(hass, cmc_stub):
+    """Named portfolios get their own value sensors with P&L attributes."""
+    await async_setup_entry(
+        hass,
+        entry_data(
+            ["BTC", "ETH"],
+            **{CONF_COST_BASIS: {"BTC": "50000"}, CONF_PORTFOLIOS: "Cold: BTC=2@30000; Hot: ETH=3, BTC"},
+        ),
+    )
+
+    total = hass.states.get("sensor.total_portfolio_value")
+    assert float(total.state) == 63000.0
+    assert total.attributes["unrealized_gain"] == 10000.0
+    cold = hass.states.get("sensor.cold_portfolio_value")
+    assert float(cold.state) == 120000.0
+    # Costs are the total cost basis of a holding
+    assert cold.attributes["cost_basis"] == 30000.0
+    assert cold.attributes["unrealized_gain_percent"] == 300.0
+    hot = hass.states.get("sensor.hot_portfolio_value")
+    assert float(hot.state) == 69000.0
+    assert hot.attributes["unrealized_gain"] == 10000.0
+    assert hass.states.get("sensor.btc_value").attributes["allocation"] == pytest.approx(95.24)
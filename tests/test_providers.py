@@ -0,0 +1,180 @@
+"""Tests for the quote providers and the provider selection."""
+
+import time
+
+from homeassistant.const import STATE_UNAVAILABLE
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+import pytest
+
+from custom_components.coinmarketcap.api import ApiClient, CoinMarketCapApiClient, CoinMarketCapConnectionError
+from custom_components.coinmarketcap.const import (
+    CONF_PROVIDER,
+    EXCHANGE_RATES_PATH,
+    PROVIDER_COINBASE,
+    PROVIDER_FAILOVER,
+    QUOTES_PATH,
+)
+from custom_components.coinmarketcap.providers import CoinbaseApiClient, ProviderSelector, quote_breakers
+
+from .common import async_setup_entry, entry_data, get_engine
+
+
+@pytest.fixture
+def make_selector(hass):
+    """Return a factory for selectors over CoinMarketCap and Coinbase clients of a stub.
+
+    The clients do not retry, so every failure reaches the selector.
+    """
+
+    def factory(stub, **kwargs):
+        session = async_get_clientsession(hass)
+        providers = [
+            CoinMarketCapApiClient(session, "test-key", base_url=stub.url, max_retries=0),
+            CoinbaseApiClient(session, base_url=stub.url, max_retries=0),
+        ]
+        return ProviderSelector(providers, **kwargs)
+
+    return factory
+
+
+async def test_coinbase_prices(hass, cmc_stub):
+    """Exchange rates are inverted into prices keyed like the request."""
+    client = CoinbaseApiClient(async_get_clientsession(hass), base_url=cmc_stub.url)
+    payload = await client.async_get_quotes("EUR", ["BTC", "ETH", "UNKNOWN"])
+    assert payload["data"] == {"BTC": pytest.approx(54000), "ETH": pytest.approx(2700)}
+    assert payload["status"]["credit_count"] == 0
+
+    payload = await client.async_get_quotes("USD", ["BTC"], ids=[1])
+    assert payload["data"] == {"1": pytest.approx(60000)}
+
+
+async def test_providers_implement_quotes(hass):
+    """A client without ``async_get_quotes`` cannot be created."""
+
+    class NoQuotesClient(ApiClient):
+        name = "no-quotes"
+
+    with pytest.raises(TypeError, match="async_get_quotes"):
+        NoQuotesClient(async_get_clientsession(hass), "http://localhost")
+
+
+async def test_failover(cmc_stub, make_selector):
+    """A failed provider is followed by the next one."""
+    selector = make_selector(cmc_stub)
+    assert selector.name == "failover"
+    cmc_stub.fail(QUOTES_PATH, 500)
+
+    payload = await selector.async_get_quotes("USD", ["BTC"])
+    assert payload["data"] == {"BTC": pytest.approx(60000)}
+    assert selector.last_provider == "coinbase"
+    assert cmc_stub.requests[QUOTES_PATH] == 1
+
+    await selector.async_get_quotes("USD", ["BTC"])
+    assert selector.last_provider == "coinmarketcap"
+
+
+async def test_all_providers_fail(cmc_stub, make_selector):
+    """The first error is raised when no provider answers."""
+    selector = make_selector(cmc_stub)
+    cmc_stub.fail(QUOTES_PATH, 500)
+    cmc_stub.fail(EXCHANGE_RATES_PATH, 503)
+
+    with pytest.raises(CoinMarketCapConnectionError):
+        await selector.async_get_quotes("USD", ["BTC"])
+    assert cmc_stub.requests[EXCHANGE_RATES_PATH] == 1
+
+
+async def test_slow_request_is_hedged(cmc_stub, make_selector):
+    """A slow provider is raced against the next one and the first answer wins."""
+    selector = make_selector(cmc_stub, hedge_delay=0.05)
+    cmc_stub.delay(QUOTES_PATH, 1)
+
+    start = time.perf_counter()
+    payload = await selector.async_get_quotes("USD", ["BTC"])
+    assert time.perf_counter() - start < 0.5
+    assert payload["data"] == {"BTC": pytest.approx(60000)}
+    assert selector.last_provider == "coinbase"
+    assert cmc_stub.requests[QUOTES_PATH] == 1
+
+
+async def test_fastest_provider_goes_first(cmc_stub, make_selector):
+    """With ``adaptive`` the provider with the lowest latency is asked first."""
+    selector = make_selector(cmc_stub, adaptive=True)
+    assert selector.name == "fastest"
+    cmc_stub.delay(QUOTES_PATH, 0.1)
+
+    for _ in range(3):
+        await selector.async_get_quotes("USD", ["BTC"])
+    assert selector.latency["coinmarketcap"] > selector.latency["coinbase"]
+    assert selector.last_provider == "coinbase"
+    # Each provider was measured once, then only the faster one was asked
+    assert cmc_stub.requests[QUOTES_PATH] == 1
+    assert cmc_stub.requests[EXCHANGE_RATES_PATH] == 2
+
+
+async def test_open_breaker_is_skipped(cmc_stub, make_selector):
+    """Providers with an open circuit breaker are asked last."""
+    selector = make_selector(cmc_stub)
+    coinmarketcap, coinbase = selector.providers
+    coinmarketcap.breaker.record_failure(300)
+
+    await selector.async_get_quotes("USD", ["BTC"])
+    assert selector.last_provider == "coinbase"
+    assert cmc_stub.requests[QUOTES_PATH] == 0
+    assert quote_breakers(selector) == {"coinmarketcap": coinmarketcap.breaker, "coinbase": coinbase.breaker}
+
+
+async def test_coinbase_quotes_all_coins_at_once(hass, make_stub):
+    """The exchange rates cover every coin, so large portfolios are not chunked."""
+    stub = await make_stub(coins=250, historical=False)
+    entry = await async_setup_entry(
+        hass, entry_data([symbol for _, symbol, _, _ in stub.coins], **{CONF_PROVIDER: PROVIDER_COINBASE})
+    )
+    engine = get_engine(hass, entry)
+
+    assert stub.requests[EXCHANGE_RATES_PATH] == 1
+    assert stub.requests[QUOTES_PATH] == 0
+    assert len(engine.data["USD"]) == 250
+    assert hass.states.get("sensor.c249_value").attributes["price"] == pytest.approx(stub.prices["C249"])
+
+
+async def test_failover_chunks_for_coinmarketcap(hass, make_stub):
+    """Requests that may go to CoinMarketCap keep its chunk size."""
+    stub = await make_stub(coins=250, historical=False)
+    await async_setup_entry(
+        hass, entry_data([symbol for _, symbol, _, _ in stub.coins], **{CONF_PROVIDER: PROVIDER_FAILOVER})
+    )
+    assert stub.requests[QUOTES_PATH] == 3
+
+
+async def test_stale_data_follows_the_quote_provider(hass, cmc_stub):
+    """Stale prices are served once the breaker of the quote provider is open."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"], **{CONF_PROVIDER: PROVIDER_COINBASE}))
+    engine = get_engine(hass, entry)
+    cmc_stub.fail(EXCHANGE_RATES_PATH, 429, headers={"Retry-After": "600"})
+
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    state = hass.states.get("sensor.btc_value")
+    assert float(state.state) == 60000.0
+    assert state.attributes["stale"] is True
+
+
+async def test_stale_data_needs_every_provider_down(hass, cmc_stub):
+    """With failover, stale prices are only served when no provider can be asked."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"], **{CONF_PROVIDER: PROVIDER_FAILOVER}))
+    engine = get_engine(hass, entry)
+    coinmarketcap, coinbase = engine.quotes.providers
+    coinmarketcap.breaker.record_failure(600)
+    cmc_stub.fail(EXCHANGE_RATES_PATH, 500, count=10)
+
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    assert hass.states.get("sensor.btc_value").state == STATE_UNAVAILABLE
+
+    coinbase.breaker.record_failure(600)
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    state = hass.states.get("sensor.btc_value")
+    assert float(state.state) == 60000.0
+    assert state.attributes["stale"] is True
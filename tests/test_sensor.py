@@ -0,0 +1,103 @@
+"""Tests for the sensor entities."""
+
+from datetime import timedelta
+
+from homeassistant.const import EVENT_STATE_CHANGED
+import pytest
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from custom_components.coinmarketcap.const import CONF_MIN_CHANGE_PERCENT, DOMAIN, QUOTES_PATH
+from custom_components.coinmarketcap.sensor import ChangeFilter, CoinMarketCapEntity
+
+from .common import async_setup_entry, async_wait_backfill, entry_data, get_engine
+
+POLL_INTERVAL = timedelta(seconds=30)
+
+
+@pytest.mark.parametrize("size", [1, 10, 100])
+async def test_one_request_per_interval(hass, make_stub, freezer, size):
+    """Sensors are not polled; the engine makes one quote call per interval."""
+    stub = await make_stub(coins=size, historical=False)
+    entry = await async_setup_entry(hass, entry_data([symbol for _, symbol, _, _ in stub.coins]))
+    engine = get_engine(hass, entry)
+    await async_wait_backfill(engine)
+    assert stub.requests[QUOTES_PATH] == 1
+
+    for interval in range(1, 4):
+        # The entity poller would have fired every 30 seconds
+        remaining = engine.update_interval
+        while remaining > POLL_INTERVAL:
+            freezer.tick(POLL_INTERVAL)
+            remaining -= POLL_INTERVAL
+            async_fire_time_changed(hass)
+            await hass.async_block_till_done()
+        assert stub.requests[QUOTES_PATH] == interval
+
+        freezer.tick(remaining)
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done()
+        assert stub.requests[QUOTES_PATH] == interval + 1
+
+
+def test_change_filter_deadband():
+    """Moves inside the absolute and relative deadbands are not written."""
+    change_filter = ChangeFilter(min_change=1, min_change_percent=0.1)
+    assert change_filter.should_write({"state": 60000.0}, None)
+    assert not change_filter.should_write({"state": 60000.5}, None)
+    # 0.1 % of 60000 is 60, but the absolute deadband is left first
+    assert change_filter.should_write({"state": 60001.0}, None)
+    assert change_filter.should_write({"state": None}, None)
+    assert not change_filter.should_write({"state": None}, None)
+
+    change_filter = ChangeFilter(min_change_percent=1)
+    assert change_filter.should_write({"state": 100.0}, None)
+    assert not change_filter.should_write({"state": 100.9}, None)
+    assert change_filter.should_write({"state": 101.0}, None)
+
+
+def test_change_filter_attributes_and_heartbeat():
+    """Other attribute changes are always written, unchanged states after ``max_age``."""
+    now = [0.0]
+    change_filter = ChangeFilter(min_change=100, max_age=300, clock=lambda: now[0])
+    assert change_filter.should_write({"state": 1.0}, (True, {"stale": False}))
+    assert not change_filter.should_write({"state": 1.0}, (True, {"stale": False}))
+    assert change_filter.should_write({"state": 1.0}, (True, {"stale": True}))
+
+    now[0] = 299
+    assert not change_filter.should_write({"state": 1.0}, (True, {"stale": True}))
+    now[0] = 300
+    assert change_filter.should_write({"state": 1.0}, (True, {"stale": True}))
+
+
+async def test_entities_implement_the_update(hass, cmc_stub):
+    """An entity without ``_update_from_coordinator`` cannot be created."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"]))
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+
+    class Incomplete(CoinMarketCapEntity):
+        pass
+
+    with pytest.raises(TypeError, match="_update_from_coordinator"):
+        Incomplete(coordinator)
+
+
+async def test_small_moves_are_suppressed(hass, cmc_stub):
+    """Moves below the deadband do not write states and are counted."""
+    entry = await async_setup_entry(hass, entry_data(["BTC", "ETH"], **{CONF_MIN_CHANGE_PERCENT: 1}))
+    engine = get_engine(hass, entry)
+    await async_wait_backfill(engine)
+    writes = []
+    hass.bus.async_listen(EVENT_STATE_CHANGED, writes.append)
+
+    cmc_stub.move(1.001)
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    assert float(hass.states.get("sensor.btc_value").state) == 60000.0
+    assert not [event for event in writes if event.data["entity_id"] == "sensor.btc_value"]
+    suppressed = int(hass.states.get("sensor.suppressed_state_writes").state)
+    assert suppressed >= 3
+
+    cmc_stub.move(1.02)
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    assert float(hass.states.get("sensor.btc_value").state) == round(60000 * 1.001 * 1.02, 2)
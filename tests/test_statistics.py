@@ -0,0 +1,93 @@
+"""Tests for the hourly long-term statistics."""
+
+from datetime import datetime, timezone
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.statistics import list_statistic_ids, statistics_during_period
+from homeassistant.util import slugify
+import pytest
+from pytest_homeassistant_custom_component.components.recorder.common import async_wait_recording_done
+
+from custom_components.coinmarketcap.const import CONF_PORTFOLIOS, CONF_STATISTICS, DOMAIN
+from custom_components.coinmarketcap.statistics import HourlyAggregator
+
+from .common import async_setup_entry, entry_data, get_engine
+
+HOUR = 3600
+
+
+def test_hourly_mean_is_time_weighted():
+    """Each value counts for as long as it was current within the hour."""
+    aggregator = HourlyAggregator()
+    assert aggregator.add(0, {"a": 10.0}) is None
+    assert aggregator.add(900, {"a": 20.0, "b": 5.0}) is None
+    assert aggregator.add(1800, {"a": 30.0}) is None
+
+    hour, stats = aggregator.add(HOUR + 600, {"a": 40.0})
+    assert hour == 0
+    assert stats["a"] == (pytest.approx((10 * 900 + 20 * 900 + 30 * 1800) / HOUR), 10.0, 30.0)
+    assert stats["b"] == (5.0, 5.0, 5.0)
+
+    # The last value of the closed hour holds until the first tick of the next
+    hour, stats = aggregator.add(2 * HOUR, {"a": 40.0})
+    assert hour == HOUR
+    assert stats == {"a": (pytest.approx((30 * 600 + 40 * 3000) / HOUR), 30.0, 40.0)}
+
+
+def test_hours_without_ticks_are_skipped():
+    """A gap starts over and ticks older than the current hour are ignored."""
+    aggregator = HourlyAggregator()
+    aggregator.add(0, {"a": 10.0})
+    hour, stats = aggregator.add(5 * HOUR, {"a": 20.0})
+    assert hour == 0
+    assert stats == {"a": (10.0, 10.0, 10.0)}
+    assert aggregator.add(HOUR, {"a": 99.0}) is None
+
+    hour, stats = aggregator.add(6 * HOUR, {"a": 30.0})
+    assert hour == 5 * HOUR
+    assert stats == {"a": (20.0, 20.0, 20.0)}
+
+
+async def test_statistics_are_imported(recorder_mock, hass, cmc_stub, freezer):
+    """Closed hours are imported under IDs scoped to the entry."""
+    freezer.move_to(datetime(2024, 1, 1, 0, 30, tzinfo=timezone.utc))
+    options = {CONF_STATISTICS: True, CONF_PORTFOLIOS: "Cold: BTC=1"}
+    first = await async_setup_entry(hass, entry_data(["BTC"], **options))
+    second = await async_setup_entry(hass, entry_data(["BTC", "ETH"], **options))
+    engine = get_engine(hass, first)
+
+    freezer.tick(HOUR)
+    cmc_stub.move(1.1)
+    await engine.async_refresh()
+    await hass.async_block_till_done()
+    await async_wait_recording_done(hass)
+
+    first_prefix = f"{DOMAIN}:{slugify(first.entry_id)}"
+    second_prefix = f"{DOMAIN}:{slugify(second.entry_id)}"
+    assert hass.data[DOMAIN][first.entry_id].statistics.imported == 3
+    assert hass.data[DOMAIN][second.entry_id].statistics.imported == 4
+    statistic_ids = await get_instance(hass).async_add_executor_job(list_statistic_ids, hass)
+    assert sorted(statistic["statistic_id"] for statistic in statistic_ids) == sorted([
+        f"{first_prefix}_btc_price_usd",
+        f"{first_prefix}_total_portfolio_value_usd",
+        f"{first_prefix}_portfolio_cold_value_usd",
+        f"{second_prefix}_btc_price_usd",
+        f"{second_prefix}_eth_price_usd",
+        f"{second_prefix}_total_portfolio_value_usd",
+        f"{second_prefix}_portfolio_cold_value_usd",
+    ])
+
+    # The price held from the setup at half past until the hour was over
+    stats = await get_instance(hass).async_add_executor_job(
+        statistics_during_period,
+        hass,
+        datetime(2024, 1, 1, tzinfo=timezone.utc),
+        None,
+        {f"{second_prefix}_total_portfolio_value_usd"},
+        "hour",
+        None,
+        {"mean", "min", "max"},
+    )
+    (row,) = stats[f"{second_prefix}_total_portfolio_value_usd"]
+    assert row["mean"] == pytest.approx(63000)
+    assert row["min"] == row["max"] == pytest.approx(63000)
@@ -0,0 +1,60 @@
+"""Tests for the live prices from the ticker websocket."""
+
+import asyncio
+
+from homeassistant.const import EVENT_STATE_CHANGED
+import pytest
+
+from custom_components.coinmarketcap.const import CONF_STREAM, QUOTES_PATH
+
+from .common import async_setup_entry, entry_data, get_engine
+
+
+async def async_wait_for(predicate, timeout=5):
+    """Wait until ``predicate`` returns True."""
+    async with asyncio.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+
+async def test_ticks_are_coalesced(hass, cmc_stub):
+    """A burst of ticks updates the prices with one state write per sensor."""
+    entry = await async_setup_entry(hass, entry_data(["BTC", "ETH", "SOL"], **{CONF_STREAM: "btc, eth"}))
+    engine = get_engine(hass, entry)
+    await async_wait_for(lambda: engine.stream.connected)
+    assert engine.stream.products == {"BTC-USD": "BTC", "ETH-USD": "ETH"}
+
+    await cmc_stub.push_ticks([("BTC", "USD", 60500)])
+    await async_wait_for(lambda: hass.states.get("sensor.btc_value").attributes["price"] == 60500)
+
+    writes = []
+    hass.bus.async_listen(EVENT_STATE_CHANGED, writes.append)
+    ticks = [("BTC", "USD", 61000 + step) for step in range(50)] + [("ETH", "USD", 3100), ("SOL", "USD", 1)]
+    await cmc_stub.push_ticks(ticks)
+    await async_wait_for(lambda: hass.states.get("sensor.eth_value").attributes["price"] == 3100)
+    await hass.async_block_till_done()
+
+    assert hass.states.get("sensor.btc_value").attributes["price"] == 61049
+    assert engine.data["USD"]["BTC"] == 61049
+    # Coins that are not streamed keep their polled price
+    assert hass.states.get("sensor.sol_value").attributes["price"] == pytest.approx(150)
+    assert sorted(event.data["entity_id"] for event in writes if event.data["entity_id"].endswith("_value")) == [
+        "sensor.btc_value",
+        "sensor.eth_value",
+        "sensor.total_portfolio_value",
+    ]
+    assert cmc_stub.requests[QUOTES_PATH] == 1
+
+
+async def test_stream_follows_the_options(hass, cmc_stub):
+    """Removing the streamed coins closes the connection."""
+    entry = await async_setup_entry(hass, entry_data(["BTC"], **{CONF_STREAM: "BTC, DOGE"}))
+    engine = get_engine(hass, entry)
+    # Only coins of the entry are streamed
+    assert engine.stream.products == {"BTC-USD": "BTC"}
+    await async_wait_for(lambda: engine.stream.connected)
+
+    hass.config_entries.async_update_entry(entry, data={**entry.data, CONF_STREAM: ""})
+    await hass.async_block_till_done()
+    assert engine.stream.products == {}
+    assert not engine.stream.connected
@@ -0,0 +1,120 @@
+"""Tests for the OHLCV store, the backfill and the price history service."""
+
+import math
+import os
+
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+import pytest
+
+from custom_components.coinmarketcap.const import (
+    ATTR_CRYPTOCURRENCY,
+    ATTR_CURRENCY,
+    ATTR_START,
+    BACKFILL_PERIOD,
+    BAR_SECONDS,
+    CONF_DAILY_CREDIT_BUDGET,
+    DOMAIN,
+    OHLCV_HISTORICAL_PATH,
+    SERVICE_GET_PRICE_HISTORY,
+)
+from custom_components.coinmarketcap.timeseries import BAR, BarBuilder, SeriesFile
+
+from .common import async_setup_entry, async_wait_backfill, entry_data, get_engine
+
+
+def bar(hour, close):
+    """Return a bar of ``hour`` closing at ``close``."""
+    return (hour * BAR_SECONDS, close, close, close, close, 1.0)
+
+
+def test_series_file_append_and_read(tmp_path):
+    """Bars are appended in order, once, and read by time range."""
+    series = SeriesFile(str(tmp_path / "usd_btc.bin"))
+    assert series.last_time() is None
+    assert series.read(0, 10**10) == []
+
+    assert series.append([bar(2, 102.0), bar(0, 100.0), bar(1, 101.0)]) == 3
+    assert series.append([bar(1, 0.0), bar(3, 103.0)]) == 1
+    assert series.last_time() == 3 * BAR_SECONDS
+    assert series.read(BAR_SECONDS, 3 * BAR_SECONDS) == [bar(1, 101.0), bar(2, 102.0)]
+    assert len(series.read(0, 10**10)) == 4
+
+
+def test_series_file_drops_torn_records(tmp_path):
+    """A record cut short by an interrupted write is dropped on the next append."""
+    path = tmp_path / "usd_btc.bin"
+    series = SeriesFile(str(path))
+    series.append([bar(0, 100.0)])
+    with open(path, "ab") as file:
+        file.write(BAR.pack(*bar(1, 101.0))[:20])
+
+    assert series.read(0, 10**10) == [bar(0, 100.0)]
+    assert series.append([bar(1, 101.0)]) == 1
+    assert os.path.getsize(path) == 2 * BAR.size
+    assert series.read(0, 10**10) == [bar(0, 100.0), bar(1, 101.0)]
+
+
+def test_bar_builder():
+    """Ticks are aggregated into hourly bars without volume."""
+    builder = BarBuilder()
+    for timestamp, price in ((0, 10.0), (600, 12.0), (1200, 9.0), (3000, 11.0), (3600, 20.0)):
+        builder.add(timestamp, price)
+
+    [completed] = builder.pop_completed()
+    assert completed[:5] == (0, 10.0, 12.0, 9.0, 11.0)
+    assert math.isnan(completed[5])
+    assert builder.pop_completed() == []
+    assert builder.current[:5] == [3600, 20.0, 20.0, 20.0, 20.0]
+
+
+async def test_backfill_and_price_history_service(hass, cmc_stub):
+    """History is downloaded once in bulk and queried from the local store."""
+    entry = await async_setup_entry(hass, entry_data(["BTC", "ETH"], currency=["USD", "EUR"]))
+    engine = get_engine(hass, entry)
+    await async_wait_backfill(engine)
+    assert cmc_stub.requests[OHLCV_HISTORICAL_PATH] == 1
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_PRICE_HISTORY,
+        {ATTR_CRYPTOCURRENCY: "btc", ATTR_CURRENCY: "EUR", ATTR_START: dt_util.utcnow() - BACKFILL_PERIOD * 2},
+        blocking=True,
+        return_response=True,
+    )
+    assert response["cryptocurrency"] == "BTC"
+    assert response["currency"] == "EUR"
+    assert len(response["bars"]) == BACKFILL_PERIOD.total_seconds() // BAR_SECONDS
+    assert response["bars"][0]["close"] == pytest.approx(54000.0)
+
+    await engine.async_refresh()
+    await async_wait_backfill(engine)
+    assert cmc_stub.requests[OHLCV_HISTORICAL_PATH] == 1
+
+    with pytest.raises(HomeAssistantError):
+        await hass.services.async_call(
+            DOMAIN, SERVICE_GET_PRICE_HISTORY, {ATTR_CRYPTOCURRENCY: "SOL"}, blocking=True, return_response=True
+        )
+
+
+async def test_backfill_without_historical_access(hass, make_stub):
+    """Keys without access to historical data stop trying after one request."""
+    stub = await make_stub(historical=False)
+    entry = await async_setup_entry(hass, entry_data(["BTC"]))
+    engine = get_engine(hass, entry)
+    await async_wait_backfill(engine)
+    assert not engine.backfill_supported
+
+    await engine.async_refresh()
+    await async_wait_backfill(engine)
+    assert stub.requests[OHLCV_HISTORICAL_PATH] == 1
+    assert float(hass.states.get("sensor.btc_value").state) == 60000.0
+
+
+async def test_backfill_stays_within_the_budget(hass, cmc_stub):
+    """The backfill waits when it would use more than its share of the credits."""
+    entry = await async_setup_entry(hass, entry_data(["BTC", "ETH"], **{CONF_DAILY_CREDIT_BUDGET: 10}))
+    engine = get_engine(hass, entry)
+    await async_wait_backfill(engine)
+    assert cmc_stub.requests[OHLCV_HISTORICAL_PATH] == 0
+    assert engine.backfill_supported